@@ -0,0 +1,82 @@
+"""
+Compare the compression formats of MTGJSON (see ``MtgJsonCompression``), along with
+zstd and brotli when they are installed
+
+Each format is decoded as a stream, the way ``MtgJson`` consumes its datasets. The
+payload is built from the samples of the test suite:
+
+    poetry run python benchmarks/compression.py
+"""
+
+import asyncio
+import bz2
+import gzip
+import io
+import lzma
+import pathlib
+import time
+import zipfile
+from typing import AsyncIterator, Callable, Dict
+
+from mightstone.ass import compressor
+
+SAMPLES = pathlib.Path(__file__).parent.parent.joinpath("tests", "services")
+CHUNK_SIZE = 64 * 1024
+
+
+def zip_compress(data: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("AllPrintings.json", data)
+    return buffer.getvalue()
+
+
+FORMATS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": gzip.compress,
+    "zip": zip_compress,
+    "bzip2": bz2.compress,
+    "lzma": lzma.compress,
+}
+
+try:
+    import zstandard
+
+    FORMATS["zstd"] = zstandard.ZstdCompressor().compress
+except ImportError:
+    pass
+
+try:
+    import brotli
+
+    FORMATS["brotli"] = lambda data: brotli.compress(data, quality=5)
+except ImportError:
+    pass
+
+
+async def chunks(data: bytes) -> AsyncIterator[bytes]:
+    for i in range(0, len(data), CHUNK_SIZE):
+        yield data[i : i + CHUNK_SIZE]
+
+
+async def measure(data: bytes, compression: str) -> float:
+    start = time.perf_counter()
+    async with compressor.open(chunks(data), compression=compression) as f:
+        await f.read()
+    return time.perf_counter() - start
+
+
+def main():
+    payload = SAMPLES.joinpath("mtgjson/samples/set.json").read_bytes() * 5
+    size = len(payload) / 1024 / 1024
+    print(f"{'format':<8} {'size':>10} {'ratio':>7} {'decode':>10} {'MB/s':>8}")
+    for name, compress in FORMATS.items():
+        data = compress(payload)
+        duration = min(asyncio.run(measure(data, name)) for _ in range(3))
+        print(
+            f"{name:<8} {len(data) / 1024:>8.0f}kB {len(payload) / len(data):>7.1f}"
+            f" {duration * 1000:>8.1f}ms {size / duration:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare the validation modes of bulk data (see ``mightstone.core.Validation``)
+
+Models are built from the samples of the test suite:
+
+    poetry run python benchmarks/validation.py
+"""
+
+import copy
+import json
+import pathlib
+import timeit
+from typing import Any, List, Tuple, Type
+
+from pydantic import BaseModel
+
+from mightstone.core import Validation, build
+from mightstone.services.mtgjson.models import CardSet, Set
+from mightstone.services.scryfall.models import Card
+
+SAMPLES = pathlib.Path(__file__).parent.parent.joinpath("tests", "services")
+
+
+def load(path: str) -> Any:
+    return json.loads(SAMPLES.joinpath(path).read_text())
+
+
+def scenarios() -> List[Tuple[str, Type[BaseModel], List[Any]]]:
+    mtgjson_set = load("mtgjson/samples/set.json")
+    return [
+        ("MTGJSON Set (BRO)", Set, [mtgjson_set]),
+        ("MTGJSON CardSet", CardSet, mtgjson_set["cards"]),
+        ("Scryfall Card", Card, [load("scryfall/samples/card.json")] * 500),
+    ]
+
+
+def measure(model: Type[BaseModel], items: List[Any], validation: Validation):
+    # Raw data may be enriched in place, every run builds from fresh copies
+    runs = [[copy.deepcopy(item) for item in items] for _ in range(5)]
+
+    def run():
+        for item in runs.pop():
+            build(model, item, validation)
+
+    return min(timeit.repeat(run, number=1, repeat=5))
+
+
+def main():
+    print(
+        f"{'scenario':<20} {'items':>6} "
+        + " ".join(f"{v.value:>14}" for v in Validation)
+    )
+    for name, model, items in scenarios():
+        timings = {v: measure(model, items, v) for v in Validation}
+        full = timings[Validation.FULL]
+        cells = [
+            f"{timings[v] * 1000:7.1f}ms x{full / timings[v]:<4.0f}" for v in Validation
+        ]
+        print(f"{name:<20} {len(items):>6} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
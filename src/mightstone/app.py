@@ -56,6 +56,19 @@ class Mightstone:
     def __del__(self):
         self.container.cleanup()
 
+    async def aclose(self) -> None:
+        """
+        Close the services HTTP clients and the shared HTTP transport (connection
+        pool and cache storage), the services accessed afterward are built again
+        """
+        await self.container.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
     @property
     def config(self) -> MightstoneSettings:
         return self.container.get(MightstoneSettings)
@@ -1,11 +1,16 @@
+import asyncio
 import logging
 from functools import wraps
 from typing import (
     Any,
     AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
     Callable,
     Coroutine,
     Generator,
+    Iterable,
+    List,
     Optional,
     TypeVar,
     Union,
@@ -50,3 +55,84 @@ def synchronize(
         )
 
     return inner
+
+
+async def read_ahead(
+    iterator: AsyncIterator[T], depth: int = 1
+) -> AsyncGenerator[T, None]:
+    """
+    Consume an async iterator in a background task, up to ``depth`` items ahead of
+    the caller, then hand the items out in order
+
+    Exceptions raised by the iterator are raised to the caller, once the items that
+    preceded them were handed out. The task is cancelled when the caller stops.
+
+    :param iterator: The async iterator, for instance one yielding HTTP responses
+    :param depth: The number of items to fetch ahead, 0 disables the read-ahead
+    """
+    if depth < 1:
+        async for item in iterator:
+            yield item
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = asyncio.Semaphore(depth)
+    done = object()
+
+    async def produce():
+        try:
+            while True:
+                # Only fetch an item once there is room for it
+                await slots.acquire()
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                queue.put_nowait((item, None))
+            queue.put_nowait((done, None))
+        except Exception as e:
+            queue.put_nowait((done, e))
+
+    task = asyncio.create_task(produce())
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            slots.release()
+            yield item
+    finally:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+async def batched(
+    iterable: Union[Iterable[T], AsyncIterable[T]], size: int
+) -> AsyncGenerator[List[T], None]:
+    """
+    Split a sync or async iterable into lists of ``size`` items, the last one may
+    be shorter
+
+    :param iterable: The iterable to split
+    :param size: The number of items of each batch
+    """
+    batch: List[T] = []
+    if isinstance(iterable, AsyncIterable):
+        async for item in iterable:
+            batch.append(item)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    else:
+        for item in iterable:
+            batch.append(item)
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
@@ -5,7 +5,7 @@ seems an abandoned project
 see: https://github.com/chimpler/async-stream
 """
 
-from typing import Any, AsyncIterable, Iterable, Optional, Union
+from typing import Any, AsyncIterable, Iterable, Optional, Tuple, Union
 
 from mightstone.ass.compressor.async_file_obj import AsyncFileObj
 from mightstone.ass.compressor.async_reader import AsyncReader
@@ -18,8 +18,40 @@ def open(
     encoding=None,
     compression=None,
     *args,
+    dictionary: Optional[bytes] = None,
     **kwargs,
 ):
+    """
+    Open an async stream, compressing what is written and decompressing what is
+    read
+
+    :param afd: An async iterable of bytes, an async file, or a filename
+    :param mode: The file mode, ``rb`` or ``wb``
+    :param compression: ``gzip``, ``lzma``, ``bzip2``, ``zip``, ``zstd`` (requires
+                        zstandard), ``brotli`` (requires brotli) or None
+    :param dictionary: Optional. A zstd dictionary, see ``train_zstd_dictionary()``
+    """
+    compressor, decompressor = get_codec(compression, encoding, dictionary)
+    return AsyncFileObj(afd, mode, compressor, decompressor, *args, **kwargs)
+
+
+def get_codec(
+    compression: Optional[str] = None,
+    encoding=None,
+    dictionary: Optional[bytes] = None,
+) -> Tuple[Any, Any]:
+    """
+    Build a compressor and a decompressor, such as the ones of ``open()``, to
+    (de)compress data synchronously
+
+    :param compression: The compression, see ``open()``
+    :param dictionary: Optional. A zstd dictionary
+    :return: The compressor (``compress()`` and ``flush()``) and the decompressor
+             (``decompress()`` and ``flush()``)
+    """
+    if dictionary is not None and compression != "zstd":
+        raise ValueError("Only zstd compression supports dictionaries")
+
     if encoding is None and compression is None:
         from mightstone.ass.compressor.codecs.none_codec import (
             NoneCompressor,
@@ -52,10 +84,34 @@ def open(
 
         compressor = get_bzip2_encoder()
         decompressor = get_bzip2_decoder()
+    elif compression == "zip":
+        from mightstone.ass.compressor.codecs.zip_codec import (
+            get_zip_decoder,
+            get_zip_encoder,
+        )
+
+        compressor = get_zip_encoder()
+        decompressor = get_zip_decoder()
+    elif compression == "zstd":
+        from mightstone.ass.compressor.codecs.zstd_codec import (
+            get_zstd_decoder,
+            get_zstd_encoder,
+        )
+
+        compressor = get_zstd_encoder(dictionary=dictionary)
+        decompressor = get_zstd_decoder(dictionary=dictionary)
+    elif compression == "brotli":
+        from mightstone.ass.compressor.codecs.brotli_codec import (
+            get_brotli_decoder,
+            get_brotli_encoder,
+        )
+
+        compressor = get_brotli_encoder()
+        decompressor = get_brotli_decoder()
     else:
         raise ValueError("Unsupported compression %s" % compression)
 
-    return AsyncFileObj(afd, mode, compressor, decompressor, *args, **kwargs)
+    return compressor, decompressor
 
 
 def reader(
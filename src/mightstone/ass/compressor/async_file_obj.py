@@ -1,4 +1,7 @@
-from typing import AsyncIterable, List, Optional, Union
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterable, AsyncIterator, Deque, Optional, Union
 
 import aiofiles.threadpool.binary
 
@@ -6,6 +9,16 @@ from mightstone.ass.compressor.codecs import error_import_usage
 
 
 class AsyncFileObj(object):
+    """
+    An async file-like object, compressing what is written and decompressing what is
+    read
+
+    With ``threaded``, decompression runs in a dedicated thread (zlib, lzma, bz2,
+    zstd and brotli release the GIL), pipelined with the reads of the source through
+    a queue of at most ``queue_size`` decompressed chunks, so that the event loop is
+    not blocked by slow codecs.
+    """
+
     MODE_DEFAULT = 0
     MODE_BINARY = 1
     MODE_TEXT = 2
@@ -20,6 +33,8 @@ class AsyncFileObj(object):
         decompressor,
         ignore_header=False,
         buffer_size=1024 * 1024,
+        threaded=False,
+        queue_size=4,
     ):
         self._afd = afd
         self._mode = mode
@@ -27,11 +42,18 @@ class AsyncFileObj(object):
         self._decompressor = decompressor
         self._ignore_header = ignore_header
         self._header = None
-        self._buffer = b""
         self._buffer_size = buffer_size
-        self._eof = False
-        self._lines: List[bytes] = []
-        self._index = 0
+        # Decompressed chunks, the first one is consumed from ``_offset``
+        self._chunks: Deque[bytes] = deque()
+        self._offset = 0
+        self._size = 0
+        self._source: Optional[AsyncIterator[bytes]] = None
+        self._exhausted = False
+        self._threaded = threaded
+        self._queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._pipeline: Optional[asyncio.Future] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
         self._filename = None
         self._has_flushed = True
         self._is_closed = False
@@ -52,51 +74,187 @@ class AsyncFileObj(object):
     async def _cannot_write(self, buffer: bytes):
         raise IOError("Cannot write because mode is not set to write")
 
-    async def read(self, n: Optional[int] = None):
+    async def read(self, n: Optional[int] = None) -> bytes:
+        """
+        Read decompressed bytes
+
+        Like a raw stream, at most ``n`` bytes are returned as soon as some data is
+        available, fewer bytes than requested does not mean the end of the stream.
+
+        :param n: Optional. The maximum number of bytes to read, everything left if
+                  omitted
+        :return: The bytes, empty at the end of the stream
+        """
         if n == 0:
             # Do not read from parent iterator
             return b""
 
-        buffer_size = n if n else 1024 * 1024
-        if isinstance(self._afd, AsyncIterable):
-            async for data in self._afd:
-                try:
-                    self._buffer += self._decompressor.decompress(data)
-                    if len(self._buffer) >= buffer_size and n is not None:
-                        result = self._buffer[:buffer_size]
-                        self._buffer = self._buffer[buffer_size:]
-                        return result
-                except GeneratorExit:
-                    return b""
+        if n is None or n < 0:
+            while await self._fill():
+                pass
+            parts = [self._take(self._size) for _ in range(len(self._chunks))]
+            return parts[0] if len(parts) == 1 else b"".join(parts)
+
+        while not self._chunks:
+            if not await self._fill():
+                return b""
+
+        # Only join the chunks already decompressed, a single chunk is not copied
+        parts = [self._take(n)]
+        remaining = n - len(parts[0])
+        while remaining and self._chunks:
+            parts.append(self._take(remaining))
+            remaining -= len(parts[-1])
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    async def readinto(self, buffer) -> int:
+        """
+        Read decompressed bytes into a pre-allocated, writable buffer
+
+        :param buffer: A ``bytearray``, ``memoryview`` or any writable buffer
+        :return: The number of bytes written, 0 at the end of the stream
+        """
+        view = memoryview(buffer).cast("B")
+        while not self._chunks:
+            if not await self._fill():
+                return 0
+
+        written = 0
+        while written < len(view) and self._chunks:
+            chunk = self._chunks[0]
+            count = min(len(view) - written, len(chunk) - self._offset)
+            view[written : written + count] = memoryview(chunk)[
+                self._offset : self._offset + count
+            ]
+            self._consume(count)
+            written += count
+        return written
+
+    async def readline(self) -> bytes:
+        """
+        :return: The next line, including its trailing ``\\n``, empty at the end of
+                 the stream
+        """
+        parts = []
+        while self._chunks or await self._fill():
+            if not self._chunks:
+                continue
+            chunk = self._chunks[0]
+            end = chunk.find(b"\n", self._offset)
+            if end >= 0:
+                parts.append(self._take(end + 1 - self._offset))
+                break
+            parts.append(self._take(len(chunk) - self._offset))
+        return parts[0] if len(parts) == 1 else b"".join(parts)
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """
+        Iterate over the decompressed bytes, as they are produced by the
+        decompressor, without copying them
+        """
+        while self._chunks or await self._fill():
+            if self._chunks:
+                yield self._take(self._size)
+
+    async def _fill(self) -> bool:
+        """
+        Decompress the next block of the source
+
+        :return: False once the source is exhausted
+        """
+        if self._exhausted:
+            return False
 
+        if self._threaded:
+            return await self._fill_from_thread()
+
+        data = await self._read_source()
+        if data:
+            self._push(self._decompressor.decompress(data))
+        else:
+            self._exhausted = True
+            if hasattr(self._decompressor, "flush"):
+                self._push(self._decompressor.flush())
+        return True
+
+    async def _fill_from_thread(self) -> bool:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self._queue_size)
+            self._executor = ThreadPoolExecutor(1, "mightstone-decompress")
+            self._pipeline = asyncio.ensure_future(
+                self._decompress_in_thread(self._queue)
+            )
+
+        chunk = await self._queue.get()
+        if chunk is None:
+            self._exhausted = True
+            return False
+        if isinstance(chunk, BaseException):
+            self._exhausted = True
+            raise chunk
+        self._push(chunk)
+        return True
+
+    async def _decompress_in_thread(self, queue: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        try:
+            data = await self._read_source()
+            while data:
+                pending = loop.run_in_executor(
+                    self._executor, self._decompressor.decompress, data
+                )
+                # Read the next block while the previous one is decompressed
+                try:
+                    data = await self._read_source()
+                finally:
+                    chunk = await pending
+                if chunk:
+                    await queue.put(chunk)
             if hasattr(self._decompressor, "flush"):
-                data = self._decompressor.flush()
-                if data:
-                    self._buffer += data
-            result = self._buffer
-            self._buffer = b""
-            return result
-
-        while True:
-            if self._eof:
-                result = self._buffer
-                self._buffer = b""
-                return result
-
-            if len(self._buffer) >= buffer_size and n is not None:
-                result = self._buffer[:buffer_size]
-                self._buffer = self._buffer[buffer_size:]
-                return result
-
-            data = await self._afd.read(buffer_size)
-            if data:
-                self._buffer += self._decompressor.decompress(data)
-            else:
-                if hasattr(self._decompressor, "flush"):
-                    data = self._decompressor.flush()
-                    if data:
-                        self._buffer += data
-                self._eof = True
+                chunk = await loop.run_in_executor(
+                    self._executor, self._decompressor.flush
+                )
+                if chunk:
+                    await queue.put(chunk)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def _read_source(self) -> bytes:
+        if hasattr(self._afd, "read"):
+            return await self._afd.read(self._buffer_size)
+
+        if self._source is None:
+            self._source = self._afd.__aiter__()
+        try:
+            return await self._source.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+    def _push(self, chunk: bytes) -> None:
+        if chunk:
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+
+    def _take(self, n: int) -> bytes:
+        """
+        Consume up to ``n`` bytes of the first buffered chunk, a chunk consumed at
+        once is returned as is
+        """
+        chunk = self._chunks[0]
+        start = self._offset
+        end = min(start + n, len(chunk))
+        self._consume(end - start)
+        if start == 0 and end == len(chunk):
+            return chunk
+        return chunk[start:end]
+
+    def _consume(self, n: int) -> None:
+        self._size -= n
+        self._offset += n
+        if self._offset == len(self._chunks[0]):
+            self._chunks.popleft()
+            self._offset = 0
 
     async def _write(self, buffer: bytes):
         self._has_flushed = False
@@ -110,47 +268,10 @@ class AsyncFileObj(object):
         return self
 
     async def __anext__(self):
-        while True:
-            if not self._lines and self._eof:
-                raise StopAsyncIteration
-
-            if self._index >= len(self._lines) - 1:
-                tmp = await self.read(self._buffer_size)
-                if tmp:
-                    lines = tmp.splitlines(True)
-                    self._index = 0
-                    if self._lines:
-                        result = self._lines[0] + lines[0]
-                    else:
-                        result = lines[0]
-                    self._lines = lines[1:]
-                    return result
-                else:
-                    self._eof = True
-                    if not self._lines:
-                        raise StopAsyncIteration
-                    result = self._lines[-1]
-                    self._lines = []
-                    return result
-            else:
-                result = self._lines[self._index]
-                self._index += 1
-                return result
-
-            #
-            # tokens = self._buffer.split(b'\n', 1)
-            # if len(tokens) == 2:
-            #     self._buffer = tokens[1]
-            #     return tokens[0]
-            # else:
-            #     tmp = await self.read(self._buffer_size)
-            #     if tmp:
-            #         self._buffer += tmp
-            #     else:
-            #         if self._buffer:
-            #             return self._buffer
-            #         else:
-            #             raise StopAsyncIteration
+        line = await self.readline()
+        if not line:
+            raise StopAsyncIteration
+        return line
 
     async def flush(self):
         if self._has_flushed:
@@ -167,6 +288,16 @@ class AsyncFileObj(object):
             return
 
         await self.flush()
+        if self._pipeline is not None:
+            self._pipeline.cancel()
+            try:
+                await self._pipeline
+            except asyncio.CancelledError:
+                pass
+        if self._executor is not None:
+            # Cancelling the pipeline does not stop a block being decompressed,
+            # wait for it before closing the decompressor
+            await asyncio.to_thread(self._executor.shutdown)
         if hasattr(self._decompressor, "close"):
             self._decompressor.close()
 
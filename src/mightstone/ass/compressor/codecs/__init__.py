@@ -1,3 +1,10 @@
+import mmap
+from typing import Union
+
+Buffer = Union[bytes, bytearray, mmap.mmap]
+"""Compressed data that can be searched and sliced, such as a memory mapped file"""
+
+
 def error_import_usage(package: str):
     raise Exception(
         "Package {package} missing. Please install it: pip install {package}".format(
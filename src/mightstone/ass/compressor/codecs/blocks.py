@@ -0,0 +1,75 @@
+"""
+Parallel decompression of the independent blocks of bzip2 and xz data
+"""
+
+import bz2
+import itertools
+import lzma
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, Optional
+
+from mightstone.ass.compressor.codecs import Buffer
+from mightstone.ass.compressor.codecs.bzip2_codec import split_bzip2_blocks
+from mightstone.ass.compressor.codecs.lzma_codec import split_xz_blocks
+
+SPLITTERS: Dict[str, Callable[[Buffer], Iterator[bytes]]] = {
+    "bzip2": split_bzip2_blocks,
+    "lzma": split_xz_blocks,
+}
+
+DECOMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {
+    "bzip2": bz2.decompress,
+    "lzma": lzma.decompress,
+}
+
+INCREMENTAL_DECOMPRESSORS: Dict[str, Callable[[], Any]] = {
+    "bzip2": bz2.BZ2Decompressor,
+    "lzma": lzma.LZMADecompressor,
+}
+
+
+def decompress_blocks(
+    data: Buffer,
+    compression: str,
+    workers: Optional[int] = None,
+    chunk_size: int = 1024 * 1024,
+) -> Iterator[bytes]:
+    """
+    Decompress bzip2 or xz data, its blocks are decompressed in parallel by a pool of
+    threads (bz2 and lzma release the GIL), and yielded in order
+
+    At most two blocks by worker are decompressed ahead of the consumer. Data made of
+    a single block is decompressed incrementally instead.
+
+    :param data: The compressed data, such as a memory mapped file
+    :param compression: ``bzip2`` or ``lzma``
+    :param workers: Optional. The number of threads, the number of CPU by default
+    :param chunk_size: The size of the chunks fed to the decompressor, for data made
+                       of a single block
+    :return: An iterator of decompressed chunks
+    """
+    blocks = SPLITTERS[compression](data)
+    first = next(blocks, None)
+    second = next(blocks, None)
+    if first is None or second is None:
+        decompressor = INCREMENTAL_DECOMPRESSORS[compression]()
+        for i in range(0, len(data), chunk_size):
+            yield decompressor.decompress(data[i : i + chunk_size])
+        if not decompressor.eof:
+            raise EOFError("Compressed data ended before the end-of-stream marker")
+        return
+
+    workers = workers or os.cpu_count() or 1
+    executor = ThreadPoolExecutor(workers, "mightstone-blocks")
+    pending: Deque[Future] = deque()
+    try:
+        for block in itertools.chain((first, second), blocks):
+            pending.append(executor.submit(DECOMPRESSORS[compression], block))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
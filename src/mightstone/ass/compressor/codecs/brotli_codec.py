@@ -0,0 +1,44 @@
+from mightstone.ass.compressor.codecs import error_import_usage
+
+
+class BrotliCompressor(object):
+    # The default quality of brotli (11) is an order of magnitude slower to write
+    def __init__(self, quality: int = 5):
+        try:
+            import brotli
+        except ImportError:
+            error_import_usage("brotli")
+
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.finish()
+
+
+class BrotliDecompressor(object):
+    def __init__(self):
+        try:
+            import brotli
+        except ImportError:
+            error_import_usage("brotli")
+
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data: bytes) -> bytes:
+        return self._decompressor.process(data)
+
+    def flush(self) -> bytes:
+        if not self._decompressor.is_finished():
+            raise EOFError("Brotli stream ended before the end-of-stream marker")
+        return b""
+
+
+def get_brotli_encoder(quality: int = 5):
+    return BrotliCompressor(quality)
+
+
+def get_brotli_decoder():
+    return BrotliDecompressor()
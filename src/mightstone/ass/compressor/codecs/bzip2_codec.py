@@ -1,4 +1,13 @@
 import bz2
+from bisect import bisect_right
+from typing import Iterator, List
+
+from mightstone.ass.compressor.codecs import Buffer
+
+BLOCK_MAGIC = 0x314159265359
+"""The 48 bits starting a bzip2 block, they are not aligned on bytes"""
+END_OF_STREAM_MAGIC = 0x177245385090
+"""The 48 bits ending a bzip2 stream, followed by the combined CRC of its blocks"""
 
 
 def get_bzip2_encoder():
@@ -7,3 +16,62 @@ def get_bzip2_encoder():
 
 def get_bzip2_decoder():
     return bz2.BZ2Decompressor()
+
+
+def find_bits(data: Buffer, magic: int) -> List[int]:
+    """
+    Find every occurrence of a 48 bits pattern, at any bit offset
+
+    :param data: The buffer to search (bytes, or a memory mapped file)
+    :param magic: The 48 bits pattern
+    :return: The sorted offsets of the pattern, in bits
+    """
+    offsets = []
+    mask = (1 << 48) - 1
+    for shift in range(8):
+        # Shifted by ``shift`` bits, the pattern spans 7 bytes, the middle 5 of them
+        # are complete, search them then check the partial ones
+        expected = magic << (8 - shift)
+        window_mask = mask << (8 - shift)
+        needle = expected.to_bytes(7, "big")[1:6]
+        position = data.find(needle, 1)
+        while position != -1:
+            start = position - 1
+            window = bytes(data[start : start + 7]).ljust(7, b"\0")
+            if int.from_bytes(window, "big") & window_mask == expected:
+                offsets.append(start * 8 + shift)
+            position = data.find(needle, position + 1)
+    return sorted(offsets)
+
+
+def split_bzip2_blocks(data: Buffer) -> Iterator[bytes]:
+    """
+    Split bzip2 data (possibly made of several streams) into standalone streams of a
+    single block each, so that they can be decompressed independently
+
+    Each block is moved to a stream of its own, with a byte aligned header, and an
+    end of stream marker holding the block CRC as the combined CRC.
+
+    :param data: The bzip2 data
+    :raise ValueError: The data is truncated
+    :return: An iterator of bzip2 streams, in order
+    """
+    blocks = find_bits(data, BLOCK_MAGIC)
+    markers = sorted(blocks + find_bits(data, END_OF_STREAM_MAGIC))
+
+    for start in blocks:
+        index = bisect_right(markers, start)
+        if index == len(markers):
+            raise ValueError("Truncated bzip2 stream")
+        end = markers[index]
+
+        first, last = start // 8, (end + 7) // 8
+        length = end - start
+        bits = int.from_bytes(data[first:last], "big") >> (last * 8 - end)
+        bits &= (1 << length) - 1
+        crc = (bits >> (length - 80)) & 0xFFFFFFFF
+
+        bits = (((bits << 48) | END_OF_STREAM_MAGIC) << 32) | crc
+        length += 80
+        padding = -length % 8
+        yield b"BZh9" + (bits << padding).to_bytes((length + padding) // 8, "big")
@@ -1,4 +1,11 @@
 import lzma
+import zlib
+from typing import Iterator, List, Tuple
+
+from mightstone.ass.compressor.codecs import Buffer
+
+XZ_HEADER_MAGIC = b"\xfd7zXZ\x00"
+XZ_FOOTER_MAGIC = b"YZ"
 
 
 def get_lzma_encoder():
@@ -7,3 +14,100 @@ def get_lzma_encoder():
 
 def get_lzma_decoder():
     return lzma.LZMADecompressor()
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, position
+        shift += 7
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _pad(size: int) -> int:
+    return size + -size % 4
+
+
+def _xz_streams(data: Buffer):
+    """
+    Parse the index of every stream of xz data, from its end
+
+    :return: The offset of each stream, its header, footer flags, and the unpadded and
+             uncompressed size of its blocks
+    """
+    streams: List[Tuple[int, bytes, bytes, List[Tuple[int, int]]]] = []
+    end = len(data)
+    while end:
+        # Streams may be followed by padding, made of null bytes
+        while end >= 4 and data[end - 4 : end] == b"\0\0\0\0":
+            end -= 4
+        if not end:
+            break
+
+        footer = bytes(data[end - 12 : end])
+        if footer[10:] != XZ_FOOTER_MAGIC:
+            raise ValueError("Not a xz stream")
+        flags = footer[8:10]
+        index_start = end - 12 - (int.from_bytes(footer[4:8], "little") + 1) * 4
+        index = bytes(data[index_start : end - 12])
+        if index[0] != 0:
+            raise ValueError("Invalid xz index")
+
+        count, position = _read_varint(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, position = _read_varint(index, position)
+            uncompressed, position = _read_varint(index, position)
+            records.append((unpadded, uncompressed))
+
+        start = index_start - sum(_pad(unpadded) for unpadded, _ in records) - 12
+        header = bytes(data[start : start + 12])
+        if start < 0 or header[:6] != XZ_HEADER_MAGIC:
+            raise ValueError("Invalid xz index")
+        streams.append((start, header, flags, records))
+        end = start
+
+    return reversed(streams)
+
+
+def split_xz_blocks(data: Buffer) -> Iterator[bytes]:
+    """
+    Split xz data into standalone streams of a single block each, so that they can be
+    decompressed independently, from the index of its streams
+
+    xz only writes several blocks when compressing with multiple threads
+    (``xz -T``), or with ``--block-size``.
+
+    :param data: The xz data
+    :raise ValueError: The data is not a valid xz file
+    :return: An iterator of xz streams, in order
+    """
+    for start, header, flags, records in _xz_streams(data):
+        position = start + 12
+        for unpadded, uncompressed in records:
+            size = _pad(unpadded)
+            index = b"\0" + _varint(1) + _varint(unpadded) + _varint(uncompressed)
+            index += b"\0" * (-len(index) % 4)
+            index += zlib.crc32(index).to_bytes(4, "little")
+            backward_size = (len(index) // 4 - 1).to_bytes(4, "little")
+            footer = (
+                zlib.crc32(backward_size + flags).to_bytes(4, "little")
+                + backward_size
+                + flags
+                + XZ_FOOTER_MAGIC
+            )
+            yield header + bytes(data[position : position + size]) + index + footer
+            position += size
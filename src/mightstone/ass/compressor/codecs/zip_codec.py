@@ -0,0 +1,262 @@
+"""
+Streaming codec for ZIP archives holding a single member, such as the ones
+provided by MTGJSON
+
+The decoder reads the local file header, then inflates the member as it comes,
+everything after the member (data descriptor, central directory) is ignored.
+"""
+
+import struct
+import time
+import zlib
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+DATA_DESCRIPTOR = struct.Struct("<4sIII")
+DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+CENTRAL_DIRECTORY = struct.Struct("<4sHHHHHHIIIHHHHHII")
+CENTRAL_DIRECTORY_SIGNATURE = b"PK\x01\x02"
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sHHHHIIH")
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+
+STORED = 0
+DEFLATED = 8
+
+_VERSION = 20
+_ZIP64_LIMIT = 0xFFFFFFFF
+
+
+class ZipDecompressor:
+    """
+    Incrementally extract the first member of a ZIP archive
+
+    Only stored and deflated members are supported, their CRC-32 is verified once
+    the member is complete.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._header = True
+        self._trailer = b""
+        self._inflater = None
+        self._flags = 0
+        self._crc = 0
+        self._expected_crc = 0
+        self._remaining = 0
+        self.eof = False
+
+    def decompress(self, data: bytes) -> bytes:
+        if self._header:
+            self._pending += data
+            if not self._read_header():
+                return b""
+            data, self._pending = self._pending, b""
+
+        if self.eof:
+            self._keep_trailer(data)
+            return b""
+
+        if self._inflater is None:
+            out, data = data[: self._remaining], data[self._remaining :]
+            self._remaining -= len(out)
+            done = self._remaining == 0
+        else:
+            out = self._inflater.decompress(data)
+            data = self._inflater.unused_data
+            done = self._inflater.eof
+
+        self._crc = zlib.crc32(out, self._crc)
+        if done:
+            self.eof = True
+            self._keep_trailer(data)
+        return out
+
+    def flush(self) -> bytes:
+        if not self.eof:
+            raise EOFError("ZIP archive ended before the end of its member")
+
+        expected = self._expected_crc
+        if self._flags & FLAG_DATA_DESCRIPTOR:
+            trailer = self._trailer
+            if trailer[:4] == DATA_DESCRIPTOR_SIGNATURE:
+                trailer = trailer[4:]
+            if len(trailer) < 4:
+                raise EOFError("ZIP archive ended before its data descriptor")
+            expected = int.from_bytes(trailer[:4], "little")
+
+        if self._crc != expected:
+            raise ValueError("Bad CRC-32 for the ZIP member")
+        return b""
+
+    def _read_header(self) -> bool:
+        if len(self._pending) < LOCAL_HEADER.size:
+            return False
+
+        (
+            signature,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            _,
+            name_length,
+            extra_length,
+        ) = LOCAL_HEADER.unpack_from(self._pending)
+        if signature != LOCAL_HEADER_SIGNATURE:
+            raise ValueError("Not a ZIP archive")
+        if flags & FLAG_ENCRYPTED:
+            raise ValueError("Encrypted ZIP archives are not supported")
+
+        if method == DEFLATED:
+            self._inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == STORED:
+            if flags & FLAG_DATA_DESCRIPTOR or compressed_size == _ZIP64_LIMIT:
+                raise ValueError("Stored ZIP member of unknown size")
+            self._remaining = compressed_size
+        else:
+            raise ValueError(f"Unsupported ZIP compression method {method}")
+
+        start = LOCAL_HEADER.size + name_length + extra_length
+        if len(self._pending) < start:
+            return False
+
+        self._pending = self._pending[start:]
+        self._header = False
+        self._flags = flags
+        self._expected_crc = crc
+        self.eof = method == STORED and compressed_size == 0
+        return True
+
+    def _keep_trailer(self, data: bytes) -> None:
+        # Only the data descriptor matters, up to 24 bytes for ZIP64 archives
+        if len(self._trailer) < 24:
+            self._trailer = (self._trailer + data)[:24]
+
+
+class ZipCompressor:
+    """
+    Incrementally write a ZIP archive holding a single deflated member
+
+    As the archive is written as a stream, the CRC-32 and the sizes of the member
+    are written in a data descriptor after its data. Members larger than 4 GiB
+    (ZIP64) are not supported.
+
+    :param name: The name of the member in the archive
+    :param compress_level: The deflate level, from 0 to 9
+    """
+
+    def __init__(self, name: str = "data", compress_level: int = -1):
+        self._name = name.encode("utf-8")
+        self._deflater = zlib.compressobj(
+            compress_level, zlib.DEFLATED, -zlib.MAX_WBITS
+        )
+        self._crc = 0
+        self._size = 0
+        self._compressed_size = 0
+        self._started = False
+        self._flushed = False
+        self._time, self._date = self._dos_time()
+
+    def compress(self, data: bytes) -> bytes:
+        self._crc = zlib.crc32(data, self._crc)
+        self._size += len(data)
+        if self._size > _ZIP64_LIMIT:
+            raise ValueError("ZIP members larger than 4 GiB are not supported")
+
+        out = self._deflater.compress(data)
+        self._compressed_size += len(out)
+        return self._start() + out
+
+    def flush(self) -> bytes:
+        if self._flushed:
+            return b""
+        self._flushed = True
+
+        header = self._start()
+        out = self._deflater.flush()
+        self._compressed_size += len(out)
+        descriptor = DATA_DESCRIPTOR.pack(
+            DATA_DESCRIPTOR_SIGNATURE, self._crc, self._compressed_size, self._size
+        )
+        offset = (
+            LOCAL_HEADER.size
+            + len(self._name)
+            + self._compressed_size
+            + len(descriptor)
+        )
+        central_directory = (
+            CENTRAL_DIRECTORY.pack(
+                CENTRAL_DIRECTORY_SIGNATURE,
+                _VERSION,
+                _VERSION,
+                FLAG_DATA_DESCRIPTOR,
+                DEFLATED,
+                self._time,
+                self._date,
+                self._crc,
+                self._compressed_size,
+                self._size,
+                len(self._name),
+                0,
+                0,
+                0,
+                0,
+                0,
+                0,
+            )
+            + self._name
+        )
+        end = END_OF_CENTRAL_DIRECTORY.pack(
+            END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+            0,
+            0,
+            1,
+            1,
+            len(central_directory),
+            offset,
+            0,
+        )
+        return header + out + descriptor + central_directory + end
+
+    def _start(self) -> bytes:
+        if self._started:
+            return b""
+        self._started = True
+        return (
+            LOCAL_HEADER.pack(
+                LOCAL_HEADER_SIGNATURE,
+                _VERSION,
+                FLAG_DATA_DESCRIPTOR,
+                DEFLATED,
+                self._time,
+                self._date,
+                0,
+                0,
+                0,
+                len(self._name),
+                0,
+            )
+            + self._name
+        )
+
+    @staticmethod
+    def _dos_time():
+        now = time.localtime()
+        return (
+            now.tm_hour << 11 | now.tm_min << 5 | now.tm_sec // 2,
+            max(now.tm_year - 1980, 0) << 9 | now.tm_mon << 5 | now.tm_mday,
+        )
+
+
+def get_zip_encoder(name: str = "data", compress_level: int = -1):
+    return ZipCompressor(name, compress_level)
+
+
+def get_zip_decoder():
+    return ZipDecompressor()
@@ -0,0 +1,45 @@
+from typing import Iterable, Optional
+
+from mightstone.ass.compressor.codecs import error_import_usage
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        error_import_usage("zstandard")
+    return zstandard
+
+
+def _dictionary(dictionary: Optional[bytes]):
+    if dictionary is None:
+        return None
+    return _zstandard().ZstdCompressionDict(dictionary)
+
+
+def get_zstd_encoder(compress_level: int = 3, dictionary: Optional[bytes] = None):
+    return (
+        _zstandard()
+        .ZstdCompressor(level=compress_level, dict_data=_dictionary(dictionary))
+        .compressobj()
+    )
+
+
+def get_zstd_decoder(dictionary: Optional[bytes] = None):
+    return (
+        _zstandard()
+        .ZstdDecompressor(dict_data=_dictionary(dictionary))
+        .decompressobj(read_across_frames=True)
+    )
+
+
+def train_zstd_dictionary(samples: Iterable[bytes], size: int = 112640) -> bytes:
+    """
+    Train a zstd dictionary, that improves the compression of small documents
+    sharing the same structure, such as cards
+
+    :param samples: Documents similar to the ones to compress
+    :param size: The maximum size of the dictionary in bytes
+    :return: The dictionary, to provide to both the encoder and the decoder
+    """
+    return _zstandard().train_dictionary(size, list(samples)).as_bytes()
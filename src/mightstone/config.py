@@ -2,11 +2,14 @@ import json
 import logging
 import os
 import pathlib
+import re
 from enum import Enum
-from typing import Literal, Optional, Tuple, Type, Union
+from fnmatch import fnmatchcase
+from typing import Dict, List, Literal, Optional, Tuple, Type, Union
 
 import toml
 import yaml
+from pydantic import BaseModel
 from pydantic.networks import MongoDsn
 from pydantic_settings import (
     BaseSettings,
@@ -19,7 +22,7 @@ from pydantic_settings import (
 )
 from slugify import slugify
 
-from mightstone.core import MightstoneError
+from mightstone.core import MightstoneError, Validation
 
 logger = logging.getLogger("mightstone")
 
@@ -38,15 +41,107 @@ class IjsonEnum(str, Enum):
     PYTHON = "python"
 
 
+class CacheStorageEnum(str, Enum):
+    FILE = "file"
+    SQLITE = "sqlite"
+
+
+class EvictionPolicy(str, Enum):
+    LRU = "lru"
+    LFU = "lfu"
+
+
+class CachePolicy(BaseModel):
+    service: Optional[str] = None
+    """Name of the service (scryfall, mtgjson, edhrec...), any service if omitted"""
+    path: str = "*"
+    """A glob pattern matched against the request path"""
+    regex: bool = False
+    """Match ``path`` as a regular expression instead of a glob pattern"""
+    ttl: Optional[int] = None
+    """Number of seconds a response is fresh, the server headers are used if omitted"""
+    stale_while_revalidate: int = 0
+    """Number of seconds an expired response is served while refreshed, needs a ttl"""
+    no_store: bool = False
+    """Never read nor store the response in cache"""
+
+    def matches(self, service: Optional[str], path: str) -> bool:
+        if self.service is not None and self.service != service:
+            return False
+        if self.regex:
+            return re.search(self.path, path) is not None
+        return fnmatchcase(path, self.path)
+
+
+DEFAULT_CACHE_POLICIES = [
+    CachePolicy(service="scryfall", path="/bulk-data*", ttl=60 * 60),
+    CachePolicy(service="scryfall", path="/cards/random*", no_store=True),
+    CachePolicy(service="mtgjson", path="/api/v5/Meta.json*", ttl=60 * 60),
+    CachePolicy(ttl=60 * 60 * 24),
+]
+
+
 class HttpCacheSettings(BaseSettings):
     persist: bool = True
     directory: Optional[pathlib.Path] = None
     methods: list[str] = ["GET"]
     status: list[int] = [200, 203, 300, 301, 308]
+    storage: CacheStorageEnum = CacheStorageEnum.FILE
+    max_size: Optional[int] = None
+    max_entries: Optional[int] = None
+    eviction: EvictionPolicy = EvictionPolicy.LRU
+    policies: List[CachePolicy] = DEFAULT_CACHE_POLICIES
+    """Cache policies, the first policy that matches a request applies"""
+
+
+class HttpPoolSettings(BaseSettings):
+    max_connections: Optional[int] = 100
+    max_keepalive_connections: Optional[int] = 20
+    keepalive_expiry: Optional[float] = 30.0
+
+
+class RateLimitSettings(BaseModel):
+    rate: float
+    """Number of requests per second"""
+    burst: int = 1
+    """Number of requests that can be sent at once before throttling"""
+
+
+DEFAULT_RATE_LIMITS = {
+    # See: https://scryfall.com/docs/api#rate-limits-and-good-citizenship
+    "api.scryfall.com": RateLimitSettings(rate=10, burst=10),
+}
 
 
 class HttpSettings(BaseSettings):
     cache: HttpCacheSettings = HttpCacheSettings()
+    pool: HttpPoolSettings = HttpPoolSettings()
+    rate_limits: Dict[str, RateLimitSettings] = DEFAULT_RATE_LIMITS
+    rate_limit_retries: int = 3
+
+
+class MtgJsonSettings(BaseSettings):
+    directory: Optional[pathlib.Path] = None
+    """Mirror MTGJSON datasets in this directory, instead of the HTTP cache"""
+    workers: int = 0
+    """Validate MTGJSON models in a pool of processes, 0 validates them in process"""
+    batch_size: int = 64
+    """The number of items sent at once to a worker process"""
+    ordered: bool = True
+    """Whether items validated by worker processes keep the dataset order"""
+    validation: Validation = Validation.FULL
+    """Validate MTGJSON models (full), or trust the data (lazy or none)"""
+    decompression_thread: bool = False
+    """Decompress streamed MTGJSON datasets in a thread, instead of the event loop"""
+
+
+class ScryfallSettings(BaseSettings):
+    directory: Optional[pathlib.Path] = None
+    """Store Scryfall bulk data in this directory, instead of streaming it"""
+    compression: Optional[str] = None
+    """Compress the stored bulk data, such as zstd or gzip"""
+    prefetch: int = 1
+    """The number of pages fetched ahead when paginating, 0 to disable"""
 
 
 class InMemorySettings(BaseSettings):
@@ -70,6 +165,8 @@ class MightstoneSettings(BaseSettings):
     appname: str = "Mightstone"
     storage: Union[InMemorySettings, MotorSettings, FakeSettings] = InMemorySettings()
     http: HttpSettings = HttpSettings()
+    mtgjson: MtgJsonSettings = MtgJsonSettings()
+    scryfall: ScryfallSettings = ScryfallSettings()
     ijson: IjsonEnum = IjsonEnum.PYTHON
 
     model_config = SettingsConfigDict(
@@ -16,16 +16,18 @@ from hishel import (
 )
 from injector import Binder, Module, SingletonScope, provider, singleton
 
-from .config import DbImplem, InMemorySettings, MightstoneSettings
-from .hishel import MightstoneController
+from .config import CacheStorageEnum, DbImplem, InMemorySettings, MightstoneSettings
+from .hishel import MightstoneCacheTransport, MightstoneController, SQLiteStorage
 from .injector import cleaned
 from .services.cardconjurer import CardConjurer
 from .services.edhrec import EdhRecApi, EdhRecStatic
+from .services.edhrec.api import EdhRecProxiedStatic
 from .services.mtgjson import MtgJson
 from .services.scryfall import Scryfall
 from .services.wiki.api import Wiki
 from .services.wotc import RuleExplorer
 from .storage import MightstoneInMemoryContext, Mongod
+from .transport import RateLimiter, RateLimitTransport
 from .types import MightstoneIjsonBackend
 
 logger = logging.getLogger("mightstone")
@@ -141,6 +143,14 @@ class Httpx(Module):
             )
             os.makedirs(config.http.cache.directory)
 
+        if config.http.cache.storage == CacheStorageEnum.SQLITE:
+            return SQLiteStorage(
+                config.http.cache.directory.joinpath("cache.sqlite"),
+                max_size=config.http.cache.max_size,
+                max_entries=config.http.cache.max_entries,
+                eviction=config.http.cache.eviction,
+            )
+
         return AsyncFileStorage(base_path=config.http.cache.directory)
 
     @provider
@@ -149,22 +159,47 @@ class Httpx(Module):
         return MightstoneController(
             cacheable_methods=config.http.cache.methods,
             cacheable_status_codes=config.http.cache.status,
+            policies=config.http.cache.policies,
         )
 
     @provider
     @singleton
-    def httpx_transport(self) -> httpx.AsyncHTTPTransport:
-        return httpx.AsyncHTTPTransport(retries=2)
+    def httpx_transport(self, config: MightstoneSettings) -> httpx.AsyncHTTPTransport:
+        return httpx.AsyncHTTPTransport(
+            retries=2,
+            limits=httpx.Limits(
+                max_connections=config.http.pool.max_connections,
+                max_keepalive_connections=config.http.pool.max_keepalive_connections,
+                keepalive_expiry=config.http.pool.keepalive_expiry,
+            ),
+        )
 
     @provider
     @singleton
+    def rate_limiter(self, config: MightstoneSettings) -> RateLimiter:
+        return RateLimiter(config.http.rate_limits)
+
+    @provider
+    @singleton
+    def rate_limit_transport(
+        self,
+        config: MightstoneSettings,
+        transport: httpx.AsyncHTTPTransport,
+        limiter: RateLimiter,
+    ) -> RateLimitTransport:
+        return RateLimitTransport(
+            transport, limiter=limiter, retries=config.http.rate_limit_retries
+        )
+
+    @provider
+    @cleaned
     def cache_transport(
         self,
-        cache_transport: httpx.AsyncHTTPTransport,
+        cache_transport: RateLimitTransport,
         cache_storage: AsyncBaseStorage,
         cache_controller: MightstoneController,
     ) -> AsyncCacheTransport:
-        return AsyncCacheTransport(
+        return MightstoneCacheTransport(
             transport=cache_transport,
             storage=cache_storage,
             controller=cache_controller,
@@ -172,7 +207,7 @@ class Httpx(Module):
 
 
 class Services(Module):
-    @singleton
+    @cleaned
     @provider
     def rule_explorer(
         self,
@@ -181,16 +216,23 @@ class Services(Module):
     ) -> RuleExplorer:
         return RuleExplorer(transport=cache, ijson=ijson)
 
-    @singleton
+    @cleaned
     @provider
     def scryfall(
         self,
+        config: MightstoneSettings,
         cache: AsyncCacheTransport,
         ijson: MightstoneIjsonBackend,
     ) -> Scryfall:
-        return Scryfall(transport=cache, ijson=ijson)
+        return Scryfall(
+            transport=cache,
+            ijson=ijson,
+            directory=config.scryfall.directory,
+            compression=config.scryfall.compression,
+            prefetch=config.scryfall.prefetch,
+        )
 
-    @singleton
+    @cleaned
     @provider
     def edhrec_static(
         self,
@@ -199,7 +241,16 @@ class Services(Module):
     ) -> EdhRecStatic:
         return EdhRecStatic(transport=cache, ijson=ijson)
 
-    @singleton
+    @cleaned
+    @provider
+    def edhrec_proxied_static(
+        self,
+        cache: AsyncCacheTransport,
+        ijson: MightstoneIjsonBackend,
+    ) -> EdhRecProxiedStatic:
+        return EdhRecProxiedStatic(transport=cache, ijson=ijson)
+
+    @cleaned
     @provider
     def edhrec_api(
         self,
@@ -208,7 +259,7 @@ class Services(Module):
     ) -> EdhRecApi:
         return EdhRecApi(transport=cache, ijson=ijson)
 
-    @singleton
+    @cleaned
     @provider
     def card_conjurer(
         self,
@@ -217,16 +268,33 @@ class Services(Module):
     ) -> CardConjurer:
         return CardConjurer(transport=cache, ijson=ijson)
 
-    @singleton
+    @cleaned
     @provider
     def mtg_json(
         self,
+        config: MightstoneSettings,
+        appdirs: AppDirs,
         cache: AsyncCacheTransport,
         ijson: MightstoneIjsonBackend,
     ) -> MtgJson:
-        return MtgJson(transport=cache, ijson=ijson)
+        manifest = None
+        if config.http.cache.persist:
+            manifest = pathlib.Path(appdirs.user_cache_dir).joinpath(
+                "mtgjson", "manifest.json"
+            )
+        return MtgJson(
+            transport=cache,
+            ijson=ijson,
+            manifest=manifest,
+            directory=config.mtgjson.directory,
+            workers=config.mtgjson.workers,
+            batch_size=config.mtgjson.batch_size,
+            ordered=config.mtgjson.ordered,
+            validation=config.mtgjson.validation,
+            decompression_thread=config.mtgjson.decompression_thread,
+        )
 
-    @singleton
+    @cleaned
     @provider
     def wiki(
         self,
@@ -250,4 +318,4 @@ class Directories(Module):
         return AppDirs(config.appname)
 
 
-modules = [JSON, Configuration, Directories, Storage, Httpx]
+modules = [JSON, Configuration, Directories, Storage, Httpx, Services]
@@ -1,11 +1,30 @@
+import copy
 import datetime
+import functools
 import importlib
 import inspect
 import pkgutil
 import sys
+import types
 from abc import ABC
+from enum import Enum
 from types import ModuleType
-from typing import Any, Optional, Type, Union
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+    get_args,
+    get_origin,
+)
 from uuid import UUID
 
 from beanie import Document, PydanticObjectId
@@ -13,10 +32,14 @@ from beanie.exceptions import CollectionWasNotInitialized
 from beanie.odm.settings.document import DocumentSettings
 from pydantic import (
     BaseModel,
+    Field,
+    RootModel,
     ValidationInfo,
     ValidatorFunctionWrapHandler,
     WrapValidator,
+    create_model,
 )
+from pydantic_core import PydanticUndefined
 from pydantic_extra_types.color import Color
 
 
@@ -40,6 +63,16 @@ class MightstoneModel(ABC, BaseModel):
 
 
 class MightstoneDocument(MightstoneModel):
+    @classmethod
+    def infer_id(cls, value: Dict[str, Any]) -> Any:
+        """
+        Infer the id of a document from its raw data, if it does not provide one
+
+        :param value: The raw data of the document
+        :return: The document id, or None
+        """
+        return None
+
     def to_serializable(
         self,
     ):
@@ -53,6 +86,247 @@ class MightstoneDocument(MightstoneModel):
         return target_class.model_validate(self.model_dump())
 
 
+class Validation(str, Enum):
+    """
+    How upstream data is turned into models
+    """
+
+    FULL = "full"
+    """Validate the data with pydantic"""
+    LAZY = "lazy"
+    """Trust the data, build the models without validation, nested values are kept
+    raw (see ``construct()``)"""
+    NONE = "none"
+    """Trust the data, keep it raw, only adding inferred ids (see ``enrich()``)"""
+
+
+_M = TypeVar("_M", bound=BaseModel)
+
+
+def build(model: Type[_M], value: Any, validation: Validation = Validation.FULL):
+    """
+    Turn raw data into a model, according to a validation mode
+
+    :param model: The model class
+    :param value: The raw data
+    :param validation: The validation mode
+    :return: The model, or the enriched raw data using ``Validation.NONE``
+    """
+    if validation == Validation.NONE:
+        return enrich(model, value)
+    if validation == Validation.LAZY:
+        return construct(model, value)
+    return model.model_validate(value)
+
+
+def enrich(model: Type[BaseModel], value: Any) -> Any:
+    """
+    Add its inferred id to the raw data of a document, or keep only the fields of a
+    projection
+
+    :param model: The model class
+    :param value: The raw data
+    :return: The raw data
+    """
+    if isinstance(value, dict) and issubclass(model, MightstoneProjection):
+        return model.select(value)
+    if isinstance(value, dict) and "id" not in value:
+        if issubclass(model, MightstoneDocument):
+            inferred = model.infer_id(value)
+            if inferred is not None:
+                value["id"] = str(inferred)
+    return value
+
+
+def construct(model: Type[_M], value: Any) -> _M:
+    """
+    Build a model from trusted data, skipping validation
+
+    Just like ``model_construct()``, the nested values are kept raw, and not coerced:
+    a list of cards is a list of dict, a date is a string. The document id is
+    inferred.
+
+    :param model: The model class
+    :param value: The raw data
+    :return: The model
+    """
+    if issubclass(model, RootModel):
+        return model.model_construct(value)
+
+    names, constants, factories = _construct_plan(model)
+    values = constants.copy()
+    for name, factory in factories:
+        values[name] = factory()
+    fields_set = set()
+    for key, item in value.items():
+        field_name = names.get(key)
+        if field_name is not None:
+            values[field_name] = item
+            fields_set.add(field_name)
+
+    if model.__private_attributes__ or model.__pydantic_post_init__:
+        instance = model.model_construct(fields_set, **values)
+    else:
+        # model_construct() is comparatively slow, as it resolves defaults every time
+        instance = model.__new__(model)
+        object.__setattr__(instance, "__dict__", values)
+        object.__setattr__(instance, "__pydantic_fields_set__", fields_set)
+        object.__setattr__(instance, "__pydantic_extra__", None)
+        object.__setattr__(instance, "__pydantic_private__", None)
+
+    if issubclass(model, MightstoneDocument) and "id" in model.model_fields:
+        if instance.id is None:  # type: ignore
+            instance.id = model.infer_id(value)  # type: ignore
+    return instance
+
+
+@functools.lru_cache(maxsize=None)
+def _construct_plan(
+    model: Type[BaseModel],
+) -> Tuple[Dict[str, str], Dict[str, Any], List[Tuple[str, Callable[[], Any]]]]:
+    """
+    :return: The field names by alias (or name), the immutable default values, and
+             the factories of the other default values
+    """
+    names: Dict[str, str] = {}
+    constants: Dict[str, Any] = {}
+    factories: List[Tuple[str, Callable[[], Any]]] = []
+    for name, field in model.model_fields.items():
+        names.setdefault(name, name)
+        if field.alias:
+            names[field.alias] = name
+
+        default = field.default
+        if field.default_factory is not None:
+            factories.append((name, field.default_factory))  # type: ignore
+        elif default is PydanticUndefined:
+            continue
+        elif isinstance(default, (type(None), str, int, float, bool, tuple, Enum)):
+            constants[name] = default
+        elif isinstance(default, (list, dict, set)) and not default:
+            factories.append((name, type(default)))
+        else:
+            factories.append((name, functools.partial(copy.deepcopy, default)))
+
+    return names, constants, factories
+
+
+class MightstoneProjection(MightstoneModel):
+    """
+    A slim model, with only some fields of another model (see ``projection()``)
+    """
+
+    projected: ClassVar[Tuple[str, ...]] = ()
+    source: ClassVar[Tuple[Type[BaseModel], Tuple[str, ...]]]
+
+    @classmethod
+    def select(cls, value: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Keep only the projected fields of raw data (not the nested ones)
+        """
+        return {k: value[k] for k in cls.projected if k in value}
+
+    def __reduce__(self):
+        # Projections are generated, pickle can't find them by name
+        return _unpickle_projection, (*self.source, self.__getstate__())
+
+
+def _unpickle_projection(
+    model: Type[BaseModel], fields: Tuple[str, ...], state: Dict[str, Any]
+) -> MightstoneProjection:
+    cls = _projection(model, fields)
+    instance = cls.__new__(cls)
+    instance.__setstate__(state)
+    return instance
+
+
+_UNION_TYPES = (Union, getattr(types, "UnionType", Union))
+
+
+def projection(
+    model: Type[BaseModel], fields: Iterable[str]
+) -> Type[MightstoneProjection]:
+    """
+    Generate a slim model, with only some fields of a model
+
+    The other fields are ignored by validation. Fields are referenced by name or
+    alias, nested fields are separated by dots (such as ``cards.name``). Every field
+    of the projection is optional.
+
+    :param model: The model class
+    :param fields: The fields to keep
+    :raise ValueError: A field does not exist
+    :return: The projection model class
+    """
+    return _projection(model, tuple(fields))
+
+
+@functools.lru_cache(maxsize=None)
+def _projection(
+    model: Type[BaseModel], fields: Tuple[str, ...]
+) -> Type[MightstoneProjection]:
+    nested: Dict[str, List[str]] = {}
+    for path in fields:
+        head, _, rest = path.partition(".")
+        nested.setdefault(head, [])
+        if rest:
+            nested[head].append(rest)
+
+    names: Dict[str, str] = {}
+    for name, field in model.model_fields.items():
+        names.setdefault(name, name)
+        if field.alias:
+            names[field.alias] = name
+
+    definitions: Dict[str, Any] = {}
+    keys: List[str] = []
+    for head, subfields in nested.items():
+        if head not in names:
+            raise ValueError(f"{model.__name__} has no field {head}")
+        name = names[head]
+        field = model.model_fields[name]
+        annotation = field.annotation
+        if subfields:
+            annotation = _project_annotation(annotation, tuple(subfields))
+            if annotation is field.annotation:
+                raise ValueError(f"{model.__name__}.{head} has no nested fields")
+
+        definitions[name] = (Optional[annotation], Field(None, alias=field.alias))
+        keys.extend(filter(None, {name, field.alias}))
+
+    slim = create_model(  # type: ignore
+        f"{model.__name__}Projection", __base__=MightstoneProjection, **definitions
+    )
+    slim.projected = tuple(keys)
+    slim.source = (model, fields)
+    return slim
+
+
+def _project_annotation(annotation: Any, fields: Tuple[str, ...]) -> Any:
+    if inspect.isclass(annotation) and issubclass(annotation, BaseModel):
+        return _projection(annotation, fields)
+
+    origin = get_origin(annotation)
+    args = get_args(annotation)
+    if origin is Annotated:
+        projected = _project_annotation(args[0], fields)
+        if projected is args[0]:
+            return annotation
+        metadata = (projected,) + tuple(annotation.__metadata__)
+        return Annotated.__class_getitem__(metadata)
+
+    projected_args = tuple(_project_annotation(arg, fields) for arg in args)
+    if all(a is b for a, b in zip(projected_args, args)):
+        return annotation
+    if origin in _UNION_TYPES:
+        return Union[projected_args]
+    if origin is list:
+        return List[projected_args[0]]  # type: ignore
+    if origin is dict:
+        return Dict[projected_args[0], projected_args[1]]  # type: ignore
+    return annotation
+
+
 class MightstoneSerializableDocument(MightstoneModel, Document):
     id: Optional[Union[UUID, PydanticObjectId]] = None  # type: ignore
 
@@ -147,10 +421,18 @@ def patch_beanie_document(model: Type[Document]):
         if collection_name[-1] != "s":
             collection_name += "s"
 
+    # Keep the settings declared by the model itself, such as its indexes
+    declared = model.__dict__.get("Settings")
+    attributes = {
+        key: value
+        for key, value in vars(declared or object).items()
+        if not key.startswith("__")
+    }
     model.Settings = type(
         "Settings",
         (object,),
         {
+            **attributes,
             "bson_encoders": {
                 datetime.date: lambda dt: datetime.datetime(
                     year=dt.year,
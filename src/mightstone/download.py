@@ -0,0 +1,218 @@
+"""
+Resumable downloads of large files
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pathlib
+from typing import Optional, Union
+
+import aiofiles
+import httpx
+
+from mightstone.services import ServiceError
+from mightstone.transport import STREAM_EXTENSION
+
+logger = logging.getLogger("mightstone")
+
+
+def parse_content_range(value: Optional[str]) -> Optional[int]:
+    """
+    Parse the complete length of a ``Content-Range`` header value
+
+    :param value: The header value, such as ``bytes 200-999/1000`` or ``bytes */1000``
+    :return: The complete length, or None if it is absent or unknown
+    """
+    if not value or "/" not in value:
+        return None
+
+    total = value.rsplit("/", 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def file_sha256(path: Union[str, pathlib.Path], chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 hex digest of a file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Downloader:
+    """
+    Download large files to disk
+
+    The file is first written to a ``.part`` file next to its destination. When the
+    connection drops, the download resumes from the last received byte with a HTTP
+    ``Range`` request. Once complete, its size (and optionally its SHA-256 checksum)
+    is verified, then it is renamed to its destination.
+
+    The validator of the remote file (its ``ETag``, or else its ``Last-Modified``
+    date) is kept in a ``.part.validator`` file, and sent as ``If-Range`` when
+    resuming: if the remote file changed, the server sends it again from the start.
+    A part file without validator is only resumed if a checksum is provided to
+    verify the result, otherwise it is downloaded again.
+
+    Responses are streamed straight from the network, they never reach the HTTP
+    cache.
+
+    :param client: The HTTP client
+    :param retries: The number of attempts to resume an interrupted download
+    :param backoff: The delay in seconds before the first attempt to resume, then
+                    doubled for every attempt
+    """
+
+    def __init__(
+        self, client: httpx.AsyncClient, retries: int = 5, backoff: float = 1.0
+    ):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+
+    async def download(
+        self,
+        url: Union[str, httpx.URL],
+        destination: Union[str, pathlib.Path],
+        sha256: Optional[str] = None,
+    ) -> pathlib.Path:
+        """
+        Download a file
+
+        :param url: The file url
+        :param destination: The local path of the file
+        :param sha256: Optional. The expected SHA-256 hex digest of the file
+        :return: The local path of the file
+        """
+        destination = pathlib.Path(destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        part = destination.with_name(f"{destination.name}.part")
+        validator = destination.with_name(f"{destination.name}.part.validator")
+
+        attempt = 0
+        while True:
+            try:
+                size = await self._fetch(url, part, validator, trusted=bool(sha256))
+                break
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise ServiceError(
+                        message=f"Failed to download {url}, {e}",
+                        url=url,
+                        method="GET",
+                    )
+                attempt += 1
+                logger.warning(
+                    "Download of %s interrupted (%s), resuming (attempt %d/%d)",
+                    url,
+                    e,
+                    attempt,
+                    self.retries,
+                )
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+
+        validator.unlink(missing_ok=True)
+        received = part.stat().st_size
+        if size is not None and received != size:
+            part.unlink()
+            raise ServiceError(
+                message=f"Downloaded {received} bytes instead of {size}",
+                url=url,
+                method="GET",
+            )
+
+        if sha256:
+            checksum = await asyncio.to_thread(file_sha256, part)
+            if checksum != sha256.lower():
+                part.unlink()
+                raise ServiceError(
+                    message=f"SHA-256 mismatch, got {checksum} instead of {sha256}",
+                    url=url,
+                    method="GET",
+                )
+
+        os.replace(part, destination)
+        return destination
+
+    async def _fetch(
+        self,
+        url: Union[str, httpx.URL],
+        part: pathlib.Path,
+        validator: pathlib.Path,
+        trusted: bool = False,
+    ) -> Optional[int]:
+        """
+        Fetch the file into its part file, resuming it if possible
+
+        :param trusted: The part file will be verified by a checksum, it can be
+                        resumed even without a validator
+        """
+        offset = part.stat().st_size if part.exists() else 0
+        if_range = validator.read_text() if validator.exists() else None
+        if offset and not (if_range or trusted):
+            logger.info("Unable to check %s still matches %s, restarting", part, url)
+            offset = 0
+
+        # Byte ranges must apply to the file itself, not to an encoded transfer
+        headers = {"accept-encoding": "identity"}
+        if offset:
+            headers["range"] = f"bytes={offset}-"
+            if if_range:
+                headers["if-range"] = if_range
+
+        async with self.client.stream(
+            "GET", url, headers=headers, extensions={STREAM_EXTENSION: True}
+        ) as response:
+            if response.status_code == 416 and offset:
+                size = parse_content_range(response.headers.get("content-range"))
+                if size == offset:
+                    return size
+                # The part file does not match the remote file anymore
+                part.unlink()
+                validator.unlink(missing_ok=True)
+                return await self._fetch(url, part, validator, trusted)
+
+            try:
+                response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                raise ServiceError(
+                    message="Failed to download file",
+                    url=e.request.url,
+                    method=e.request.method,
+                    status=e.response.status_code,
+                    data=None,
+                )
+
+            if response.status_code == 206:
+                size = parse_content_range(response.headers.get("content-range"))
+            else:
+                # A complete response: the range, or the validator, was not honoured
+                offset = 0
+                length = response.headers.get("content-length", "")
+                size = int(length) if length.isdigit() else None
+                self._store_validator(response, validator)
+
+            if response.headers.get("content-encoding", "identity") != "identity":
+                # The announced size is the one of the encoded transfer
+                size = None
+
+            async with aiofiles.open(part, "ab" if offset else "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    await f.write(chunk)
+
+        return size
+
+    @staticmethod
+    def _store_validator(response: httpx.Response, validator: pathlib.Path) -> None:
+        etag = response.headers.get("etag")
+        # Weak entity tags can't be used with If-Range
+        if etag and not etag.startswith("W/"):
+            validator.write_text(etag)
+        elif response.headers.get("last-modified"):
+            validator.write_text(response.headers["last-modified"])
+        else:
+            validator.unlink(missing_ok=True)
@@ -1,10 +1,601 @@
-from hishel import Controller
+import asyncio
+import datetime
+import json
+import logging
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple, TypeVar, Union
+
+import httpcore
+import httpx
+from hishel import AsyncBaseStorage, AsyncCacheTransport, Controller
+
+# Those helpers (and the private methods of Controller used below) are not part
+# of the public API of hishel, that is pinned to an exact version for this
+# reason: check them when upgrading hishel.
+from hishel._controller import (
+    extract_header_values_decoded,
+    get_age,
+    header_presents,
+    parse_cache_control,
+)
+from hishel._serializers import Metadata
+from hishel._utils import normalized_url
 from httpcore import Request, Response
 
+from mightstone.config import CachePolicy, EvictionPolicy
+from mightstone.transport import STREAM_EXTENSION
+
+HEADERS_ENCODING = "iso-8859-1"
+KNOWN_RESPONSE_EXTENSIONS = ("http_version", "reason_phrase")
+KNOWN_REQUEST_EXTENSIONS = ("timeout", "sni_hostname")
+SERVICE_EXTENSION = "mightstone_service"
+"""Request extension holding the name of the service that sent the request"""
+STALE_EXTENSION = "mightstone_stale"
+"""Response extension set on stale responses served while they are refreshed"""
+_REPLACED_EXTENSION = "mightstone_replaced"
+
+logger = logging.getLogger("mightstone")
+
+StoredResponse = Tuple[Response, Request, Metadata]
+
+_R = TypeVar("_R")
+
 
 class MightstoneController(Controller):
+    """
+    A hishel controller that applies the Mightstone cache policies
+
+    The first policy matching the service name (see ``SERVICE_EXTENSION``) and the
+    path of a request applies: ``no_store`` bypasses the cache, while ``ttl``
+    overrides the freshness lifetime announced by the server. Once expired, a
+    response is still served during ``stale_while_revalidate`` seconds, flagged with
+    ``STALE_EXTENSION`` so that ``MightstoneCacheTransport`` refreshes it.
+
+    :param policies: Optional. The cache policies, no policy applies if omitted
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        policies: Optional[Iterable[CachePolicy]] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.policies = list(policies or [])
+
+    def policy(self, request: Request) -> Optional[CachePolicy]:
+        service = request.extensions.get(SERVICE_EXTENSION)
+        path = request.url.target.decode("ascii").split("?", 1)[0]
+        return next((p for p in self.policies if p.matches(service, path)), None)
+
+    def is_cachable(self, request: Request, response: Response) -> bool:
+        policy = self.policy(request)
+        if policy is None or request.extensions.get("force_cache"):
+            return super().is_cachable(request, response)
+        if policy.no_store:
+            return False
+        if policy.ttl is None or response.status not in self._cacheable_status_codes:
+            return super().is_cachable(request, response)
+
+        request_cache_control = parse_cache_control(
+            extract_header_values_decoded(request.headers, b"cache-control")
+        )
+        response_cache_control = parse_cache_control(
+            extract_header_values_decoded(response.headers, b"cache-control")
+        )
+        return (
+            request.method.decode("ascii") in self._cacheable_methods
+            and not request_cache_control.no_store
+            and not response_cache_control.no_store
+            and header_presents(response.headers, b"date")
+        )
+
+    def construct_response_from_cache(
+        self, request: Request, response: Response, original_request: Request
+    ) -> Union[Response, Request, None]:
+        policy = self.policy(request)
+        if (
+            policy is None
+            or response.status in (301, 308)
+            or request.extensions.get("force_cache")
+        ):
+            return super().construct_response_from_cache(
+                request, response, original_request
+            )
+        if policy.no_store:
+            return None
+        if policy.ttl is None:
+            return super().construct_response_from_cache(
+                request, response, original_request
+            )
+
+        if not self._validate_vary(
+            request=request, response=response, original_request=original_request
+        ):
+            return None
+
+        request_cache_control = parse_cache_control(
+            extract_header_values_decoded(request.headers, b"cache-control")
+        )
+        if request_cache_control.no_cache or not header_presents(
+            response.headers, b"date"
+        ):
+            self._make_request_conditional(request=request, response=response)
+            return request
+
+        age = get_age(response, self._clock)
+        if age < policy.ttl:
+            return response
+
+        if age < policy.ttl + policy.stale_while_revalidate:
+            stale = Response(
+                status=response.status,
+                headers=response.headers,
+                content=response.content,
+                extensions={**response.extensions, STALE_EXTENSION: True},
+            )
+            stale.read()
+            return stale
+
+        self._make_request_conditional(request=request, response=response)
+        return request
+
+    def handle_validation_response(
+        self, old_response: Response, new_response: Response
+    ) -> Response:
+        response = super().handle_validation_response(old_response, new_response)
+        if response is new_response:
+            # hishel does not store a response replaced during revalidation
+            response.extensions[_REPLACED_EXTENSION] = True
+        return response
+
     # See: https://github.com/karpetrosyan/hishel/issues/238
     def _make_request_conditional(self, request: Request, response: Response) -> None:
         super()._make_request_conditional(request, response)
 
         request.headers = list(dict(request.headers).items())
+
+
+class MightstoneCacheTransport(AsyncCacheTransport):
+    """
+    A hishel cache transport that refreshes stale responses in the background
+
+    When ``MightstoneController`` serves a stale response, it is immediately
+    returned, while a background task revalidates it. Refreshes are de-duplicated,
+    only one task runs at a time for a given request.
+
+    Unlike hishel, responses replaced during a revalidation are stored, and requests
+    flagged with ``STREAM_EXTENSION`` are streamed without being buffered.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._refreshing: Dict[Tuple[str, str], asyncio.Task] = {}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.extensions.get(STREAM_EXTENSION):
+            return await self._transport.handle_async_request(request)
+
+        response = await super().handle_async_request(request)
+
+        if response.extensions.pop(_REPLACED_EXTENSION, False):
+            await self._store(request, await _read_response(response))
+
+        if response.extensions.get(STALE_EXTENSION):
+            self._schedule_refresh(request)
+
+        return response
+
+    def _schedule_refresh(self, request: httpx.Request) -> None:
+        key = (request.method, str(request.url))
+        if key in self._refreshing:
+            return
+
+        request = httpx.Request(
+            request.method,
+            request.url,
+            headers=request.headers,
+            extensions=dict(request.extensions),
+        )
+        task = asyncio.create_task(self._refresh(request))
+        self._refreshing[key] = task
+        task.add_done_callback(lambda _: self._refreshing.pop(key, None))
+
+    async def _refresh(self, request: httpx.Request) -> None:
+        cache_request, key = self._cache_request(request)
+        try:
+            stored = await self._storage.retrieve(key)
+            if stored is None:
+                return
+
+            stale, _, _ = stored
+            stale.read()
+            conditional = Request(
+                method=cache_request.method,
+                url=cache_request.url,
+                headers=list(cache_request.headers),
+                extensions=cache_request.extensions,
+            )
+            self._controller._make_request_conditional(conditional, stale)
+
+            response = await self._transport.handle_async_request(
+                httpx.Request(
+                    request.method,
+                    request.url,
+                    headers=conditional.headers,
+                    extensions=request.extensions,
+                )
+            )
+            try:
+                fresh = await _read_response(response)
+            finally:
+                await response.aclose()
+
+            fresh = self._controller.handle_validation_response(
+                old_response=stale, new_response=fresh
+            )
+            fresh.extensions.pop(_REPLACED_EXTENSION, None)
+            fresh.extensions.pop(STALE_EXTENSION, None)
+            await self._store(request, fresh)
+        except Exception as e:
+            logger.warning("Unable to refresh %s in the background: %s", request.url, e)
+
+    def _cache_request(self, request: httpx.Request) -> Tuple[Request, str]:
+        cache_request = Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            extensions=request.extensions,
+        )
+        return cache_request, self._controller._key_generator(cache_request, b"")
+
+    async def _store(self, request: httpx.Request, response: Response) -> None:
+        if request.method not in ("GET", "HEAD"):
+            return
+
+        cache_request, key = self._cache_request(request)
+        if self._controller.is_cachable(request=cache_request, response=response):
+            await self._storage.store(key, response=response, request=cache_request)
+
+    async def aclose(self) -> None:
+        loop = asyncio.get_running_loop()
+        tasks = [t for t in self._refreshing.values() if t.get_loop() is loop]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await super().aclose()
+
+
+async def _read_response(response: httpx.Response) -> Response:
+    cache_response = Response(
+        status=response.status_code,
+        headers=response.headers.raw,
+        content=await response.aread(),
+        extensions=dict(response.extensions),
+    )
+    cache_response.read()
+    return cache_response
+
+
+class SQLiteStorage(AsyncBaseStorage):
+    """
+    A bounded hishel storage, backed by a single SQLite database (in WAL mode)
+
+    Response bodies are stored as raw blobs, their headers and metadata as JSON.
+    Once the storage exceeds ``max_size`` bytes or ``max_entries`` responses, the
+    least recently used (LRU) or least frequently used (LFU) responses are evicted.
+
+    Hits, misses and evictions are counted in the ``hits``, ``misses`` and
+    ``evictions`` attributes.
+
+    :param path: The SQLite database file
+    :param max_size: Optional. The maximum size of the stored bodies, in bytes
+    :param max_entries: Optional. The maximum number of stored responses
+    :param eviction: The eviction policy, either LRU or LFU
+    :param ttl: Optional. The maximum number of seconds a response can be cached
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            request TEXT NOT NULL,
+            response TEXT NOT NULL,
+            content BLOB NOT NULL,
+            metadata TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            accessed_at REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS responses_created_at ON responses(created_at);
+        CREATE INDEX IF NOT EXISTS responses_lru ON responses(accessed_at);
+        CREATE INDEX IF NOT EXISTS responses_lfu ON responses(hits, accessed_at);
+    """
+
+    def __init__(
+        self,
+        path: Union[str, pathlib.Path],
+        max_size: Optional[int] = None,
+        max_entries: Optional[int] = None,
+        eviction: EvictionPolicy = EvictionPolicy.LRU,
+        ttl: Optional[Union[int, float]] = None,
+    ) -> None:
+        super().__init__(ttl=ttl)
+        self.path = pathlib.Path(path)
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.eviction = EvictionPolicy(eviction)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def store(
+        self,
+        key: str,
+        response: Response,
+        request: Request,
+        metadata: Optional[Metadata] = None,
+    ) -> None:
+        metadata = metadata or Metadata(
+            cache_key=key,
+            created_at=datetime.datetime.now(datetime.timezone.utc),
+            number_of_uses=0,
+        )
+        await self._run(self._store, key, response, request, metadata)
+
+    async def update_metadata(
+        self, key: str, response: Response, request: Request, metadata: Metadata
+    ) -> None:
+        updated = await self._run(self._update_metadata, key, response, metadata)
+        if not updated:
+            await self.store(key, response, request, metadata)
+
+    async def retrieve(self, key: str) -> Optional[StoredResponse]:
+        stored = await self._run(self._retrieve, key)
+        if stored is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return stored
+
+    async def remove(self, key: str) -> None:
+        await self._run(self._remove, key)
+
+    async def statistics(self) -> Dict[str, int]:
+        """
+        :return: The hits, misses and evictions counters, along with the current
+                 number of entries and size of the storage
+        """
+        entries, size = await self._run(self._usage)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size": size,
+        }
+
+    async def aclose(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    async def _run(self, fn: Callable[..., _R], *args: Any) -> _R:
+        return await asyncio.to_thread(self._call, fn, *args)
+
+    def _call(self, fn: Callable[..., _R], *args: Any) -> _R:
+        with self._lock:
+            if self._connection is None:
+                self._connection = self._connect()
+            with self._connection:
+                return fn(self._connection, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(self.SCHEMA)
+        return connection
+
+    def _store(
+        self,
+        connection: sqlite3.Connection,
+        key: str,
+        response: Response,
+        request: Request,
+        metadata: Metadata,
+    ) -> None:
+        now = time.time()
+        content = response.content
+        connection.execute(
+            "INSERT OR REPLACE INTO responses"
+            "(key, request, response, content, metadata, size, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                dump_request(request),
+                dump_response(response),
+                content,
+                dump_metadata(metadata),
+                len(content),
+                now,
+                now,
+            ),
+        )
+        if self._ttl is not None:
+            connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self._ttl,)
+            )
+        self._evict(connection, keep=key)
+
+    def _update_metadata(
+        self,
+        connection: sqlite3.Connection,
+        key: str,
+        response: Response,
+        metadata: Metadata,
+    ) -> bool:
+        # Headers may have been refreshed by a revalidation, the body is unchanged
+        cursor = connection.execute(
+            "UPDATE responses SET response = ?, metadata = ? WHERE key = ?",
+            (dump_response(response), dump_metadata(metadata), key),
+        )
+        return cursor.rowcount > 0
+
+    def _retrieve(
+        self, connection: sqlite3.Connection, key: str
+    ) -> Optional[StoredResponse]:
+        row = connection.execute(
+            "SELECT request, response, content, metadata, created_at"
+            " FROM responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+
+        request, response, content, metadata, created_at = row
+        now = time.time()
+        if self._ttl is not None and created_at + self._ttl < now:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            return None
+
+        connection.execute(
+            "UPDATE responses SET accessed_at = ?, hits = hits + 1 WHERE key = ?",
+            (now, key),
+        )
+        return (
+            load_response(response, content),
+            load_request(request),
+            load_metadata(metadata),
+        )
+
+    def _remove(self, connection: sqlite3.Connection, key: str) -> None:
+        connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def _usage(self, connection: sqlite3.Connection) -> Tuple[int, int]:
+        entries, size = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        return entries, size
+
+    def _evict(self, connection: sqlite3.Connection, keep: str) -> None:
+        if self.max_size is None and self.max_entries is None:
+            return
+
+        entries, size = self._usage(connection)
+        max_entries = self.max_entries if self.max_entries is not None else entries
+        max_size = self.max_size if self.max_size is not None else size
+        if entries <= max_entries and size <= max_size:
+            return
+
+        order = "accessed_at"
+        if self.eviction == EvictionPolicy.LFU:
+            order = "hits, accessed_at"
+
+        evicted = []
+        for key, item_size in connection.execute(
+            f"SELECT key, size FROM responses WHERE key != ? ORDER BY {order}",  # nosec
+            (keep,),
+        ):
+            if entries <= max_entries and size <= max_size:
+                break
+            evicted.append((key,))
+            entries -= 1
+            size -= item_size
+
+        connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+
+def dump_request(request: Request) -> str:
+    return json.dumps(
+        {
+            "method": request.method.decode("ascii"),
+            "url": normalized_url(request.url),
+            "headers": [
+                (key.decode(HEADERS_ENCODING), value.decode(HEADERS_ENCODING))
+                for key, value in request.headers
+            ],
+            "extensions": {
+                key: value
+                for key, value in request.extensions.items()
+                if key in KNOWN_REQUEST_EXTENSIONS
+            },
+        }
+    )
+
+
+def load_request(data: str) -> Request:
+    payload = json.loads(data)
+    return Request(
+        method=payload["method"],
+        url=payload["url"],
+        headers=[
+            (key.encode(HEADERS_ENCODING), value.encode(HEADERS_ENCODING))
+            for key, value in payload["headers"]
+        ],
+        extensions=payload["extensions"],
+    )
+
+
+def dump_response(response: Response) -> str:
+    return json.dumps(
+        {
+            "status": response.status,
+            "headers": [
+                (key.decode(HEADERS_ENCODING), value.decode(HEADERS_ENCODING))
+                for key, value in response.headers
+            ],
+            "extensions": {
+                key: value.decode("ascii")
+                for key, value in response.extensions.items()
+                if key in KNOWN_RESPONSE_EXTENSIONS
+            },
+        }
+    )
+
+
+def load_response(data: str, content: bytes) -> Response:
+    payload = json.loads(data)
+    return Response(
+        status=payload["status"],
+        headers=[
+            (key.encode(HEADERS_ENCODING), value.encode(HEADERS_ENCODING))
+            for key, value in payload["headers"]
+        ],
+        content=content,
+        extensions={
+            key: value.encode("ascii") for key, value in payload["extensions"].items()
+        },
+    )
+
+
+def dump_metadata(metadata: Metadata) -> str:
+    return json.dumps(
+        {
+            "cache_key": metadata["cache_key"],
+            "number_of_uses": metadata["number_of_uses"],
+            "created_at": metadata["created_at"].isoformat(),
+        }
+    )
+
+
+def load_metadata(data: str) -> Metadata:
+    payload = json.loads(data)
+    return Metadata(
+        cache_key=payload["cache_key"],
+        number_of_uses=payload["number_of_uses"],
+        created_at=datetime.datetime.fromisoformat(payload["created_at"]),
+    )
@@ -1,4 +1,4 @@
-from typing import Any, Type, TypeVar, Union
+from typing import Any, List, Type, TypeVar, Union
 
 from injector import Injector, Provider, Scope, ScopeDecorator, SingletonScope
 
@@ -14,23 +14,50 @@ class CleanupScope(SingletonScope):
     def __init__(self, injector: Injector) -> None:
         super().__init__(injector)
         # We have singletons here, so never cache them twice, since otherwise
-        # the cleanup method might be invoked twice.
-        self.cachedProviders: set[Provider[Any]] = set()
+        # the cleanup method might be invoked twice. Providers are kept in their
+        # creation order, so that they are released in the reverse order.
+        self.cachedProviders: List[Provider[Any]] = []
 
     def get(self, key: Type[T], provider_: Provider[T]) -> Provider[T]:
         obj = super().get(key, provider_)
-        self.cachedProviders.add(obj)
+        if obj not in self.cachedProviders:
+            self.cachedProviders.append(obj)
         return obj
 
+    def forget(self, providers: List[Provider[Any]]) -> None:
+        """
+        Drop cached objects, so that they are built again on their next access
+        """
+        self.cachedProviders = [p for p in self.cachedProviders if p not in providers]
+        self._context = {k: p for k, p in self._context.items() if p not in providers}
+
 
 class CleanupInjector(Injector):
     def cleanup(self):
         cleanup_scope = self.get(CleanupScope)
-        for cached_provider in cleanup_scope.cachedProviders:
+        for cached_provider in reversed(cleanup_scope.cachedProviders):
             obj = cached_provider.get(self)
             if hasattr(obj, "cleanup") and callable(obj.cleanup):
                 obj.cleanup()
 
+    async def aclose(self):
+        """
+        Release asynchronous resources (such as HTTP clients and transports) held by
+        the objects built in the cleanup scope
+
+        Objects are released in the reverse order of their creation, so that an
+        object is released before the resources it depends on. Released objects are
+        then dropped from the scope, they are built again if requested later.
+        """
+        cleanup_scope = self.get(CleanupScope)
+        closed = []
+        for cached_provider in reversed(list(cleanup_scope.cachedProviders)):
+            obj = cached_provider.get(self)
+            if hasattr(obj, "aclose") and callable(obj.aclose):
+                await obj.aclose()
+                closed.append(cached_provider)
+        cleanup_scope.forget(closed)
+
 
 cleaned = ScopeDecorator(CleanupScope)
 ScopeType = Union[ScopeDecorator, Type[Scope], None]
@@ -0,0 +1,76 @@
+"""
+Locks shared by the processes of a host
+"""
+
+import asyncio
+import os
+import pathlib
+import sys
+from typing import Optional, Union
+
+if sys.platform == "win32":  # pragma: no cover
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    An exclusive lock on a file, shared by every process of the host
+
+    :param path: The lock file, created if needed
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]):
+        self.path = pathlib.Path(path)
+        self._fd: Optional[int] = None
+
+    def acquire(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        try:
+            if sys.platform == "win32":  # pragma: no cover
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+
+        fd, self._fd = self._fd, None
+        try:
+            if sys.platform == "win32":  # pragma: no cover
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    async def __aenter__(self):
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.acquire))
+        try:
+            await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The thread keeps waiting for the lock, release it once taken
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+    def _release_acquired(self, acquiring: "asyncio.Future[None]") -> None:
+        if not acquiring.cancelled() and acquiring.exception() is None:
+            self.release()
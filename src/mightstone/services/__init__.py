@@ -1,14 +1,25 @@
 import asyncio
+import warnings
 from typing import Optional
 
+import httpx
 import ijson as ijson_module
-from hishel import AsyncCacheClient, AsyncCacheTransport
+from hishel import AsyncCacheTransport
 from httpx import Timeout
 from injector import inject
 
 from .. import __version__
+from ..config import DEFAULT_CACHE_POLICIES
+from ..hishel import SERVICE_EXTENSION, MightstoneCacheTransport, MightstoneController
+from ..transport import CoalescingTransport, RateLimiter, RateLimitTransport
 from ..types import MightstoneIjsonBackend
 
+default_rate_limiter = RateLimiter()
+"""
+Rate limiter shared by the services that are not built through a ``Mightstone``
+instance
+"""
+
 
 class ServiceError(Exception):
     def __init__(self, message, url=None, status=None, data=None, method=None):
@@ -27,9 +38,16 @@ class MightstoneHttpClient:
     """
     Base url of the service (must be a root path such as https://example.com)
     """
+    service: Optional[str] = None
+    """
+    Name of the service, used to match the cache policies
+    """
     delay = 0
     """
     Induced delay in second between each API call
+
+    Deprecated: requests are throttled by the ``RateLimitTransport`` of the
+    service, this delay is only awaited by ``_sleep()``.
     """
     timeout: Optional[Timeout] = None
 
@@ -41,28 +59,87 @@ class MightstoneHttpClient:
     ):
         self.transport = transport
         self.ijson = ijson or ijson_module.get_backend(ijson_module.backend)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
 
     @property
-    def client(self):
+    def client(self) -> httpx.AsyncClient:
+        """
+        The HTTP client of this service
+
+        The client is lazily built on first access, then kept for the lifetime of
+        the service so that its connection pool (keep-alive, TLS sessions) is reused
+        across calls. A new client is built if the previous one was closed, or if
+        the service is used from another event loop.
+        """
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        if (
+            self._client is None
+            or self._client.is_closed
+            or (loop is not None and self._client_loop not in (None, loop))
+        ):
+            self._client = self._build_client()
+            self._client_loop = loop
+        elif self._client_loop is None:
+            self._client_loop = loop
+
+        return self._client
+
+    def _build_client(self) -> httpx.AsyncClient:
         # See: https://github.com/encode/httpx/issues/2473
-        options = {
-            "transport": self.transport,
-            "headers": {
-                "cache-control": f"max-age={60 * 60 * 24}",
-                "user-agent": f"mightstone/{__version__}",
-            },
-        }
-        if self.timeout:
-            options["timeout"] = self.timeout
-        if hasattr(self, "base_url"):
-            options["base_url"] = self.base_url
-        if self.transport:
-            options["storage"] = self.transport._storage
-            options["controller"] = self.transport._controller
-        return AsyncCacheClient(**options)
+        transport = self.transport
+        if transport is None:
+            transport = MightstoneCacheTransport(
+                transport=RateLimitTransport(
+                    httpx.AsyncHTTPTransport(retries=2), limiter=default_rate_limiter
+                ),
+                controller=MightstoneController(policies=DEFAULT_CACHE_POLICIES),
+            )
+
+        return httpx.AsyncClient(
+            transport=CoalescingTransport(transport),
+            headers={"user-agent": f"mightstone/{__version__}"},
+            event_hooks={"request": [self._tag_request]},
+            timeout=self.timeout or httpx.Timeout(5.0),
+            base_url=getattr(self, "base_url", ""),
+        )
+
+    async def _tag_request(self, request: httpx.Request) -> None:
+        request.extensions.setdefault(SERVICE_EXTENSION, self.service)
+
+    async def aclose(self):
+        """
+        Release the HTTP client of this service
+
+        A shared (injected) transport is left open, since it belongs to the
+        container, and is closed by ``Mightstone.aclose()``.
+        """
+        client, self._client = self._client, None
+        self._client_loop = None
+        if client is None or client.is_closed:
+            return
+
+        if self.transport is None:
+            await client.aclose()
 
     async def close(self):
-        await self.client.aclose()
+        await self.aclose()
 
     async def _sleep(self):
+        warnings.warn(
+            "MightstoneHttpClient._sleep() is deprecated, requests are throttled by"
+            " the transport of the service",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         await asyncio.sleep(self.delay)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
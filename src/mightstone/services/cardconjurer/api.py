@@ -53,6 +53,7 @@ class CardConjurer(MightstoneHttpClient):
     """
 
     base_url: str
+    service = "cardconjurer"
     default_font = "LiberationMono-Regular.ttf"
 
     def __init__(self, default_font: Optional[str] = None, **kwargs):
@@ -121,6 +121,7 @@ class EdhRecApi(MightstoneHttpClient):
     """
 
     base_url = "https://edhrec.com"
+    service = "edhrec"
     timeout = Timeout(timeout=5, read=20)  # Edhrec is rather slow to respond
 
     async def recommendations_async(
@@ -203,6 +204,7 @@ class EdhRecStatic(MightstoneHttpClient):
     """
 
     base_url = "https://json.edhrec.com/pages"
+    service = "edhrec"
 
     async def typal_async(self, name, identity: Optional[EnumIdentity] = None):
         """
@@ -1,2 +1,4 @@
 from .api import MtgJson, MtgJsonCompression
+from .columnar import PriceColumns
+from .history import PriceHistory
 from .models import Card, CardPrices
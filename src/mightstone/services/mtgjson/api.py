@@ -2,13 +2,22 @@
 MTGJSON support core
 """
 
+import asyncio
+import datetime
 import json
 import logging
+import os
+import pathlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from enum import Enum
 from typing import (
     Any,
     AsyncGenerator,
+    AsyncIterator,
     Callable,
+    Deque,
     Dict,
     List,
     Literal,
@@ -21,19 +30,25 @@ from typing import (
 )
 
 import asyncstdlib
+import httpx
 from hishel import AsyncCacheTransport
 from httpx import HTTPStatusError
 from injector import inject, noninjectable
 from pydantic import ValidationError
 
 from mightstone.ass import compressor, synchronize
-from mightstone.core import MightstoneModel
+from mightstone.core import MightstoneModel, Validation, build, projection
+from mightstone.download import Downloader
 from mightstone.services import MightstoneHttpClient, ServiceError
+from mightstone.services.mtgjson.columnar import PriceColumns
+from mightstone.services.mtgjson.history import PriceHistory
+from mightstone.services.mtgjson.mirror import MtgJsonMirror
 from mightstone.services.mtgjson.models import (
     Card,
     CardAtomic,
     CardFace,
     CardPrices,
+    CardSet,
     CardTypes,
     Deck,
     DeckList,
@@ -90,7 +105,7 @@ class MtgJsonCompression(str, Enum):
     """
     Available compression mode enumerator
 
-    MTGJSON provide 5 compression formats, Mightstone support 4 of them.
+    MTGJSON provide 5 compression formats, Mightstone support all of them.
     """
 
     NONE = ""
@@ -98,7 +113,7 @@ class MtgJsonCompression(str, Enum):
     XZ = "xz"
     """ LZMA compression, use .xz files """
     ZIP = "zip"
-    """ ZIP compression, use .zip files (not supported)"""
+    """ ZIP compression, use .zip files"""
     GZIP = "gz"
     """ GZIP compression, use .gz files"""
     BZ2 = "bz2"
@@ -118,32 +133,114 @@ class MtgJsonCompression(str, Enum):
             return "gzip"
         elif self.value == "bz2":
             return "bzip2"
+        elif self.value == "zip":
+            return "zip"
         raise ValueError(f"{self.name} compression protocol cannot be read as a stream")
 
 
 _T = TypeVar("_T", bound=MightstoneModel)
 
 
+class MtgJsonManifest:
+    """
+    Records the MTGJSON version (see ``Meta``) of each downloaded dataset
+
+    :param path: Optional. A JSON file to persist the manifest, otherwise it is only
+                 kept in memory
+    """
+
+    def __init__(self, path: Optional[Union[str, pathlib.Path]] = None):
+        self.path = pathlib.Path(path) if path else None
+        self.versions: Dict[str, str] = {}
+        if self.path and self.path.exists():
+            try:
+                self.versions = json.loads(self.path.read_text())
+            except (OSError, ValueError) as e:
+                logger.warning("Unable to read MTGJSON manifest %s, %s", self.path, e)
+
+    def get(self, path: str) -> Optional[str]:
+        return self.versions.get(path)
+
+    def set(self, path: str, version: str) -> None:
+        if self.versions.get(path) == version:
+            return
+
+        self.versions[path] = version
+        if not self.path:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.versions))
+        os.replace(tmp, self.path)
+
+
 class MtgJson(MightstoneHttpClient):
     """
     MTGJSON client
 
     Supports compression and will get gzip versions by default.
+
+    Large datasets are only downloaded again once MTGJSON publishes a new version
+    (see ``meta_async()``), otherwise they are read from the HTTP cache. If a
+    ``directory`` is provided, they are mirrored there instead (see
+    ``MtgJsonMirror``): downloaded once for all the processes of the host (resuming
+    interrupted transfers, and verifying their SHA-256 checksum), then parsed from
+    disk.
+
+    Models are validated on the event loop, unless ``workers`` is provided: items are
+    then validated by batches of ``batch_size`` in a pool of processes, with at most
+    two batches by worker in flight. They are yielded in the dataset order, unless
+    ``ordered`` is False.
+
+    Upstream data can be trusted to skip validation with ``validation``, see
+    ``Validation``.
+
+    Streamed datasets are decompressed on the event loop, which stalls the other
+    coroutines of the process for slow codecs such as xz and bz2, unless
+    ``decompression_thread`` is True.
     """
 
     base_url = "https://mtgjson.com"
+    service = "mtgjson"
 
     @inject
-    @noninjectable("compression", "version")
+    @noninjectable(
+        "compression",
+        "version",
+        "manifest",
+        "directory",
+        "workers",
+        "batch_size",
+        "ordered",
+        "validation",
+        "decompression_thread",
+    )
     def __init__(
         self,
         transport: Optional[AsyncCacheTransport] = None,
         ijson: Optional[MightstoneIjsonBackend] = None,
         compression: Optional[MtgJsonCompression] = MtgJsonCompression.GZIP,
         version: int = 5,
+        manifest: Optional[Union[str, pathlib.Path]] = None,
+        directory: Optional[Union[str, pathlib.Path]] = None,
+        workers: int = 0,
+        batch_size: int = 64,
+        ordered: bool = True,
+        validation: Validation = Validation.FULL,
+        decompression_thread: bool = False,
     ):
         super().__init__(transport=transport, ijson=ijson)
+        self.decompression_thread = decompression_thread
         self.version = int(version)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.ordered = ordered
+        self.validation = Validation(validation)
+        self.manifest = MtgJsonManifest(manifest)
+        self.mirror: Optional[MtgJsonMirror] = None
+        if directory:
+            self.mirror = MtgJsonMirror(pathlib.Path(directory, f"v{self.version}"))
         if compression is None:
             compression = MtgJsonCompression.GZIP
         self.compression = MtgJsonCompression(compression)
@@ -151,44 +248,97 @@ class MtgJson(MightstoneHttpClient):
     def set_compression(self, compression=MtgJsonCompression):
         self.compression = MtgJsonCompression(compression)
 
-    async def all_printings_async(self) -> AsyncGenerator[Set, None]:
+    async def all_printings_async(
+        self, fields: Optional[List[str]] = None
+    ) -> AsyncGenerator[Set, None]:
         """
         all Card (Set) cards, including all printings and variations, categorized by
         set.
 
+        :param fields: Optional. Only validate those fields of the sets, nested fields
+                       are separated by dots, such as ``["code", "cards.uuid"]``
+                       (see ``mightstone.core.projection()``)
         :return: An async iterator of CardSet
         """
         async for k, item in self._iterate_model(
-            kind="AllPrintings", model=Set, mode=MtgJsonMode.DICT_OF_MODEL
+            kind="AllPrintings",
+            model=Set,
+            mode=MtgJsonMode.DICT_OF_MODEL,
+            fields=fields,
         ):
             yield item
 
     all_printings = synchronize(all_printings_async)
 
-    async def all_identifiers_async(self) -> AsyncGenerator[Card, None]:
+    async def all_identifiers_async(
+        self, fields: Optional[List[str]] = None
+    ) -> AsyncGenerator[Card, None]:
         """
         all Card (Set) cards organized by card UUID.
 
+        :param fields: Optional. Only validate those fields of the cards, such as
+                       ``["uuid", "name", "setCode"]``
         :return: An async iterator of Card object (either CardToken, or CardSet)
         """
-        async for k, item in self._iterate_model(  # type: ignore # no-qa
-            kind="AllIdentifiers", model=Card
+        model: Type[Any] = CardSet if fields else Card
+        async for k, item in self._iterate_model(
+            kind="AllIdentifiers", model=model, fields=fields
         ):
             yield item
 
     all_identifiers = synchronize(all_identifiers_async)
 
-    async def all_prices_async(self) -> AsyncGenerator[CardPrices, None]:
+    async def all_prices_async(
+        self, fields: Optional[List[str]] = None
+    ) -> AsyncGenerator[CardPrices, None]:
         """
         all prices of cards in various formats.
 
+        :param fields: Optional. Only validate those fields of the prices, such as
+                       ``["paper"]``
         :return: An async iterator of CardPrices
         """
+        model = projection(CardPrices, ["uuid", *fields]) if fields else CardPrices
         async for k, item in self._iterate_model(kind="AllPrices"):
-            yield CardPrices(uuid=k, **item)  # type: ignore
+            # Prices are keyed by card, the key is their uuid
+            yield build(model, {"uuid": k, **item}, self.validation)
 
     all_prices = synchronize(all_prices_async)
 
+    async def all_prices_columns_async(self, today: bool = False) -> PriceColumns:
+        """
+        all prices of cards, as typed columns, one row per price point, for vectorized
+        analysis (see ``PriceColumns``)
+
+        :param today: Only the prices of the last day (``AllPricesToday``), instead of
+                      the last 90 days
+        :return: The price columns
+        """
+        columns = PriceColumns()
+        kind = "AllPricesToday" if today else "AllPrices"
+        async for k, item in self._iterate_model(kind=kind):
+            columns.append(k, item)
+        return columns
+
+    all_prices_columns = synchronize(all_prices_columns_async)
+
+    async def update_price_history_async(
+        self, history: Union[str, pathlib.Path, PriceHistory]
+    ) -> List[datetime.date]:
+        """
+        Append the prices of the last day (``AllPricesToday``) to a price history,
+        meant to be called daily
+
+        :param history: The price history, or its directory
+        :return: The appended dates, empty if the last day is already stored
+        """
+        if not isinstance(history, PriceHistory):
+            history = PriceHistory(history)
+        columns = await self.all_prices_columns_async(today=True)
+        return await asyncio.to_thread(history.append, columns)
+
+    update_price_history = synchronize(update_price_history_async)
+
     async def atomic_cards_async(self) -> AsyncGenerator[CardAtomic, None]:
         """
         every Card (Atomic) card.
@@ -450,6 +600,47 @@ class MtgJson(MightstoneHttpClient):
 
     vintage_atomic = synchronize(vintage_atomic_async)
 
+    async def lookup_async(
+        self, kind: str, key: str, model: Optional[Type[_T]] = None
+    ) -> Union[_T, Dict]:
+        """
+        Read a single item of a large dataset, such as a set of ``AllPrintings`` or
+        a card of ``AllIdentifiers``, without parsing the whole dataset.
+
+        Requires a ``directory``, the item is read from the mirrored dataset thanks
+        to an index of its byte offsets, built once per dataset version.
+
+        :param kind: The dataset name, such as ``AllPrintings``
+        :param key: The item key, such as a set code or a card uuid
+        :param model: Optional. The model to validate the item with
+        :raise KeyError: The item does not exist
+        :return: The item, or its raw data if no model is provided
+        """
+        if not self.mirror:
+            raise ValueError("MTGJSON lookups require a local directory")
+
+        path = f"/api/v{self.version}/{kind}.json"
+        if self.compression != MtgJsonCompression.NONE:
+            path += "." + self.compression.value
+
+        await self._mirror_dataset(kind, path)
+        data = json.loads(await asyncio.to_thread(self.mirror.lookup, kind, key))
+        if not model:
+            return data
+
+        try:
+            return model.model_validate(data)
+        except ValidationError as e:
+            raise ServiceError(
+                message=f"Failed to validate {model} data, {e.errors()}",
+                url=path,
+                method="GET",
+                status=None,
+                data=e,
+            )
+
+    lookup = synchronize(lookup_async)
+
     async def _atomic(self, kind: str) -> AsyncGenerator[CardAtomic, None]:
         card: Optional[CardAtomic] = None
         async for (k, i), item in self._iterate_model(
@@ -505,44 +696,147 @@ class MtgJson(MightstoneHttpClient):
                 data=None,
             )
 
+    async def _meta_version(self) -> Optional[str]:
+        try:
+            return (await self.meta_async()).version
+        except (ServiceError, httpx.HTTPError, ValueError) as e:
+            logger.warning("Unable to check MTGJSON version, %s", e)
+            return None
+
+    @asynccontextmanager
+    async def _stream_dataset(self, path: str) -> AsyncIterator[httpx.Response]:
+        """
+        Stream a dataset, from the HTTP cache if it was downloaded for the current
+        MTGJSON version, otherwise the cached copy is revalidated (If-None-Match)
+
+        :param path: The dataset path
+        """
+        options: Dict[str, Any] = {}
+        version = await self._meta_version()
+        if version is not None:
+            if self.manifest.get(path) == version:
+                options["extensions"] = {"force_cache": True}
+            else:
+                options["headers"] = {"cache-control": "no-cache"}
+
+        async with self.client.stream("GET", path, **options) as f:
+            if version is not None and f.is_success:
+                self.manifest.set(path, version)
+            yield f
+
+    async def _mirror_dataset(self, kind: str, path: str) -> pathlib.Path:
+        """
+        Update the mirrored copy of a dataset, unless it already matches the current
+        MTGJSON version
+
+        :param kind: The dataset name
+        :param path: The dataset path
+        :return: The local path of the dataset
+        """
+        assert self.mirror
+        local = self.mirror.path(kind)
+        version = await self._meta_version()
+
+        def is_current() -> bool:
+            assert self.mirror
+            if version is None:
+                return local.exists()
+            return self.mirror.version(kind) == version
+
+        if is_current():
+            return local
+
+        async with self.mirror.lock(kind):
+            # Another process may have updated the dataset in the meantime
+            if is_current():
+                return local
+
+            download = await Downloader(self.client).download(
+                path,
+                self.mirror.directory.joinpath(path.rsplit("/")[-1]),
+                sha256=await self._sha256(path),
+            )
+            return await self.mirror.update(
+                kind,
+                download,
+                version,
+                compression=self.compression.to_stream_compression(),
+            )
+
+    async def _sha256(self, path: str) -> Optional[str]:
+        try:
+            response = await self.client.get(
+                f"{path}.sha256", headers={"cache-control": "no-cache"}
+            )
+            response.raise_for_status()
+            return response.text.split()[0]
+        except (httpx.HTTPError, IndexError) as e:
+            logger.warning("Unable to fetch %s checksum, %s", path, e)
+            return None
+
     @overload
     def _iterate_model(
-        self, kind: str
+        self, kind: str, *, fields: Optional[List[str]] = None
     ) -> AsyncGenerator[Tuple[DictOfKey, Dict], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: None
+        self, kind: str, model: None, *, fields: Optional[List[str]] = None
     ) -> AsyncGenerator[Tuple[DictOfKey, Dict], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: Type[_T]
+        self, kind: str, model: Type[_T], *, fields: Optional[List[str]] = None
     ) -> AsyncGenerator[Tuple[DictOfKey, _T], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: None, mode: Literal[MtgJsonMode.DICT_OF_MODEL]
+        self,
+        kind: str,
+        model: None,
+        mode: Literal[MtgJsonMode.DICT_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[DictOfKey, Dict], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: Type[_T], mode: Literal[MtgJsonMode.DICT_OF_MODEL]
+        self,
+        kind: str,
+        model: Type[_T],
+        mode: Literal[MtgJsonMode.DICT_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[DictOfKey, _T], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: None, mode: Literal[MtgJsonMode.LIST_OF_MODEL]
+        self,
+        kind: str,
+        model: None,
+        mode: Literal[MtgJsonMode.LIST_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[ListOfKey, Dict], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: Type[_T], mode: Literal[MtgJsonMode.LIST_OF_MODEL]
+        self,
+        kind: str,
+        model: Type[_T],
+        mode: Literal[MtgJsonMode.LIST_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[ListOfKey, _T], None]: ...
 
     @overload
     def _iterate_model(
-        self, kind: str, model: None, mode: Literal[MtgJsonMode.DICT_OF_LIST_OF_MODEL]
+        self,
+        kind: str,
+        model: None,
+        mode: Literal[MtgJsonMode.DICT_OF_LIST_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[DictOfListOfKey, Dict], None]: ...
 
     @overload
@@ -551,6 +845,8 @@ class MtgJson(MightstoneHttpClient):
         kind: str,
         model: Type[_T],
         mode: Literal[MtgJsonMode.DICT_OF_LIST_OF_MODEL],
+        *,
+        fields: Optional[List[str]] = None,
     ) -> AsyncGenerator[Tuple[DictOfListOfKey, _T], None]: ...
 
     async def _iterate_model(
@@ -559,25 +855,104 @@ class MtgJson(MightstoneHttpClient):
         model: Optional[Type[_T]] = None,
         mode: MtgJsonMode = MtgJsonMode.DICT_OF_MODEL,
         error_threshold: int = 10,
+        fields: Optional[List[str]] = None,
         **kwargs,
     ) -> AsyncGenerator[Tuple[GeneratorKey, Union[_T, Dict]], None]:
         error = 0
-        async for k, v in self._iterate_raw(kind, mode, **kwargs):
+        raw = self._iterate_raw(kind, mode, **kwargs)
+        if model and self.workers > 0 and self.validation != Validation.NONE:
+            results = self._validate_in_pool(raw, model, fields)
+        elif model and fields:
+            results = self._validate(raw, projection(model, fields))
+        else:
+            results = self._validate(raw, model)
+
+        async for k, item, errors in results:
+            if errors is None:
+                yield k, item
+                continue
+
+            error += 1
+            logger.warning(
+                "Failed to validate %s data, for item %s, %s", model, k, errors
+            )
+            if error > error_threshold:
+                raise RuntimeError(
+                    "Too many model validation error, something is wrong"
+                )
+
+    async def _validate(
+        self, raw: AsyncGenerator[GeneratorModel, None], model: Optional[Type[_T]]
+    ) -> AsyncGenerator[Tuple[GeneratorKey, Any, Optional[List]], None]:
+        async for k, v in raw:
+            if not model:
+                yield k, dict(v), None
+                continue
             try:
-                if model:
-                    yield k, model.model_validate(v)
-                else:
-                    yield k, dict(v)
+                item = build(model, v, self.validation)
             except ValidationError as e:
-                error += 1
-                logger.warning(
-                    "Failed to validate %s data, for item %s, %s", model, k, e.errors
-                )
+                yield k, None, e.errors(include_url=False)
+                continue
+            yield k, item, None
 
-                if error > error_threshold:
-                    raise RuntimeError(
-                        "Too many model validation error, something is wrong"
+    async def _validate_in_pool(
+        self,
+        raw: AsyncGenerator[GeneratorModel, None],
+        model: Type[_T],
+        fields: Optional[List[str]] = None,
+    ) -> AsyncGenerator[Tuple[GeneratorKey, Any, Optional[List]], None]:
+        loop = asyncio.get_running_loop()
+        pending: Deque[asyncio.Future] = deque()
+        executor = ProcessPoolExecutor(self.workers)
+        try:
+            batch: List[GeneratorModel] = []
+            async for item in raw:
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+
+                pending.append(
+                    loop.run_in_executor(
+                        executor,
+                        validate_batch,
+                        model,
+                        batch,
+                        self.validation,
+                        fields,
                     )
+                )
+                batch = []
+                while len(pending) >= self.workers * 2:
+                    for result in await self._next_batch(pending):
+                        yield result
+
+            if batch:
+                pending.append(
+                    loop.run_in_executor(
+                        executor,
+                        validate_batch,
+                        model,
+                        batch,
+                        self.validation,
+                        fields,
+                    )
+                )
+            while pending:
+                for result in await self._next_batch(pending):
+                    yield result
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _next_batch(self, pending: Deque[asyncio.Future]) -> List:
+        if self.ordered:
+            return await pending.popleft()
+
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        future = done.pop()
+        pending.remove(future)
+        return future.result()
 
     # @overload
     # def _iterate_raw(
@@ -644,7 +1019,14 @@ class MtgJson(MightstoneHttpClient):
         elif mode == MtgJsonMode.DICT_OF_LIST_OF_MODEL:
             generator = dict_of_list_of_model_generator
 
-        async with self.client.stream("GET", path) as f:
+        if self.mirror:
+            await self._mirror_dataset(kind, path)
+            with self.mirror.open(kind) as reader:
+                async for item in generator(self.ijson, reader, ijson_path):
+                    yield item
+            return
+
+        async with self._stream_dataset(path) as f:
             try:
                 f.raise_for_status()
             except HTTPStatusError as e:
@@ -656,11 +1038,43 @@ class MtgJson(MightstoneHttpClient):
                     data=e.response.content,
                 )
 
-            async with compressor.open(f.aiter_bytes(), compression=compression) as bit:
+            async with compressor.open(
+                f.aiter_bytes(),
+                compression=compression,
+                threaded=self.decompression_thread,
+            ) as bit:
                 async for item in generator(self.ijson, bit, ijson_path):
                     yield item
 
 
+def validate_batch(
+    model: Type[_T],
+    batch: List[GeneratorModel],
+    validation: Validation = Validation.FULL,
+    fields: Optional[List[str]] = None,
+) -> List[Tuple[GeneratorKey, Optional[_T], Optional[List]]]:
+    """
+    Validate a batch of raw items, in a worker process
+
+    :param model: The model to validate the items with
+    :param batch: The raw items, along with their keys
+    :param validation: The validation mode
+    :param fields: Optional. Only validate those fields (see ``projection()``)
+    :return: The validated items, or their validation errors, along with their keys
+    """
+    if fields:
+        # Generated models can't be sent to another process, only their definition
+        model = projection(model, fields)  # type: ignore
+    results: List[Tuple[GeneratorKey, Optional[_T], Optional[List]]] = []
+    for k, v in batch:
+        try:
+            results.append((k, build(model, v, validation), None))
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False)
+            results.append((k, None, errors))
+    return results
+
+
 async def dict_of_list_of_model_generator(
     ijson, bytes_iterator, ijson_path=None
 ) -> AsyncGenerator[DictOfListOfModel, None]:
@@ -0,0 +1,314 @@
+"""
+Columnar representation of MTGJSON prices
+"""
+
+import ast
+import datetime
+import json
+import pathlib
+import sys
+from array import array
+from typing import Any, Dict, List, Tuple, Union
+
+from mightstone.ass.compressor.codecs import error_import_usage
+
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+CATEGORIES = ("format", "provider", "listing", "finish", "currency")
+"""The dictionary encoded columns, their values are indexes of ``categories``"""
+
+TYPECODES = {
+    "uuid": "i",
+    "format": "B",
+    "provider": "B",
+    "listing": "B",
+    "finish": "B",
+    "currency": "B",
+    "date": "i",
+    "price": "f",
+}
+"""The type of each column, as an ``array`` typecode"""
+
+_NPY_DESCR = {"i": "i4", "B": "u1", "f": "f4"}
+
+
+class PriceColumns:
+    """
+    The prices of ``AllPrices``, as typed columns, one row per price point
+
+    * ``uuid``: the index of the card uuid in ``uuids`` (int32)
+    * ``format``, ``provider``, ``listing``, ``finish``, ``currency``: the index of
+      the value in ``categories`` (uint8), such as ``paper``, ``tcgplayer``,
+      ``retail``, ``foil`` and ``USD``
+    * ``date``: the number of days since 1970-01-01 (int32)
+    * ``price``: the price (float32)
+
+    Columns are stored in compact arrays, and can be saved as ``.npy`` files
+    (memory mapped by ``PriceColumns.load()``), or as an Arrow IPC or Parquet file
+    (requires pyarrow).
+    """
+
+    def __init__(self):
+        self.uuids: List[str] = []
+        self.categories: Dict[str, List[str]] = {name: [] for name in CATEGORIES}
+        self.columns: Dict[str, array] = {
+            name: array(code) for name, code in TYPECODES.items()
+        }
+        self._codes: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORIES}
+        self._dates: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.columns["price"])
+
+    def append(self, uuid: str, prices: Dict[str, Any]) -> None:
+        """
+        Append the price points of a card
+
+        :param uuid: The card uuid
+        :param prices: The raw prices of the card, as found in ``AllPrices``
+        """
+        index = len(self.uuids)
+        self.uuids.append(uuid)
+
+        columns = self.columns
+        for format_name, providers in prices.items():
+            if not isinstance(providers, dict):
+                continue
+            format_code = self._code("format", format_name)
+            for provider_name, provider in providers.items():
+                provider_code = self._code("provider", provider_name)
+                currency_code = self._code("currency", provider.get("currency", ""))
+                for listing_name in ("retail", "buylist"):
+                    listing = provider.get(listing_name)
+                    if not listing:
+                        continue
+                    listing_code = self._code("listing", listing_name)
+                    for finish_name, points in listing.items():
+                        finish_code = self._code("finish", finish_name)
+                        count = len(points)
+                        columns["uuid"].extend((index,) * count)
+                        columns["format"].extend((format_code,) * count)
+                        columns["provider"].extend((provider_code,) * count)
+                        columns["listing"].extend((listing_code,) * count)
+                        columns["finish"].extend((finish_code,) * count)
+                        columns["currency"].extend((currency_code,) * count)
+                        columns["date"].extend(map(self._date, points.keys()))
+                        columns["price"].extend(map(float, points.values()))
+
+    def add(
+        self,
+        uuid: str,
+        categories: Tuple[str, ...],
+        date: int,
+        price: float,
+    ) -> None:
+        """
+        Append a single price point, the points of a card must be contiguous
+
+        :param uuid: The card uuid
+        :param categories: The values of the ``CATEGORIES`` columns, in order
+        :param date: The number of days since 1970-01-01
+        :param price: The price
+        """
+        if not self.uuids or self.uuids[-1] != uuid:
+            self.uuids.append(uuid)
+        self.columns["uuid"].append(len(self.uuids) - 1)
+        for name, value in zip(CATEGORIES, categories):
+            self.columns[name].append(self._code(name, value))
+        self.columns["date"].append(date)
+        self.columns["price"].append(price)
+
+    def row(self, index: int) -> Tuple[str, Tuple[str, ...]]:
+        """
+        :param index: The row index
+        :return: The card uuid, and the values of the ``CATEGORIES`` columns
+        """
+        return self.uuids[self.columns["uuid"][index]], tuple(
+            self.categories[name][self.columns[name][index]] for name in CATEGORIES
+        )
+
+    def _code(self, category: str, value: str) -> int:
+        codes = self._codes[category]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            if code > 255:
+                raise ValueError(f"Too many distinct values of {category}")
+            codes[value] = code
+            self.categories[category].append(value)
+        return code
+
+    def _date(self, value: str) -> int:
+        days = self._dates.get(value)
+        if days is None:
+            days = datetime.date.fromisoformat(value).toordinal() - EPOCH
+            self._dates[value] = days
+        return days
+
+    def save(
+        self, directory: Union[str, pathlib.Path], format: str = "npy"
+    ) -> pathlib.Path:
+        """
+        Write the columns to disk
+
+        :param directory: The target directory
+        :param format: ``npy`` for a ``.npy`` file per column, along with a
+                       ``categories.json`` file for ``uuids`` and ``categories``,
+                       ``arrow`` for an ``prices.arrow`` Arrow IPC file, or
+                       ``parquet`` for a ``prices.parquet`` file
+        :return: The written directory, or file
+        """
+        directory = pathlib.Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        if format == "npy":
+            for name, column in self.columns.items():
+                write_npy(directory.joinpath(f"{name}.npy"), column)
+            directory.joinpath("categories.json").write_text(
+                json.dumps({"uuids": self.uuids, "categories": self.categories})
+            )
+            return directory
+
+        try:
+            import pyarrow
+            import pyarrow.ipc
+            import pyarrow.parquet
+        except ImportError:
+            error_import_usage("pyarrow")
+
+        table = self.to_arrow()
+        if format == "arrow":
+            path = directory.joinpath("prices.arrow")
+            with pyarrow.OSFile(str(path), "wb") as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return path
+        if format == "parquet":
+            path = directory.joinpath("prices.parquet")
+            pyarrow.parquet.write_table(table, path)
+            return path
+
+        raise ValueError(f"Unsupported format {format}")
+
+    def to_arrow(self):
+        """
+        Convert the columns to an Arrow table (requires pyarrow), dictionary encoded
+        columns are converted to Arrow dictionary arrays, dates to ``date32``
+
+        :return: A ``pyarrow.Table``
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            error_import_usage("pyarrow")
+
+        types = {"i": pyarrow.int32(), "B": pyarrow.uint8(), "f": pyarrow.float32()}
+
+        def column(name: str):
+            # Share the memory of the array, instead of converting every value
+            data = self.columns[name]
+            return pyarrow.Array.from_buffers(
+                types[data.typecode], len(data), [None, pyarrow.py_buffer(data)]
+            )
+
+        def dictionary(name: str, values: List[str]):
+            return pyarrow.DictionaryArray.from_arrays(column(name), values)
+
+        columns = {
+            "uuid": dictionary("uuid", self.uuids),
+            **{name: dictionary(name, self.categories[name]) for name in CATEGORIES},
+            "date": column("date").view(pyarrow.date32()),
+            "price": column("price"),
+        }
+        return pyarrow.table(columns)
+
+    @classmethod
+    def read(cls, directory: Union[str, pathlib.Path]) -> "PriceColumns":
+        """
+        Read the columns saved in the ``npy`` format, without requiring numpy
+
+        :param directory: The directory of the columns
+        :return: The columns
+        """
+        directory = pathlib.Path(directory)
+        meta = json.loads(directory.joinpath("categories.json").read_text())
+        columns = cls()
+        columns.uuids = meta["uuids"]
+        columns.categories = meta["categories"]
+        columns._codes = {
+            name: {value: code for code, value in enumerate(values)}
+            for name, values in columns.categories.items()
+        }
+        for name, code in TYPECODES.items():
+            columns.columns[name] = read_npy(directory.joinpath(f"{name}.npy"), code)
+        return columns
+
+    @staticmethod
+    def load(directory: Union[str, pathlib.Path]) -> Dict[str, Any]:
+        """
+        Memory map the columns saved in the ``npy`` format (requires numpy)
+
+        :param directory: The directory of the columns
+        :return: The numpy array of each column, along with the ``uuids`` and the
+                 ``categories``
+        """
+        try:
+            import numpy
+        except ImportError:
+            error_import_usage("numpy")
+
+        directory = pathlib.Path(directory)
+        out: Dict[str, Any] = json.loads(
+            directory.joinpath("categories.json").read_text()
+        )
+        for name in TYPECODES:
+            out[name] = numpy.load(directory.joinpath(f"{name}.npy"), mmap_mode="r")
+        return out
+
+
+def write_npy(path: Union[str, pathlib.Path], column: array) -> None:
+    """
+    Write a one dimension array as a ``.npy`` file, without requiring numpy
+
+    :param path: The target file
+    :param column: The array, its typecode must be ``i``, ``B`` or ``f``
+    """
+    endianness = "<" if sys.byteorder == "little" else ">"
+    header = "{'descr': '%s%s', 'fortran_order': False, 'shape': (%d,), }" % (
+        endianness if column.itemsize > 1 else "|",
+        _NPY_DESCR[column.typecode],
+        len(column),
+    )
+    # The magic string, version, header length, and header are aligned on 64 bytes
+    padding = 64 - (10 + len(header) + 1) % 64
+    header_bytes = (header + " " * padding + "\n").encode("latin1")
+
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00")
+        f.write(len(header_bytes).to_bytes(2, "little"))
+        f.write(header_bytes)
+        column.tofile(f)
+
+
+def read_npy(path: Union[str, pathlib.Path], typecode: str) -> array:
+    """
+    Read a one dimension ``.npy`` file written by ``write_npy()``, without requiring
+    numpy
+
+    :param path: The file
+    :param typecode: The ``array`` typecode of the values
+    :return: The array
+    """
+    column = array(typecode)
+    with open(path, "rb") as f:
+        if f.read(6) != b"\x93NUMPY":
+            raise ValueError(f"{path} is not a npy file")
+        major = f.read(2)[0]
+        length = int.from_bytes(f.read(2 if major == 1 else 4), "little")
+        header = ast.literal_eval(f.read(length).decode("latin1"))
+        count = header["shape"][0] if header["shape"] else 0
+        column.fromfile(f, count)
+
+    if header["descr"][0] not in ("|", "<" if sys.byteorder == "little" else ">"):
+        column.byteswap()
+    return column
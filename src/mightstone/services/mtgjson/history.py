@@ -0,0 +1,220 @@
+"""
+Incremental price history of MTGJSON
+"""
+
+import datetime
+import os
+import pathlib
+import re
+import shutil
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple, Union
+
+from mightstone.lock import FileLock
+from mightstone.services.mtgjson.columnar import EPOCH, PriceColumns
+from mightstone.services.mtgjson.models import PricePoint
+
+_PARTITION = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+Series = Tuple[str, Tuple[str, ...]]
+
+Partition = Tuple[PriceColumns, Dict[str, int]]
+"""The columns of a partition, and the position of each card uuid"""
+
+
+class PriceHistory:
+    """
+    An append-only history of MTGJSON prices, fed every day by ``AllPricesToday``
+    (see ``MtgJson.update_price_history()``), beyond the 90 days of ``AllPrices``
+
+    Each date is stored as a partition, a directory of typed columns (see
+    ``PriceColumns``). A price is only stored when it changed since the previous
+    point of its series (card, format, provider, listing, finish and currency), so
+    the price of a series on a given day is the last one stored up to that day.
+
+    The last price of every series is kept in a ``latest`` snapshot, along with the
+    date of the last partition it includes: the partitions stored after it (if a
+    previous append was interrupted) are replayed before appending new dates.
+
+    Appends are serialized by a file lock. Partitions are immutable once stored,
+    so ``prices()`` reads them without the lock, only the ``latest`` snapshot is
+    replaced, and it is only read under the lock.
+
+    :param directory: The history directory
+    :param cache_size: The number of partitions kept in memory once read
+    """
+
+    def __init__(self, directory: Union[str, pathlib.Path], cache_size: int = 32):
+        self.directory = pathlib.Path(directory)
+        self.cache_size = cache_size
+        self._partitions: "OrderedDict[datetime.date, Partition]" = OrderedDict()
+
+    def dates(self) -> List[datetime.date]:
+        """
+        :return: The dates of the history, in order
+        """
+        if not self.directory.exists():
+            return []
+        return sorted(
+            datetime.date.fromisoformat(path.name)
+            for path in self.directory.iterdir()
+            if path.is_dir() and _PARTITION.fullmatch(path.name)
+        )
+
+    def append(self, columns: PriceColumns) -> List[datetime.date]:
+        """
+        Append the price points of a snapshot, such as ``AllPricesToday``, the dates
+        already stored are ignored
+
+        :param columns: The price points
+        :return: The appended dates
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with FileLock(self.directory.joinpath("history.lock")):
+            return self._append(columns)
+
+    def _append(self, columns: PriceColumns) -> List[datetime.date]:
+        dates = self.dates()
+        known = set(dates)
+        latest, until = self._read_latest()
+        replayed = False
+        for date in dates:
+            if until is None or date > until:
+                self._replay(date, latest)
+                replayed = True
+
+        rows: Dict[int, List[int]] = defaultdict(list)
+        for index, days in enumerate(columns.columns["date"]):
+            rows[days].append(index)
+
+        appended = []
+        prices = columns.columns["price"]
+        for days in sorted(rows):
+            date = datetime.date.fromordinal(days + EPOCH)
+            if date in known:
+                continue
+
+            partition = PriceColumns()
+            for index in rows[days]:
+                series = columns.row(index)
+                price = prices[index]
+                if latest.get(series) == price:
+                    continue
+                latest[series] = price
+                partition.add(series[0], series[1], days, price)
+
+            self._write(date.isoformat(), partition)
+            appended.append(date)
+
+        if appended or replayed:
+            self._write_latest(latest, max(known.union(appended)))
+        return appended
+
+    def _read_latest(self) -> Tuple[Dict[Series, float], Optional[datetime.date]]:
+        """
+        :return: The last price of each series, and the date of the last partition
+                 they include (None if unknown)
+        """
+        path = self.directory.joinpath("latest")
+        if not path.exists():
+            return {}, None
+
+        snapshot = PriceColumns.read(path)
+        days = snapshot.columns["date"]
+        # Snapshots written by older versions have no date
+        until = datetime.date.fromordinal(days[0] + EPOCH) if days and days[0] else None
+        return {
+            snapshot.row(index): price
+            for index, price in enumerate(snapshot.columns["price"])
+        }, until
+
+    def _write_latest(self, latest: Dict[Series, float], until: datetime.date) -> None:
+        days = until.toordinal() - EPOCH
+        snapshot = PriceColumns()
+        for (uuid, categories), price in sorted(latest.items()):
+            snapshot.add(uuid, categories, days, price)
+        self._replace("latest", snapshot)
+
+    def _replay(self, date: datetime.date, latest: Dict[Series, float]) -> None:
+        partition, _ = self._partition(date)
+        for index, price in enumerate(partition.columns["price"]):
+            latest[partition.row(index)] = price
+
+    def _write(self, name: str, columns: PriceColumns) -> None:
+        # A partition is never replaced, it is only renamed once complete
+        tmp = self.directory.joinpath(f".{name}.{os.getpid()}.tmp")
+        columns.save(tmp)
+        try:
+            os.rename(tmp, self.directory.joinpath(name))
+        except OSError:
+            shutil.rmtree(tmp)
+            raise
+
+    def _replace(self, name: str, columns: PriceColumns) -> None:
+        # Directories can't be swapped atomically, the path is briefly missing
+        path = self.directory.joinpath(name)
+        if not path.exists():
+            return self._write(name, columns)
+
+        tmp = self.directory.joinpath(f".{name}.{os.getpid()}.tmp")
+        old = self.directory.joinpath(f".{name}.{os.getpid()}.old")
+        columns.save(tmp)
+        os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old)
+
+    def prices(
+        self,
+        uuid: str,
+        start: Optional[datetime.date] = None,
+        end: Optional[datetime.date] = None,
+    ) -> List[PricePoint]:
+        """
+        The stored price points of a card, in date order
+
+        :param uuid: The card uuid
+        :param start: Optional. The first date, included
+        :param end: Optional. The last date, included
+        :return: The price points that changed in that range
+        """
+        points = []
+        for date in self.dates():
+            if (start and date < start) or (end and date > end):
+                continue
+
+            partition, index = self._partition(date)
+            position = index.get(uuid)
+            if position is None:
+                continue
+
+            column = partition.columns["uuid"]
+            price = partition.columns["price"]
+            first = bisect_left(column, position)
+            for row in range(first, bisect_right(column, position, lo=first)):
+                _, (fmt, provider, listing, finish, currency) = partition.row(row)
+                points.append(
+                    PricePoint(
+                        date=date,
+                        format=fmt,
+                        provider=provider,
+                        listing=listing,
+                        finish=finish,
+                        currency=currency,
+                        price=price[row],
+                    )
+                )
+        return points
+
+    def _partition(self, date: datetime.date) -> Partition:
+        # Partitions are immutable, the last ones read are kept
+        if date in self._partitions:
+            self._partitions.move_to_end(date)
+            return self._partitions[date]
+
+        partition = PriceColumns.read(self.directory.joinpath(date.isoformat()))
+        index = {uuid: position for position, uuid in enumerate(partition.uuids)}
+        self._partitions[date] = (partition, index)
+        if len(self._partitions) > self.cache_size:
+            self._partitions.popitem(last=False)
+        return partition, index
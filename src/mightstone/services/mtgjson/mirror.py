@@ -0,0 +1,276 @@
+"""
+Local mirror of MTGJSON datasets
+"""
+
+import asyncio
+import bz2
+import gzip
+import json
+import logging
+import lzma
+import mmap
+import os
+import pathlib
+import re
+import shutil
+import zipfile
+from contextlib import contextmanager
+from typing import (
+    IO,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+
+from mightstone.ass.compressor.codecs.blocks import SPLITTERS, decompress_blocks
+from mightstone.lock import FileLock
+
+
+def open_zip(path: pathlib.Path) -> IO[bytes]:
+    """
+    Open the first member of a ZIP archive
+    """
+    with zipfile.ZipFile(path) as archive:
+        # The member keeps the archive file open until it is closed
+        return archive.open(archive.infolist()[0])
+
+
+DECOMPRESSORS: Dict[str, Callable[[pathlib.Path], IO[bytes]]] = {
+    # GzipFile does not implement the whole IO interface, but what is used here
+    "gzip": lambda path: cast(IO[bytes], gzip.open(path, "rb")),
+    "lzma": lambda path: lzma.open(path, "rb"),
+    "bzip2": lambda path: bz2.open(path, "rb"),
+    "zip": open_zip,
+}
+
+Offsets = Dict[str, Tuple[int, int]]
+
+logger = logging.getLogger("mightstone")
+
+_TOKENS = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}\[\]]', re.DOTALL)
+_COLON = re.compile(rb"\s*:")
+
+
+def build_index(buffer: Union[bytes, mmap.mmap]) -> Offsets:
+    """
+    Scan a MTGJSON document to find the byte offsets of the items of its ``data``
+    object, without decoding it
+
+    Only objects, arrays and strings items are indexed.
+
+    :param buffer: The uncompressed document
+    :return: The start and end offsets of each item, by key
+    """
+    offsets: Offsets = {}
+    depth = 0
+    in_data = False
+    data_is_next = False
+    key: Optional[str] = None
+    start = 0
+
+    for match in _TOKENS.finditer(buffer):
+        position = match.start()
+        char = buffer[position]
+        if char == 0x22:  # a string, either a key or a value
+            if depth == 1 and _COLON.match(buffer, match.end()):
+                data_is_next = match.group() == b'"data"'
+            elif depth == 2 and in_data:
+                if _COLON.match(buffer, match.end()):
+                    key = json.loads(match.group())
+                elif key is not None:
+                    offsets[key] = (position, match.end())
+                    key = None
+        elif char in (0x7B, 0x5B):  # { or [
+            depth += 1
+            if depth == 2:
+                in_data, data_is_next = data_is_next, False
+            elif depth == 3 and in_data and key is not None:
+                start = position
+        else:  # } or ]
+            if depth == 3 and in_data and key is not None:
+                offsets[key] = (start, match.end())
+                key = None
+            depth -= 1
+            if depth == 1 and in_data:
+                break
+
+    return offsets
+
+
+class MmapReader:
+    """
+    An async file-like reader (as expected by ijson) of a memory mapped file
+    """
+
+    def __init__(self, buffer: mmap.mmap):
+        self.buffer = buffer
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.buffer.read(size)
+
+
+class MtgJsonMirror:
+    """
+    A local copy of MTGJSON datasets, shared by the processes of a host
+
+    Datasets are stored uncompressed, along with a ``.version`` file recording
+    their MTGJSON version. Updates are performed under a file lock, and swapped in
+    atomically, so that a process reading a dataset keeps its previous version.
+
+    The byte offsets of the items of a dataset are indexed in a ``.index`` file on
+    first lookup, so that a single item can later be read without parsing the
+    whole dataset.
+
+    The blocks of bzip2 and multi-block xz downloads are decompressed in parallel
+    (see ``decompress_blocks()``).
+
+    :param directory: The mirror directory
+    :param workers: Optional. The number of threads decompressing blocks, the number
+                    of CPU by default
+    """
+
+    def __init__(
+        self, directory: Union[str, pathlib.Path], workers: Optional[int] = None
+    ):
+        self.directory = pathlib.Path(directory)
+        self.workers = workers
+        self._indexes: Dict[str, Tuple[List[int], Offsets]] = {}
+
+    def path(self, kind: str) -> pathlib.Path:
+        return self.directory.joinpath(f"{kind}.json")
+
+    def version(self, kind: str) -> Optional[str]:
+        """
+        :param kind: The dataset name, such as ``AllPrintings``
+        :return: The MTGJSON version of the local dataset, or None if absent
+        """
+        try:
+            if not self.path(kind).exists():
+                return None
+            return self.path(kind).with_suffix(".version").read_text().strip()
+        except OSError:
+            return None
+
+    def lock(self, kind: str) -> FileLock:
+        return FileLock(self.path(kind).with_suffix(".lock"))
+
+    async def update(
+        self,
+        kind: str,
+        source: pathlib.Path,
+        version: Optional[str],
+        compression: Optional[str] = None,
+    ) -> pathlib.Path:
+        """
+        Swap in a new copy of a dataset, the caller must hold its lock
+
+        :param kind: The dataset name
+        :param source: The downloaded dataset, removed once swapped in
+        :param version: The MTGJSON version of the dataset
+        :param compression: Optional. The compression of ``source``, as returned by
+                            ``MtgJsonCompression.to_stream_compression()``
+        :return: The local path of the dataset
+        """
+        path = self.path(kind)
+        if compression is None:
+            os.replace(source, path)
+        else:
+            await asyncio.to_thread(self._decompress, source, path, compression)
+        path.with_suffix(".index").unlink(missing_ok=True)
+
+        version_path = path.with_suffix(".version")
+        if version is None:
+            version_path.unlink(missing_ok=True)
+        else:
+            tmp = version_path.with_name(f"{version_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(version)
+            os.replace(tmp, version_path)
+        return path
+
+    def _decompress(self, source: pathlib.Path, path: pathlib.Path, compression: str):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            if compression in SPLITTERS and self.workers != 1:
+                try:
+                    self._decompress_blocks(source, tmp, compression)
+                except (OSError, EOFError, ValueError, lzma.LZMAError):
+                    # A block boundary may have been mistaken, decompress serially
+                    logger.warning("Failed to decompress %s by blocks", source)
+                    self._decompress_stream(source, tmp, compression)
+            else:
+                self._decompress_stream(source, tmp, compression)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        source.unlink()
+
+    def _decompress_blocks(
+        self, source: pathlib.Path, tmp: pathlib.Path, compression: str
+    ):
+        with open(source, "rb") as src, open(tmp, "wb") as dst:
+            with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                for chunk in decompress_blocks(buffer, compression, self.workers):
+                    dst.write(chunk)
+
+    @staticmethod
+    def _decompress_stream(source: pathlib.Path, tmp: pathlib.Path, compression: str):
+        with DECOMPRESSORS[compression](source) as src, open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+
+    @contextmanager
+    def open(self, kind: str) -> Iterator[MmapReader]:
+        """
+        Memory map a local dataset
+
+        :param kind: The dataset name
+        """
+        with open(self.path(kind), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                yield MmapReader(buffer)
+
+    def lookup(self, kind: str, key: str) -> bytes:
+        """
+        Read the raw JSON of a single item of a local dataset, such as a set of
+        ``AllPrintings`` or a card of ``AllIdentifiers``
+
+        :param kind: The dataset name
+        :param key: The item key, such as a set code or a card uuid
+        :raise KeyError: The item does not exist
+        :return: The JSON document of the item
+        """
+        with open(self.path(kind), "rb") as f:
+            start, end = self._index(kind, f)[key]
+            f.seek(start)
+            return f.read(end - start)
+
+    def _index(self, kind: str, f: BinaryIO) -> Offsets:
+        stat = os.fstat(f.fileno())
+        signature = [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+        cached = self._indexes.get(kind)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        index_path = self.path(kind).with_suffix(".index")
+        offsets = None
+        try:
+            payload = json.loads(index_path.read_bytes())
+            if payload["signature"] == signature:
+                offsets = {k: (v[0], v[1]) for k, v in payload["offsets"].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+        if offsets is None:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                offsets = build_index(buffer)
+            tmp = index_path.with_name(f"{index_path.name}.{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"signature": signature, "offsets": offsets}))
+            os.replace(tmp, index_path)
+
+        self._indexes[kind] = (signature, offsets)
+        return offsets
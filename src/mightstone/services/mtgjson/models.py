@@ -36,17 +36,22 @@ class MtgJsonDocument(MightstoneDocument):
             return doc
 
         if not doc.id and "id" not in value:
-            if "uuid" in value:
-                doc.id = value["uuid"]
-            elif "code" in value:
-                doc.id = generate_uuid_from_string(value["code"])
-            elif "asciiName" in value:
-                doc.id = generate_uuid_from_string(value["asciiName"])
-            elif "name" in value:
-                doc.id = generate_uuid_from_string(value["name"])
+            doc.id = cls.infer_id(value)
 
         return doc
 
+    @classmethod
+    def infer_id(cls, value: Dict[str, Any]) -> Any:
+        if "uuid" in value:
+            return value["uuid"]
+        elif "code" in value:
+            return generate_uuid_from_string(value["code"])
+        elif "asciiName" in value:
+            return generate_uuid_from_string(value["asciiName"])
+        elif "name" in value:
+            return generate_uuid_from_string(value["name"])
+        return None
+
 
 class Types(MightstoneModel):
     """
@@ -2363,6 +2368,24 @@ class SerializableCardPrices(CardPrices, MightstoneSerializableDocument):
     id: Optional[UUID] = Field(alias="uuid")  # type: ignore
 
 
+class PricePoint(MightstoneModel):
+    """
+    A price of a card, as stored by ``PriceHistory``
+    """
+
+    date: datetime.date
+    format: str
+    """The format, such as paper or mtgo"""
+    provider: str
+    """The price provider, such as tcgplayer"""
+    listing: str
+    """Either retail or buylist"""
+    finish: str
+    """The card finish, such as normal, foil or etched"""
+    currency: str
+    price: float
+
+
 class CardAtomic(MtgJsonDocument):
     """
     A representation of a group of Atomic Card such as returned by every _atomic
@@ -1,6 +1,7 @@
 import mightstone.services.scryfall.models
 
 from .api import Scryfall
+from .corpus import CardCorpus
 from .models import (
     Card,
     Catalog,
@@ -2,17 +2,37 @@
 Scryfall.com support classes
 """
 
+import asyncio
+import pathlib
+from collections import deque
 from enum import Enum
-from typing import Dict, List, Optional, TypeVar, Union, cast
+from typing import (
+    AsyncIterable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
 import ijson
+from hishel import AsyncCacheTransport
 from httpx import HTTPStatusError
+from injector import inject, noninjectable
 from pydantic import ValidationError
 from pydantic.networks import AnyUrl
 from typing_extensions import AsyncGenerator, Type, overload
 
-from mightstone.ass import compressor, synchronize
+from mightstone.ass import batched, compressor, read_ahead, synchronize
+from mightstone.core import MightstoneProjection, Validation, build, projection
+from mightstone.download import Downloader
 from mightstone.services import MightstoneHttpClient, ServiceError
+from mightstone.services.scryfall.bulk import ScryfallBulkStore
 from mightstone.services.scryfall.models import (
     BulkTagType,
     Card,
@@ -41,9 +61,24 @@ from mightstone.services.scryfall.models import (
     Tag,
     UniqueStrategy,
 )
+from mightstone.types import MightstoneIjsonBackend
 
 _T = TypeVar("_T", bound=ScryfallModel)
 
+Identifier = Union[
+    IdentifierId,
+    IdentifierName,
+    IdentifierNameSet,
+    IdentifierMtgId,
+    IdentifierOracleId,
+    IdentifierMultiverseId,
+    IdentifierCollectorNumberSet,
+    IdentifierIllustrationId,
+]
+
+COLLECTION_SIZE = 75
+"""The maximum number of identifiers of a ``/cards/collection`` request"""
+
 
 class PreferEnum(str, Enum):
     OLDEST = "oldest"
@@ -60,9 +95,38 @@ class PreferEnum(str, Enum):
 class Scryfall(MightstoneHttpClient):
     """
     Scryfall API client
+
+    If a ``directory`` is provided, bulk data files are kept there (see
+    ``ScryfallBulkStore``), optionally compressed with ``compression``: they are
+    downloaded once for all the processes of the host (resuming interrupted
+    transfers), only downloaded again when Scryfall reports a newer ``updated_at``,
+    then parsed from disk.
+
+    Paginated lists (such as ``search()``) fetch up to ``prefetch`` pages ahead of
+    the caller, still within the rate limits of the transport, so that the next
+    page is usually available once the current one is consumed. ``prefetch=0``
+    fetches each page on demand.
     """
 
     base_url = "https://api.scryfall.com"
+    service = "scryfall"
+
+    @inject
+    @noninjectable("directory", "compression", "prefetch")
+    def __init__(
+        self,
+        transport: Optional[AsyncCacheTransport] = None,
+        ijson: Optional[MightstoneIjsonBackend] = None,
+        directory: Optional[Union[str, pathlib.Path]] = None,
+        compression: Optional[str] = None,
+        prefetch: int = 1,
+    ):
+        super().__init__(transport=transport, ijson=ijson)
+        self.prefetch = prefetch
+        self.directory = pathlib.Path(directory) if directory else None
+        self.bulk_store: Optional[ScryfallBulkStore] = None
+        if self.directory:
+            self.bulk_store = ScryfallBulkStore(self.directory, compression)
 
     async def get_bulk_tags_async(
         self, tag_type: BulkTagType
@@ -84,7 +148,45 @@ class Scryfall(MightstoneHttpClient):
 
     get_bulk_tags = synchronize(get_bulk_tags_async)
 
-    async def get_bulk_data_async(self, bulk_type: str) -> AsyncGenerator[Card, None]:
+    # "rulings" also matches the next overload, the first matching one wins
+    @overload
+    def get_bulk_data_async(  # type: ignore[overload-overlap]
+        self,
+        bulk_type: Literal["rulings"],
+        validation: Literal[Validation.FULL, Validation.LAZY] = ...,
+        fields: None = None,
+    ) -> AsyncGenerator[Ruling, None]: ...
+
+    @overload
+    def get_bulk_data_async(
+        self,
+        bulk_type: str,
+        validation: Literal[Validation.FULL, Validation.LAZY] = ...,
+        fields: None = None,
+    ) -> AsyncGenerator[Card, None]: ...
+
+    @overload
+    def get_bulk_data_async(
+        self,
+        bulk_type: str,
+        validation: Literal[Validation.NONE],
+        fields: Optional[List[str]] = None,
+    ) -> AsyncGenerator[Dict, None]: ...
+
+    @overload
+    def get_bulk_data_async(
+        self,
+        bulk_type: str,
+        validation: Validation = ...,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncGenerator[Union[Card, Ruling, MightstoneProjection, Dict], None]: ...
+
+    async def get_bulk_data_async(
+        self,
+        bulk_type: str,
+        validation: Validation = Validation.FULL,
+        fields: Optional[List[str]] = None,
+    ) -> AsyncGenerator[Union[Card, Ruling, MightstoneProjection, Dict], None]:
         """
         Access the bulk cards
         This script uses ijson and should stream data on the fly
@@ -92,10 +194,51 @@ class Scryfall(MightstoneHttpClient):
         See https://scryfall.com/docs/api/bulk-data for more informations
 
         :param bulk_type: A string describing the bulk export name
-        :return: An async iterator of ``Card``
+        :param validation: Validate the cards (full), or trust Scryfall data to build
+                           them faster (lazy), or even keep them raw (none)
+        :param fields: Optional. Only validate those fields of the cards, such as
+                       ``["id", "name", "prices"]`` (see
+                       ``mightstone.core.projection()``)
+        :return: An async iterator of ``Card`` (``Ruling`` for the ``rulings`` bulk
+                 type), of projections using ``fields``, or of raw dicts using
+                 ``Validation.NONE``
+        """
+        base = Ruling if bulk_type == "rulings" else Card
+        model = projection(base, fields) if fields else base
+        bulk = await self._bulk_async(bulk_type)
+
+        if self.bulk_store:
+            await self._store_bulk(bulk)
+            async with self.bulk_store.open(bulk_type) as f:
+                async for current_card in ijson.items_async(f, "item"):
+                    yield build(model, current_card, validation)
+            return
+
+        async with self.client.stream("GET", self._download_uri(bulk)) as f:
+            f.raise_for_status()
+            async for current_card in ijson.items_async(
+                compressor.open(f.aiter_bytes()), "item"
+            ):
+                yield build(model, current_card, validation)
+
+    get_bulk_data = synchronize(get_bulk_data_async)
+
+    async def update_bulk_data_async(self, bulk_type: str) -> pathlib.Path:
+        """
+        Download a bulk type to the local store, if Scryfall reports a newer version
+        than the local one
+
+        :param bulk_type: A string describing the bulk export name
+        :return: The local path of the bulk file
         """
+        if not self.bulk_store:
+            raise ValueError("A directory is required to store bulk data")
+        return await self._store_bulk(await self._bulk_async(bulk_type))
+
+    update_bulk_data = synchronize(update_bulk_data_async)
+
+    async def _bulk_async(self, bulk_type: str) -> dict:
         bulk_types = []
-        bulk = None
         async with self.client.stream("GET", "/bulk-data") as f:
             f.raise_for_status()
 
@@ -104,19 +247,35 @@ class Scryfall(MightstoneHttpClient):
             ):
                 bulk_types.append(current_bulk.get("type"))
                 if current_bulk.get("type") == bulk_type:
-                    bulk = current_bulk
+                    return current_bulk
 
-        if not bulk:
-            raise IndexError(f"{bulk_type} bulk type not found in {bulk_types}")
+        raise IndexError(f"{bulk_type} bulk type not found in {bulk_types}")
 
-        async with self.client.stream("GET", bulk.get("download_uri")) as f:
-            f.raise_for_status()
-            async for current_card in ijson.items_async(
-                compressor.open(f.aiter_bytes()), "item"
-            ):
-                yield Card.model_validate(current_card)
+    @staticmethod
+    def _download_uri(bulk: dict) -> str:
+        uri = bulk.get("download_uri")
+        if not uri:
+            raise ServiceError(
+                message=f"No download uri for {bulk.get('type')} bulk data",
+                url="/bulk-data",
+                method="GET",
+            )
+        return uri
 
-    get_bulk_data = synchronize(get_bulk_data_async)
+    async def _store_bulk(self, bulk: dict) -> pathlib.Path:
+        store = cast(ScryfallBulkStore, self.bulk_store)
+        bulk_type = bulk["type"]
+        if not store.is_outdated(bulk_type, bulk["updated_at"]):
+            return store.path(bulk_type)
+
+        async with store.lock(bulk_type):
+            # Another process may have updated it while we waited for the lock
+            if not store.is_outdated(bulk_type, bulk["updated_at"]):
+                return store.path(bulk_type)
+
+            source = store.directory.joinpath(f"{bulk_type}.download")
+            await Downloader(self.client).download(self._download_uri(bulk), source)
+            return await store.update(bulk_type, source, bulk["updated_at"])
 
     async def card_async(
         self, id: str, type: CardIdentifierPath = CardIdentifierPath.SCRYFALL
@@ -281,33 +440,42 @@ class Scryfall(MightstoneHttpClient):
 
     async def collection_async(
         self,
-        identifiers: List[
-            Union[
-                IdentifierId,
-                IdentifierName,
-                IdentifierNameSet,
-                IdentifierMtgId,
-                IdentifierOracleId,
-                IdentifierMultiverseId,
-                IdentifierCollectorNumberSet,
-                IdentifierIllustrationId,
-            ]
-        ],
+        identifiers: Union[Iterable[Identifier], AsyncIterable[Identifier]],
+        not_found: Optional[List[Identifier]] = None,
+        concurrency: int = 4,
     ) -> AsyncGenerator[Card, None]:
         """
-        Accepts a JSON array of card identifiers, and returns a List object with the
-        collection of requested cards. A maximum of 75 card references may be
-        submitted per request.
+        Accepts card identifiers, and returns the collection of requested cards.
+
+        Scryfall accepts a maximum of 75 card references per request, identifiers
+        are therefore sent by chunks of 75, up to ``concurrency`` requests at once.
+        Cards are returned in the order of the identifiers, identifiers that did not
+        match any card are skipped.
 
-        :param identifiers: Each submitted card identifier must be a JSON object with
-                            one or more of the keys id, mtgo_id, multiverse_id,
-                            oracle_id, illustration_id, name, set, and collector_number
+        :param identifiers: An iterable, or async iterable, of card identifiers. Each
+                            identifier must be a JSON object with one or more of the
+                            keys id, mtgo_id, multiverse_id, oracle_id,
+                            illustration_id, name, set, and collector_number
+        :param not_found: Optional. A list extended with the identifiers that did not
+                          match any card
+        :param concurrency: The maximum number of requests in flight
         :return: A scryfall `Card` instance async generator
         """
-        async for item in self._list(
-            "/cards/collection", Card, verb="POST", json={"identifiers": identifiers}
-        ):
-            yield item
+        pending: Deque[asyncio.Task] = deque()
+        try:
+            async for chunk in batched(identifiers, COLLECTION_SIZE):
+                pending.append(asyncio.ensure_future(self._collection_chunk(chunk)))
+                if len(pending) < concurrency:
+                    continue
+                for card in await self._collection_result(pending.popleft(), not_found):
+                    yield card
+
+            while pending:
+                for card in await self._collection_result(pending.popleft(), not_found):
+                    yield card
+        finally:
+            for task in pending:
+                task.cancel()
 
     collection = synchronize(collection_async)
 
@@ -502,7 +670,9 @@ class Scryfall(MightstoneHttpClient):
             )
 
     @overload
-    def _list(self, path: str, model: None, **kwargs) -> AsyncGenerator[Dict, None]: ...
+    def _list(
+        self, path: str, model: None = None, **kwargs
+    ) -> AsyncGenerator[Dict, None]: ...
 
     @overload
     def _list(
@@ -513,21 +683,11 @@ class Scryfall(MightstoneHttpClient):
         self, path, model: Optional[Type[_T]] = None, verb="GET", limit=None, **kwargs
     ) -> AsyncGenerator[Union[_T, Dict], None]:
         i = 0
+        # The pages beyond the limit are not fetched, even ahead
+        inner = self._pages(path, verb, limit, **kwargs)
+        pages = read_ahead(inner, self.prefetch)
         try:
-            while True:
-                response = await self.client.request(verb, path, **kwargs)
-                if response.is_error:
-                    raise ServiceError(
-                        message="Failed to fetch data from Scryfall",
-                        url=response.request.url,
-                        status=response.status_code,
-                        data=Error.model_validate(response.json()),
-                    )
-
-                my_list = ScryfallList.model_validate(response.json())
-                if my_list is None:
-                    return
-
+            async for path, my_list in pages:
                 for item in my_list.data:
                     if limit and i >= limit:
                         return
@@ -537,13 +697,6 @@ class Scryfall(MightstoneHttpClient):
                         yield model.model_validate(item)
                     else:
                         yield item
-
-                if not my_list.has_more:
-                    return
-
-                next_page = cast(AnyUrl, my_list.next_page)
-                path = f"{next_page.path}?{next_page.query}"
-                await self._sleep()
         except ValidationError as e:
             raise ServiceError(
                 message=f"Failed to validate {model} data for item #{i}, {e.errors()}",
@@ -558,3 +711,68 @@ class Scryfall(MightstoneHttpClient):
                 status=e.response.status_code,
                 data=Error.model_validate(e),
             )
+        finally:
+            await pages.aclose()
+            await inner.aclose()
+
+    async def _pages(
+        self, path: str, verb: str, limit: Optional[int] = None, **kwargs
+    ) -> AsyncGenerator[Tuple[str, ScryfallList], None]:
+        count = 0
+        while True:
+            response = await self.client.request(verb, path, **kwargs)
+            if response.is_error:
+                raise ServiceError(
+                    message="Failed to fetch data from Scryfall",
+                    url=response.request.url,
+                    status=response.status_code,
+                    data=Error.model_validate(response.json()),
+                )
+
+            my_list = ScryfallList.model_validate(response.json())
+            if my_list is None:
+                return
+            yield path, my_list
+
+            count += len(my_list.data)
+            if not my_list.has_more or (limit and count >= limit):
+                return
+
+            # The next page URL already carries the query parameters, httpx would
+            # replace them with the ones of the first request
+            next_page = cast(AnyUrl, my_list.next_page)
+            path = f"{next_page.path}?{next_page.query}"
+            kwargs.pop("params", None)
+
+    async def _collection_chunk(self, identifiers: List[Identifier]) -> ScryfallList:
+        pages = self._pages(
+            "/cards/collection", "POST", json={"identifiers": identifiers}
+        )
+        try:
+            _, my_list = await pages.__anext__()
+            return my_list
+        except StopAsyncIteration:
+            raise ServiceError(
+                message="Scryfall returned no collection",
+                url="/cards/collection",
+                method="POST",
+            )
+        finally:
+            await pages.aclose()
+
+    @staticmethod
+    async def _collection_result(
+        task: "asyncio.Task[ScryfallList]", not_found: Optional[List[Identifier]]
+    ) -> List[Card]:
+        my_list = await task
+        if not_found is not None:
+            not_found.extend(my_list.not_found)
+        try:
+            return [Card.model_validate(item) for item in my_list.data]
+        except ValidationError as e:
+            raise ServiceError(
+                message=f"Failed to validate {Card} data, {e.errors()}",
+                url="/cards/collection",
+                method="POST",
+                data=e,
+            )
@@ -0,0 +1,141 @@
+"""
+Local store of Scryfall bulk data
+"""
+
+import asyncio
+import datetime
+import json
+import os
+import pathlib
+from typing import Optional, Union
+
+from mightstone.ass import compressor
+from mightstone.ass.compressor import get_codec
+from mightstone.ass.compressor.async_file_obj import AsyncFileObj
+from mightstone.lock import FileLock
+
+SUFFIXES = {
+    None: "",
+    "gzip": ".gz",
+    "lzma": ".xz",
+    "bzip2": ".bz2",
+    "zstd": ".zst",
+    "brotli": ".br",
+}
+
+
+def parse_updated_at(value: str) -> datetime.datetime:
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class ScryfallBulkStore:
+    """
+    A local copy of Scryfall bulk data, shared by the processes of a host
+
+    Each bulk type (such as ``default_cards`` or ``rulings``) is stored as a
+    ``{type}.json`` file, optionally compressed, along with a ``{type}.meta.json``
+    file recording its Scryfall ``updated_at``. Updates are performed under a file
+    lock, and swapped in atomically.
+
+    :param directory: The store directory
+    :param compression: Optional. The compression of the stored files, such as
+                        ``zstd`` or ``gzip`` (see ``compressor.open()``)
+    """
+
+    def __init__(
+        self, directory: Union[str, pathlib.Path], compression: Optional[str] = None
+    ):
+        if compression not in SUFFIXES:
+            raise ValueError(f"Unsupported compression {compression}")
+        self.directory = pathlib.Path(directory)
+        self.compression = compression
+
+    def path(self, bulk_type: str) -> pathlib.Path:
+        return self.directory.joinpath(f"{bulk_type}.json{SUFFIXES[self.compression]}")
+
+    def lock(self, bulk_type: str) -> FileLock:
+        return FileLock(self.directory.joinpath(f"{bulk_type}.lock"))
+
+    def updated_at(self, bulk_type: str) -> Optional[str]:
+        """
+        :param bulk_type: The bulk type
+        :return: The Scryfall ``updated_at`` of the local file, or None if absent, or
+                 stored with another compression
+        """
+        try:
+            meta = json.loads(self._meta_path(bulk_type).read_text())
+        except (OSError, ValueError):
+            return None
+        if meta.get("compression") != self.compression:
+            return None
+        if not self.path(bulk_type).exists():
+            return None
+        return meta.get("updated_at")
+
+    def is_outdated(self, bulk_type: str, updated_at: str) -> bool:
+        """
+        :param bulk_type: The bulk type
+        :param updated_at: The ``updated_at`` reported by Scryfall
+        :return: Whether Scryfall holds a newer version than the local file
+        """
+        local = self.updated_at(bulk_type)
+        if local is None:
+            return True
+        return parse_updated_at(updated_at) > parse_updated_at(local)
+
+    async def update(
+        self, bulk_type: str, source: pathlib.Path, updated_at: str
+    ) -> pathlib.Path:
+        """
+        Swap in a new copy of a bulk type, the caller must hold its lock
+
+        :param bulk_type: The bulk type
+        :param source: The downloaded file, removed once swapped in
+        :param updated_at: The Scryfall ``updated_at`` of the file
+        :return: The local path of the file
+        """
+        path = self.path(bulk_type)
+        if self.compression is None:
+            os.replace(source, path)
+        else:
+            await asyncio.to_thread(self._compress, source, path)
+
+        meta_path = self._meta_path(bulk_type)
+        tmp = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(
+            json.dumps({"updated_at": updated_at, "compression": self.compression})
+        )
+        os.replace(tmp, meta_path)
+
+        # Files stored with another compression are stale
+        for suffix in SUFFIXES.values():
+            other = self.directory.joinpath(f"{bulk_type}.json{suffix}")
+            if other != path:
+                other.unlink(missing_ok=True)
+        return path
+
+    def open(self, bulk_type: str) -> AsyncFileObj:
+        """
+        Open a local bulk file, use it as an async context manager
+
+        :param bulk_type: The bulk type
+        """
+        return compressor.open(
+            str(self.path(bulk_type)), "rb", compression=self.compression
+        )
+
+    def _meta_path(self, bulk_type: str) -> pathlib.Path:
+        return self.directory.joinpath(f"{bulk_type}.meta.json")
+
+    def _compress(self, source: pathlib.Path, path: pathlib.Path):
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        encoder, _ = get_codec(self.compression)
+        try:
+            with open(source, "rb") as src, open(tmp, "wb") as dst:
+                while chunk := src.read(1024 * 1024):
+                    dst.write(encoder.compress(chunk))
+                dst.write(encoder.flush())
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        source.unlink()
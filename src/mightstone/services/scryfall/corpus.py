@@ -0,0 +1,631 @@
+"""
+Offline evaluation of Scryfall queries against a local card corpus
+"""
+
+import datetime
+import functools
+import math
+import re
+from collections import OrderedDict
+from typing import (
+    Any,
+    AsyncIterable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from mightstone.ass.compressor.codecs import error_import_usage
+from mightstone.core import Validation, build
+from mightstone.services.scryfall.models import Card
+from mightstone.services.scryfall.query import (
+    BinOp,
+    ComparatorEnum,
+    KeywordEnum,
+    OperatorEnum,
+    OpNode,
+    Query,
+    Term,
+    UnOp,
+)
+from mightstone.services.scryfall.vocabulary import (
+    COLOR_NAMES,
+    DOUBLE_FACED_LAYOUTS,
+    IGNORED,
+    LAYOUTS,
+    RARITIES,
+)
+
+COLORS = {"w": 1, "u": 2, "b": 4, "r": 8, "g": 16, "c": 32}
+"""The bit of each color in the color masks, colorless is only used by ``produces``"""
+
+LEGALITIES = ["not_legal", "legal", "restricted", "banned"]
+
+FLAGS: Dict[str, Callable[[dict], bool]] = {
+    "reserved": lambda card: bool(card.get("reserved")),
+    "digital": lambda card: bool(card.get("digital")),
+    "promo": lambda card: bool(card.get("promo")),
+    "reprint": lambda card: bool(card.get("reprint")),
+    "fullart": lambda card: bool(card.get("full_art")),
+    "textless": lambda card: bool(card.get("textless")),
+    "oversized": lambda card: bool(card.get("oversized")),
+    "spotlight": lambda card: bool(card.get("story_spotlight")),
+    "foil": lambda card: "foil" in (card.get("finishes") or ()),
+    "nonfoil": lambda card: "nonfoil" in (card.get("finishes") or ()),
+    "etched": lambda card: "etched" in (card.get("finishes") or ()),
+    "dfc": lambda card: card.get("layout") in DOUBLE_FACED_LAYOUTS,
+    "mdfc": lambda card: card.get("layout") == "modal_dfc",
+    "funny": lambda card: card.get("set_type") == "funny",
+}
+"""The ``is:`` criteria that are not layouts"""
+
+NUMERIC = {
+    KeywordEnum.MANA_VALUE: "cmc",
+    KeywordEnum.POWER: "power",
+    KeywordEnum.TOUGHNESS: "toughness",
+    KeywordEnum.POWTOU: "powtou",
+    KeywordEnum.LOYALTY: "loyalty",
+    KeywordEnum.USD: "usd",
+    KeywordEnum.EUR: "eur",
+    KeywordEnum.TIX: "tix",
+    KeywordEnum.YEAR: "year",
+    KeywordEnum.DATE: "date",
+}
+"""The keywords compared to a float column (missing values are NaN)"""
+
+TEXT = {
+    KeywordEnum.NAME: "name",
+    KeywordEnum.ORACLE: "oracle_text",
+    KeywordEnum.TYPE: "type_line",
+    KeywordEnum.FLAVOR: "flavor_text",
+    KeywordEnum.ARTIST: "artist",
+    KeywordEnum.WATERMARK: "watermark",
+}
+"""The keywords matched as a substring, or a regular expression, of a text column"""
+
+CATEGORIES = {
+    KeywordEnum.SET: "set",
+    KeywordEnum.NUMBER: "collector_number",
+    KeywordEnum.LANGUAGE: "lang",
+    KeywordEnum.BORDER: "border_color",
+    KeywordEnum.FRAME: "frame",
+}
+"""The keywords matched as an exact value of a dictionary encoded column"""
+
+COLOR_MASKS = {
+    KeywordEnum.COLOR: "colors",
+    KeywordEnum.IDENTITY: "color_identity",
+    KeywordEnum.PRODUCES: "produced_mana",
+}
+
+Mask = Any
+"""A numpy boolean array, one value per card of the corpus"""
+
+Predicate = Callable[["CardCorpus"], Mask]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        error_import_usage("numpy")
+    return numpy
+
+
+def _float(value: Any) -> float:
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _faces(card: dict, key: str) -> Any:
+    value = card.get(key)
+    if value is None and card.get("card_faces"):
+        values = [face.get(key) for face in card["card_faces"] if face.get(key)]
+        if values and isinstance(values[0], list):
+            return [item for face in values for item in face]
+        if values:
+            return values[0] if key in ("power", "toughness", "loyalty") else values
+    return value
+
+
+def _text(card: dict, key: str) -> str:
+    value = _faces(card, key)
+    if isinstance(value, list):
+        return "\n".join(value)
+    return value or ""
+
+
+def _color_mask(colors: Optional[Iterable[str]]) -> int:
+    mask = 0
+    for color in colors or ():
+        mask |= COLORS.get(color.lower(), 0)
+    return mask
+
+
+@functools.lru_cache(maxsize=None)
+def _date(value: Any) -> float:
+    if not value:
+        return math.nan
+    return float(datetime.date.fromisoformat(str(value)).toordinal())
+
+
+@functools.lru_cache(maxsize=None)
+def _year(value: str) -> float:
+    return _float(value[:4]) if value else math.nan
+
+
+class CardCorpus:
+    """
+    A local corpus of Scryfall cards, that can be searched offline with a ``Query``
+
+    Cards are loaded once into columns: numeric criteria (mana value, power,
+    prices, dates...), colors (as bit masks), rarity and legalities are numpy
+    arrays, so that a query is evaluated as a vectorized predicate over the whole
+    corpus. Text criteria (name, oracle, type...) are searched in a single string
+    per column.
+
+    Supported keywords are the text ones (``name``, ``oracle``, ``type``,
+    ``flavor``, ``artist``, ``watermark``, with regular expressions), the numeric
+    ones (``manavalue``, ``power``, ``toughness``, ``powtou``, ``loyalty``,
+    ``usd``, ``eur``, ``tix``, ``year``, ``date``), ``color``, ``identity``,
+    ``produces``, ``set``, ``number``, ``lang``, ``border``, ``frame``,
+    ``rarity``, ``format``, ``banned``, ``restricted``, ``game``, ``is`` and
+    ``not``. Display options (``order``, ``unique``...) are ignored, any other
+    keyword raises a ``ValueError``.
+
+    Requires numpy.
+
+    :param cards: The cards, either ``Card`` models or raw Scryfall data (as
+                  provided by ``Scryfall.get_bulk_data()`` with
+                  ``Validation.NONE``)
+    :param cache_size: The number of criteria masks kept in memory, so that
+                       criteria shared by queries are only evaluated once
+    """
+
+    def __init__(self, cards: Iterable[Union[Card, dict]], cache_size: int = 128):
+        numpy = _numpy()
+        self.cards: List[dict] = [
+            (
+                card.model_dump(mode="json", by_alias=True)
+                if isinstance(card, Card)
+                else card
+            )
+            for card in cards
+        ]
+        self.cache_size = cache_size
+        self._masks: "OrderedDict[Tuple, Mask]" = OrderedDict()
+        self._blobs: Dict[str, Tuple[str, Mask]] = {}
+        self._texts: Dict[str, List[str]] = {}
+        self._names: Optional[Dict[str, List[int]]] = None
+
+        numbers: Dict[str, List[float]] = {name: [] for name in NUMERIC.values()}
+        masks: Dict[str, List[int]] = {name: [] for name in COLOR_MASKS.values()}
+        categories: Dict[str, List[str]] = {
+            name: [] for name in (*CATEGORIES.values(), "layout")
+        }
+        rarities: List[int] = []
+        games: List[int] = []
+        self.games: Dict[str, int] = {}
+        legalities: Dict[str, List[int]] = {}
+
+        for row, card in enumerate(self.cards):
+            prices = card.get("prices") or {}
+            power = _float(_faces(card, "power"))
+            toughness = _float(_faces(card, "toughness"))
+            released_at = str(card.get("released_at") or "")
+            numbers["cmc"].append(_float(card.get("cmc")))
+            numbers["power"].append(power)
+            numbers["toughness"].append(toughness)
+            numbers["powtou"].append(power + toughness)
+            numbers["loyalty"].append(_float(_faces(card, "loyalty")))
+            numbers["usd"].append(_float(prices.get("usd")))
+            numbers["eur"].append(_float(prices.get("eur")))
+            numbers["tix"].append(_float(prices.get("tix")))
+            numbers["year"].append(_year(released_at))
+            numbers["date"].append(_date(released_at))
+
+            for name in masks:
+                masks[name].append(_color_mask(_faces(card, name)))
+            for name in categories:
+                categories[name].append(str(card.get(name) or "").lower())
+
+            rarity = card.get("rarity")
+            rarities.append(RARITIES.index(rarity) if rarity in RARITIES else -1)
+
+            game_mask = 0
+            for game in card.get("games") or ():
+                game_mask |= 1 << self.games.setdefault(game, len(self.games))
+            games.append(game_mask)
+
+            for fmt, legality in (card.get("legalities") or {}).items():
+                if fmt not in legalities:
+                    legalities[fmt] = [0] * row
+                legalities[fmt].append(LEGALITIES.index(legality))
+            for column in legalities.values():
+                if len(column) == row:
+                    column.append(0)
+
+        self.numbers: Dict[str, Mask] = {
+            name: numpy.asarray(values, dtype=numpy.float64)
+            for name, values in numbers.items()
+        }
+        self.masks: Dict[str, Mask] = {
+            name: numpy.asarray(values, dtype=numpy.uint8)
+            for name, values in masks.items()
+        }
+        self.categories: Dict[str, Tuple[Mask, Dict[str, int]]] = {
+            name: self._encode(values) for name, values in categories.items()
+        }
+        self.rarities: Mask = numpy.asarray(rarities, dtype=numpy.int8)
+        self.game_masks: Mask = numpy.asarray(games, dtype=numpy.uint64)
+        self.legalities: Dict[str, Mask] = {
+            name: numpy.asarray(values, dtype=numpy.uint8)
+            for name, values in legalities.items()
+        }
+        self.flags: Dict[str, Mask] = {
+            name: numpy.fromiter(
+                (flag(card) for card in self.cards), bool, len(self.cards)
+            )
+            for name, flag in FLAGS.items()
+        }
+
+    @classmethod
+    async def from_bulk_async(
+        cls, cards: AsyncIterable[Union[Card, dict]], cache_size: int = 128
+    ) -> "CardCorpus":
+        """
+        Load a corpus from an async iterable, such as
+        ``Scryfall.get_bulk_data_async("default_cards", Validation.NONE)``
+
+        :param cards: The cards
+        :param cache_size: The number of criteria masks kept in memory
+        :return: The corpus
+        """
+        return cls([card async for card in cards], cache_size)
+
+    def __len__(self):
+        return len(self.cards)
+
+    def mask(self, query: Union[Query, OpNode, str]) -> Mask:
+        """
+        Evaluate a query
+
+        :param query: The query, or a Scryfall search string
+        :raise ValueError: The query uses an unsupported keyword or value
+        :return: A numpy boolean array, true for each matching card, that may be
+                 read-only
+        """
+        return compile_query(query)(self)
+
+    def indexes(self, query: Union[Query, OpNode, str]) -> Mask:
+        """
+        :param query: The query, or a Scryfall search string
+        :return: The positions of the matching cards in ``cards``
+        """
+        return _numpy().flatnonzero(self.mask(query))
+
+    def count(self, query: Union[Query, OpNode, str]) -> int:
+        """
+        :param query: The query, or a Scryfall search string
+        :return: The number of matching cards
+        """
+        return int(self.mask(query).sum())
+
+    def search(
+        self,
+        query: Union[Query, OpNode, str],
+        validation: Validation = Validation.FULL,
+        limit: Optional[int] = None,
+    ) -> Iterator[Card]:
+        """
+        Search the corpus, cards are returned in the corpus order
+
+        :param query: The query, or a Scryfall search string
+        :param validation: Validate the cards (full), or trust the data to build
+                           them faster (lazy), or even keep them raw (none)
+        :param limit: Optional. The maximum number of cards
+        :return: An iterator of ``Card``
+        """
+        for row in self.indexes(query)[:limit]:
+            yield build(Card, self.cards[row], validation)
+
+    def _term(self, term: Term) -> Mask:
+        value = term.value
+        if not isinstance(value, (str, re.Pattern)):
+            raise ValueError(f"Unsupported value in {term!r}")
+
+        key = (term.keyword, term.comparator, value)
+        mask = self._masks.get(key)
+        if mask is not None:
+            self._masks.move_to_end(key)
+            return mask
+
+        mask = self._evaluate(term.keyword, term.comparator, value)
+        mask.flags.writeable = False
+        self._masks[key] = mask
+        if len(self._masks) > self.cache_size:
+            self._masks.popitem(last=False)
+        return mask
+
+    def _evaluate(
+        self,
+        keyword: KeywordEnum,
+        comparator: ComparatorEnum,
+        value: Union[str, re.Pattern],
+    ) -> Mask:
+        numpy = _numpy()
+        if keyword in IGNORED:
+            return numpy.ones(len(self), bool)
+        if isinstance(value, re.Pattern):
+            return self._regex(TEXT[keyword], value)
+
+        value = value.lower()
+        if keyword == KeywordEnum.NAME and comparator == ComparatorEnum.EXACT:
+            mask = numpy.zeros(len(self), bool)
+            mask[self._name_index().get(value, [])] = True
+            return mask
+        if keyword in TEXT:
+            return self._contains(TEXT[keyword], value)
+        if keyword in NUMERIC:
+            return self._compare_number(keyword, comparator, value)
+        if keyword in COLOR_MASKS:
+            return self._compare_colors(keyword, comparator, value)
+        if keyword in CATEGORIES:
+            codes, lookup = self.categories[CATEGORIES[keyword]]
+            return codes == lookup.get(value, -1)
+        if keyword == KeywordEnum.RARITY:
+            if value not in RARITIES:
+                value = {r[0]: r for r in RARITIES}.get(value, value)
+            if value not in RARITIES:
+                raise ValueError(f"Unknown rarity {value}")
+            return self._compare(self.rarities, comparator, RARITIES.index(value))
+        if keyword in (KeywordEnum.FORMAT, KeywordEnum.BANNED, KeywordEnum.RESTRICTED):
+            return self._legality(keyword, value)
+        if keyword == KeywordEnum.GAME:
+            if value not in self.games:
+                return numpy.zeros(len(self), bool)
+            bit = numpy.uint64(1 << self.games[value])
+            return (self.game_masks & bit) != 0
+        if keyword in (KeywordEnum.IS, KeywordEnum.NOT):
+            mask = self._is(value)
+            return ~mask if keyword == KeywordEnum.NOT else mask
+
+        raise ValueError(f"Keyword `{keyword.value}` is not supported offline")
+
+    def _compare_number(
+        self, keyword: KeywordEnum, comparator: ComparatorEnum, value: str
+    ) -> Mask:
+        column = self.numbers[NUMERIC[keyword]]
+        try:
+            other = self.numbers[NUMERIC[KeywordEnum.factory(value)]]
+        except (ValueError, KeyError):
+            if keyword == KeywordEnum.DATE:
+                other = _date(value)
+            else:
+                other = _float(value)
+            if math.isnan(other):
+                raise ValueError(f"Invalid number {value} for {keyword.value}")
+        mask = self._compare(column, comparator, other)
+        if comparator == ComparatorEnum.NEQUAL:
+            # NaN differs from anything, but a missing value matches nothing
+            mask &= ~_numpy().isnan(column)
+        return mask
+
+    def _compare_colors(
+        self, keyword: KeywordEnum, comparator: ComparatorEnum, value: str
+    ) -> Mask:
+        numpy = _numpy()
+        column = self.masks[COLOR_MASKS[keyword]]
+        counts = _popcount(column & 31)
+        if value.isdigit():
+            return self._compare(counts, comparator, int(value))
+        if value in ("m", "multicolor"):
+            return counts >= 2
+
+        letters = COLOR_NAMES.get(value, value)
+        if not all(letter in COLORS for letter in letters):
+            raise ValueError(f"Invalid colors {value} for {keyword.value}")
+        query = _color_mask(letters)
+        if query in (0, COLORS["c"]):
+            # Colorless, such as ``c:c``
+            if keyword == KeywordEnum.PRODUCES:
+                return (column & COLORS["c"]) != 0
+            return (column & 31) == 0
+
+        if comparator == ComparatorEnum.COLON:
+            comparator = (
+                ComparatorEnum.LTE
+                if keyword == KeywordEnum.IDENTITY
+                else ComparatorEnum.GTE
+            )
+        query = numpy.uint8(query)
+        if comparator == ComparatorEnum.EQUAL:
+            return column == query
+        if comparator == ComparatorEnum.NEQUAL:
+            return column != query
+        superset = (column & query) == query
+        subset = (column & ~query) == 0
+        if comparator == ComparatorEnum.GTE:
+            return superset
+        if comparator == ComparatorEnum.GT:
+            return superset & (column != query)
+        if comparator == ComparatorEnum.LTE:
+            return subset
+        return subset & (column != query)
+
+    @staticmethod
+    def _compare(column: Mask, comparator: ComparatorEnum, other: Any) -> Mask:
+        if comparator == ComparatorEnum.LT:
+            return column < other
+        if comparator == ComparatorEnum.LTE:
+            return column <= other
+        if comparator == ComparatorEnum.GT:
+            return column > other
+        if comparator == ComparatorEnum.GTE:
+            return column >= other
+        if comparator == ComparatorEnum.NEQUAL:
+            return column != other
+        return column == other
+
+    def _legality(self, keyword: KeywordEnum, value: str) -> Mask:
+        numpy = _numpy()
+        column = self.legalities.get(value)
+        if column is None:
+            return numpy.zeros(len(self), bool)
+        if keyword == KeywordEnum.BANNED:
+            return column == LEGALITIES.index("banned")
+        if keyword == KeywordEnum.RESTRICTED:
+            return column == LEGALITIES.index("restricted")
+        # Restricted cards are legal, as a single copy
+        return (column == LEGALITIES.index("legal")) | (
+            column == LEGALITIES.index("restricted")
+        )
+
+    def _is(self, value: str) -> Mask:
+        if value in self.flags:
+            return self.flags[value]
+        if value in LAYOUTS:
+            codes, lookup = self.categories["layout"]
+            return codes == lookup.get(value, -1)
+        raise ValueError(f"Criteria `is:{value}` is not supported offline")
+
+    def _contains(self, column: str, needle: str) -> Mask:
+        numpy = _numpy()
+        if not needle:
+            # Every text contains the empty string, as with the ``$regex`` of Mongo
+            return numpy.ones(len(self), bool)
+
+        mask = numpy.zeros(len(self), bool)
+        if "~" in needle:
+            # ``~`` stands for the name of the card
+            names = self._text_column("name")
+            for row, text in enumerate(self._text_column(column)):
+                mask[row] = needle.replace("~", names[row]) in text
+            return mask
+
+        blob, starts = self._blob(column)
+        positions = numpy.fromiter(
+            (match.start() for match in re.finditer(re.escape(needle), blob)),
+            numpy.int64,
+        )
+        mask[numpy.searchsorted(starts, positions, "right") - 1] = True
+        return mask
+
+    def _regex(self, column: str, pattern: re.Pattern) -> Mask:
+        pattern = re.compile(pattern.pattern, pattern.flags | re.IGNORECASE)
+        texts = self._text_column(column)
+        return _numpy().fromiter(
+            (pattern.search(text) is not None for text in texts), bool, len(texts)
+        )
+
+    def _text_column(self, column: str) -> List[str]:
+        if column not in self._texts:
+            self._texts[column] = [_text(card, column).lower() for card in self.cards]
+        return self._texts[column]
+
+    def _blob(self, column: str) -> Tuple[str, Mask]:
+        """
+        All the texts of a column in a single string, separated by a NUL
+        character, along with the offset of each text (and of the end)
+        """
+        if column not in self._blobs:
+            numpy = _numpy()
+            texts = self._text_column(column)
+            lengths = numpy.fromiter((len(t) + 1 for t in texts), numpy.int64)
+            starts = numpy.zeros(len(texts) + 1, numpy.int64)
+            numpy.cumsum(lengths, out=starts[1:])
+            self._blobs[column] = ("\0".join(texts) + "\0", starts)
+        return self._blobs[column]
+
+    def _name_index(self) -> Dict[str, List[int]]:
+        if self._names is None:
+            self._names = {}
+            for row, name in enumerate(self._text_column("name")):
+                self._names.setdefault(name, []).append(row)
+        return self._names
+
+    @staticmethod
+    def _encode(values: List[str]) -> Tuple[Mask, Dict[str, int]]:
+        numpy = _numpy()
+        lookup: Dict[str, int] = {}
+        codes = numpy.fromiter(
+            (lookup.setdefault(v, len(lookup)) for v in values),
+            numpy.int32,
+            len(values),
+        )
+        return codes, lookup
+
+
+@functools.lru_cache(maxsize=None)
+def _popcount_table() -> Mask:
+    numpy = _numpy()
+    return numpy.array([bin(i).count("1") for i in range(256)], numpy.uint8)
+
+
+def _popcount(column: Mask) -> Mask:
+    return _popcount_table()[column]
+
+
+def compile_query(query: Union[Query, OpNode, str]) -> Predicate:
+    """
+    Compile a query into a predicate, a function returning the mask of the matching
+    cards of a ``CardCorpus``
+
+    Search strings are compiled once, then cached.
+
+    :param query: The query, or a Scryfall search string
+    :return: The predicate
+    """
+    if isinstance(query, str):
+        return _compile_string(query)
+    if isinstance(query, Query):
+        query = query.root
+    return _compile(query)
+
+
+@functools.lru_cache(maxsize=4096)
+def _compile_string(expression: str) -> Predicate:
+    return _compile(Query.parse(expression))
+
+
+def _compile(node: OpNode) -> Predicate:
+    if isinstance(node, Term):
+        return lambda corpus: corpus._term(node)
+
+    operands = [_compile(operand) for operand in node.operands]
+    if isinstance(node, UnOp):
+        operand = operands[0]
+        return lambda corpus: ~operand(corpus)
+
+    if not isinstance(node, BinOp):
+        raise ValueError(f"Unsupported node {node!r}")
+
+    if node.operator == OperatorEnum.OR:
+        return lambda corpus: _any(corpus, operands)
+    if node.operator == OperatorEnum.XOR:
+        # Consistent with ``to_string()``: any of the operands, but not all
+        return lambda corpus: _any(corpus, operands) & ~_all(corpus, operands)
+    return lambda corpus: _all(corpus, operands)
+
+
+def _any(corpus: CardCorpus, operands: List[Predicate]) -> Mask:
+    mask = operands[0](corpus).copy()
+    for operand in operands[1:]:
+        mask |= operand(corpus)
+    return mask
+
+
+def _all(corpus: CardCorpus, operands: List[Predicate]) -> Mask:
+    mask = operands[0](corpus).copy()
+    for operand in operands[1:]:
+        mask &= operand(corpus)
+    return mask
@@ -1,9 +1,10 @@
 import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 from uuid import UUID, uuid4
 
 from beanie import DecimalAnnotation, Indexed
+from beanie.odm.queries.find import FindMany
 from pydantic import (
     AnyUrl,
     Field,
@@ -15,6 +16,7 @@ from pydantic.json_schema import JsonSchemaValue
 from pydantic_core import CoreSchema
 from pydantic_core import core_schema
 from pydantic_core import core_schema as cs
+from pymongo import ASCENDING, IndexModel
 from typing_extensions import Literal, TypedDict
 
 from mightstone.common import generate_uuid_from_string
@@ -23,6 +25,7 @@ from mightstone.core import (
     MightstoneModel,
     MightstoneSerializableDocument,
 )
+from mightstone.services.scryfall.query import Query
 
 
 class Color(str):
@@ -89,6 +92,8 @@ class ScryfallList(ScryfallModel):
     strings. Warnings are non-fatal issues that the API discovered with your input.
     In general, they indicate that the List will not contain the all of the information
     you requested. You should fix the warnings and re-submit your request."""
+    not_found: List = []
+    """The card identifiers of a collection request that did not match any card."""
 
 
 class Error(ScryfallModel):
@@ -429,6 +434,49 @@ class Card(ScryfallDocument):
 
 class SerializableCard(Card, MightstoneSerializableDocument):
     id: UUID = Field(default_factory=uuid4)  # type: ignore
+    lower_name: Optional[str] = None
+    """The lowercased name of this card, matched by exact name criteria of
+    ``search()``"""
+
+    class Settings:
+        indexes = [
+            "lower_name",
+            "oracle_id",
+            "set",
+            "rarity",
+            "cmc",
+            "colors",
+            "color_identity",
+            "released_at",
+            "layout",
+            IndexModel([("legalities.$**", ASCENDING)]),
+        ]
+        """The fields filtered by ``search()``, legalities of every format"""
+
+    @classmethod
+    def search(cls, query: Union[Query, str], **kwargs) -> FindMany:
+        """
+        Search persisted cards with the Scryfall syntax
+
+        The query is compiled into a MongoDB filter (see ``Query.to_mongo()``), so
+        that cards are filtered by the database.
+
+        :param query: The query, or a Scryfall search string
+        :param kwargs: Extra arguments of beanie ``find()`` (such as ``limit``,
+                       ``sort``)
+        :raise ValueError: The query uses a keyword that can't be compiled
+        :return: A beanie query of ``SerializableCard``
+        """
+        if isinstance(query, str):
+            query = Query(query)
+        return cls.find(query.to_mongo(), **kwargs)
+
+    @model_validator(mode="wrap")  # type: ignore
+    @classmethod
+    def enforce_lower_name(cls, value: Any, handler) -> "SerializableCard":
+        doc = handler(value)
+        doc.lower_name = doc.name.lower()
+        return doc
 
 
 class SetType(str, Enum):
@@ -0,0 +1,433 @@
+"""
+Compilation of Scryfall queries into MongoDB filters, for persisted cards
+"""
+
+import datetime
+import re
+from typing import Any, Dict, List, Optional
+
+from mightstone.services.scryfall.query import (
+    BinOp,
+    ComparatorEnum,
+    KeywordEnum,
+    OperatorEnum,
+    OpNode,
+    Term,
+    UnOp,
+)
+from mightstone.services.scryfall.vocabulary import (
+    COLOR_NAMES,
+    DOUBLE_FACED_LAYOUTS,
+    IGNORED,
+    LAYOUTS,
+    RARITIES,
+)
+
+Filter = Dict[str, Any]
+
+WUBRG = ["W", "U", "B", "R", "G"]
+
+OPERATORS = {
+    ComparatorEnum.COLON: "$eq",
+    ComparatorEnum.EQUAL: "$eq",
+    ComparatorEnum.NEQUAL: "$ne",
+    ComparatorEnum.LT: "$lt",
+    ComparatorEnum.LTE: "$lte",
+    ComparatorEnum.GT: "$gt",
+    ComparatorEnum.GTE: "$gte",
+}
+
+TEXT = {
+    KeywordEnum.NAME: ["name"],
+    KeywordEnum.ORACLE: ["oracle_text", "card_faces.oracle_text"],
+    KeywordEnum.TYPE: ["type_line"],
+    KeywordEnum.FLAVOR: ["flavor_text", "card_faces.flavor_text"],
+    KeywordEnum.ARTIST: ["artist"],
+    KeywordEnum.WATERMARK: ["watermark"],
+}
+"""The fields matched by text criteria, faces are matched as well"""
+
+NUMBERS = {KeywordEnum.MANA_VALUE: "cmc"}
+"""The numeric criteria on numeric fields"""
+
+STRING_NUMBERS = {
+    KeywordEnum.POWER: "power",
+    KeywordEnum.TOUGHNESS: "toughness",
+    KeywordEnum.LOYALTY: "loyalty",
+    KeywordEnum.USD: "prices.usd",
+    KeywordEnum.EUR: "prices.eur",
+    KeywordEnum.TIX: "prices.tix",
+}
+"""The numeric criteria on fields stored as strings (such as ``*`` powers)"""
+
+CATEGORIES = {
+    KeywordEnum.SET: "set",
+    KeywordEnum.NUMBER: "collector_number",
+    KeywordEnum.LANGUAGE: "lang",
+    KeywordEnum.BORDER: "border_color",
+    KeywordEnum.FRAME: "frame",
+    KeywordEnum.GAME: "games",
+}
+
+COLOR_FIELDS = {
+    KeywordEnum.COLOR: "colors",
+    KeywordEnum.IDENTITY: "color_identity",
+    KeywordEnum.PRODUCES: "produced_mana",
+}
+
+FLAGS: Dict[str, Filter] = {
+    "reserved": {"reserved": True},
+    "digital": {"digital": True},
+    "promo": {"promo": True},
+    "reprint": {"reprint": True},
+    "fullart": {"full_art": True},
+    "textless": {"textless": True},
+    "oversized": {"oversized": True},
+    "spotlight": {"story_spotlight": True},
+    "foil": {"finishes": "foil"},
+    "nonfoil": {"finishes": "nonfoil"},
+    "etched": {"finishes": "etched"},
+    "dfc": {"layout": {"$in": sorted(DOUBLE_FACED_LAYOUTS)}},
+    "mdfc": {"layout": "modal_dfc"},
+    "funny": {"set_type": "funny"},
+}
+"""The ``is:`` criteria that are not layouts, consistent with ``CardCorpus``"""
+
+
+def to_mongo(node: OpNode) -> Filter:
+    """
+    Compile a query node into a MongoDB filter on ``SerializableCard`` documents
+
+    Most criteria are compiled into plain field queries, that can use the indexes
+    of ``SerializableCard``:
+
+     * exact names (such as ``!"Lightning Bolt"``) are an equality on the
+       lowercased name, ``lower_name``
+     * name regular expressions anchored at the start (such as ``name:/^light/``)
+       are narrowed by an anchored regular expression on ``lower_name``
+
+    The other text criteria are case-insensitive regular expressions, that scan
+    the collection. Numeric criteria on fields that Scryfall provides as strings
+    (power, toughness, loyalty, prices) are compiled into ``$expr`` conversions,
+    and can't use an index either.
+
+    :param node: The root of the query (see ``Query.root``)
+    :raise ValueError: The query uses a keyword that can't be compiled
+    :return: The filter document
+    """
+    if isinstance(node, Term):
+        return _term(node)
+
+    operands = [to_mongo(operand) for operand in node.operands]
+    if isinstance(node, UnOp):
+        return {"$nor": operands}
+    if not isinstance(node, BinOp):
+        raise ValueError(f"Unsupported node {node!r}")
+
+    if len(operands) == 1:
+        return operands[0]
+    if node.operator == OperatorEnum.OR:
+        return {"$or": operands}
+    if node.operator == OperatorEnum.XOR:
+        # Consistent with ``to_string()``: any of the operands, but not all
+        return {"$and": [{"$or": operands}, {"$nor": [{"$and": operands}]}]}
+    return {"$and": operands}
+
+
+def _term(term: Term) -> Filter:
+    keyword, comparator, value = term.keyword, term.comparator, term.value
+    if keyword in IGNORED:
+        return {}
+    if isinstance(value, re.Pattern):
+        criteria = _any(
+            {field: {"$regex": value.pattern, "$options": "i"}}
+            for field in TEXT[keyword]
+        )
+        prefix = _literal_prefix(value.pattern)
+        if keyword == KeywordEnum.NAME and prefix:
+            return {"$and": [{"lower_name": {"$regex": f"^{prefix}"}}, criteria]}
+        return criteria
+    if not isinstance(value, str):
+        raise ValueError(f"Unsupported value in {term!r}")
+
+    value = value.lower()
+    if keyword == KeywordEnum.NAME and comparator == ComparatorEnum.EXACT:
+        return {"lower_name": value}
+    if keyword == KeywordEnum.ORACLE and "~" in value:
+        return _oracle_with_name(value)
+    if keyword in TEXT:
+        return _any(
+            {field: {"$regex": re.escape(value), "$options": "i"}}
+            for field in TEXT[keyword]
+        )
+    if keyword in NUMBERS:
+        return _number(NUMBERS[keyword], comparator, value)
+    if keyword in STRING_NUMBERS:
+        return _string_number(keyword, comparator, value)
+    if keyword in (KeywordEnum.YEAR, KeywordEnum.DATE):
+        return _date(keyword, comparator, value)
+    if keyword in COLOR_FIELDS:
+        return _colors(keyword, comparator, value)
+    if keyword in CATEGORIES:
+        return {CATEGORIES[keyword]: value}
+    if keyword == KeywordEnum.RARITY:
+        return _rarity(comparator, value)
+    if keyword == KeywordEnum.FORMAT:
+        return {f"legalities.{value}": {"$in": ["legal", "restricted"]}}
+    if keyword == KeywordEnum.BANNED:
+        return {f"legalities.{value}": "banned"}
+    if keyword == KeywordEnum.RESTRICTED:
+        return {f"legalities.{value}": "restricted"}
+    if keyword in (KeywordEnum.IS, KeywordEnum.NOT):
+        criteria = _is(value)
+        return {"$nor": [criteria]} if keyword == KeywordEnum.NOT else criteria
+
+    raise ValueError(f"Keyword `{keyword.value}` can't be compiled into a filter")
+
+
+def _literal_prefix(pattern: str) -> str:
+    """
+    The literal text a regular expression starts with, if it is anchored, as an
+    escaped lowercase regular expression
+
+    A case-sensitive regular expression anchored at the start can use an index.
+    """
+    if not pattern.startswith("^") or "|" in pattern:
+        return ""
+
+    prefix = []
+    position = 1
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\" and position + 1 < len(pattern):
+            char = pattern[position + 1]
+            if char.isalnum():
+                # A class such as ``\d``, or a backreference
+                break
+            position += 1
+        elif not (char.isalnum() or char in " ,'-"):
+            break
+        position += 1
+        if pattern[position : position + 1] in ("?", "*", "{"):
+            # The last character is optional
+            break
+        prefix.append(char)
+    return re.escape("".join(prefix).lower())
+
+
+def _any(filters) -> Filter:
+    filters = list(filters)
+    return filters[0] if len(filters) == 1 else {"$or": filters}
+
+
+def _compare(field: str, comparator: ComparatorEnum, value: Any) -> Filter:
+    operator = OPERATORS[comparator]
+    if operator == "$eq":
+        return {field: value}
+    if operator == "$ne":
+        # A missing value matches nothing, as in Scryfall
+        return {field: {"$ne": value, "$exists": True, "$type": "number"}}
+    return {field: {operator: value}}
+
+
+def _number(field: str, comparator: ComparatorEnum, value: str) -> Filter:
+    other = _numeric_keyword(value)
+    if other is not None:
+        return _expr(f"${field}", comparator, other)
+    return _compare(field, comparator, _float(value))
+
+
+def _string_number(
+    keyword: KeywordEnum, comparator: ComparatorEnum, value: str
+) -> Filter:
+    other = _numeric_keyword(value)
+    if other is None:
+        other = _float(value)
+    return _expr(_to_double(STRING_NUMBERS[keyword]), comparator, other)
+
+
+def _numeric_keyword(value: str) -> Optional[Any]:
+    """
+    The expression of another numeric criteria, such as ``tou`` in ``pow>tou``
+    """
+    try:
+        keyword = KeywordEnum.factory(value)
+    except ValueError:
+        return None
+    if keyword in NUMBERS:
+        return f"${NUMBERS[keyword]}"
+    if keyword in STRING_NUMBERS:
+        return _to_double(STRING_NUMBERS[keyword])
+    return None
+
+
+def _to_double(field: str) -> Dict[str, Any]:
+    value: Any = f"${field}"
+    if field in ("power", "toughness", "loyalty"):
+        # Double faced cards only hold those values on their faces
+        value = {"$ifNull": [value, {"$arrayElemAt": [f"$card_faces.{field}", 0]}]}
+    return {"$convert": {"input": value, "to": "double", "onError": None}}
+
+
+def _expr(left: Any, comparator: ComparatorEnum, right: Any) -> Filter:
+    # Aggregation compares null to numbers, missing values must be excluded
+    guards = [
+        {"$ne": [{"$ifNull": [operand, None]}, None]}
+        for operand in (left, right)
+        if not isinstance(operand, (int, float))
+    ]
+    return {"$expr": {"$and": [*guards, {OPERATORS[comparator]: [left, right]}]}}
+
+
+def _float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"Invalid number {value}")
+
+
+def _date(keyword: KeywordEnum, comparator: ComparatorEnum, value: str) -> Filter:
+    try:
+        if keyword == KeywordEnum.YEAR:
+            start = datetime.datetime(int(value), 1, 1)
+            end = datetime.datetime(int(value) + 1, 1, 1)
+        else:
+            start = datetime.datetime.fromisoformat(value)
+            end = start + datetime.timedelta(days=1)
+    except ValueError:
+        raise ValueError(f"Invalid {keyword.value} {value}")
+
+    # Dates are stored as datetimes, at midnight
+    field = "released_at"
+    if comparator in (ComparatorEnum.COLON, ComparatorEnum.EQUAL):
+        return {field: {"$gte": start, "$lt": end}}
+    if comparator == ComparatorEnum.NEQUAL:
+        return {"$or": [{field: {"$lt": start}}, {field: {"$gte": end}}]}
+    if comparator == ComparatorEnum.LT:
+        return {field: {"$lt": start}}
+    if comparator == ComparatorEnum.LTE:
+        return {field: {"$lt": end}}
+    if comparator == ComparatorEnum.GT:
+        return {field: {"$gte": end}}
+    return {field: {"$gte": start}}
+
+
+def _colors(keyword: KeywordEnum, comparator: ComparatorEnum, value: str) -> Filter:
+    field = COLOR_FIELDS[keyword]
+    if value.isdigit():
+        size = {"$size": {"$ifNull": [f"${field}", []]}}
+        return _expr(size, comparator, int(value))
+    if value in ("m", "multicolor"):
+        return _face_colors(keyword, {f"{field}.1": {"$exists": True}})
+
+    letters = COLOR_NAMES.get(value, value)
+    if not all(letter in "wubrgc" for letter in letters):
+        raise ValueError(f"Invalid colors {value} for {keyword.value}")
+    colors = [color for color in WUBRG if color.lower() in letters]
+    others = [color for color in WUBRG if color not in colors]
+
+    if not colors:
+        # Colorless, such as ``c:c``
+        if keyword == KeywordEnum.PRODUCES:
+            return {field: "C"}
+        return _face_colors(keyword, {field: {"$nin": WUBRG}})
+
+    if comparator == ComparatorEnum.COLON:
+        comparator = (
+            ComparatorEnum.LTE
+            if keyword == KeywordEnum.IDENTITY
+            else ComparatorEnum.GTE
+        )
+    superset = {"$all": colors}
+    subset = {"$nin": others}
+    if comparator == ComparatorEnum.EQUAL:
+        criteria: Filter = {field: {**superset, **subset}}
+    elif comparator == ComparatorEnum.NEQUAL:
+        criteria = {"$nor": [{field: {**superset, **subset}}]}
+    elif comparator == ComparatorEnum.GTE:
+        criteria = {field: superset}
+    elif comparator == ComparatorEnum.GT:
+        criteria = {field: {**superset, "$elemMatch": {"$in": others}}}
+    elif comparator == ComparatorEnum.LTE:
+        criteria = {field: subset}
+    else:
+        criteria = {field: {**subset, "$not": {"$all": colors}}}
+    return _face_colors(keyword, criteria)
+
+
+def _face_colors(keyword: KeywordEnum, criteria: Filter) -> Filter:
+    """
+    Double faced cards only hold their colors on their faces
+    """
+    if keyword != KeywordEnum.COLOR:
+        return criteria
+    faces = _rename(criteria, "colors", "card_faces.colors")
+    return {
+        "$or": [
+            {"$and": [{"colors": {"$ne": None}}, criteria]},
+            {"$and": [{"colors": None}, {"card_faces": {"$ne": None}}, faces]},
+        ]
+    }
+
+
+def _rename(criteria: Any, field: str, target: str) -> Any:
+    if isinstance(criteria, dict):
+        return {
+            (target + key[len(field) :] if key.startswith(field) else key): _rename(
+                value, field, target
+            )
+            for key, value in criteria.items()
+        }
+    if isinstance(criteria, list):
+        return [_rename(value, field, target) for value in criteria]
+    return criteria
+
+
+def _rarity(comparator: ComparatorEnum, value: str) -> Filter:
+    value = {r[0]: r for r in RARITIES}.get(value, value)
+    if value not in RARITIES:
+        raise ValueError(f"Unknown rarity {value}")
+    rank = RARITIES.index(value)
+    if comparator in (ComparatorEnum.COLON, ComparatorEnum.EQUAL):
+        return {"rarity": value}
+    if comparator == ComparatorEnum.NEQUAL:
+        return {"rarity": {"$ne": value}}
+    selected: List[str] = {
+        ComparatorEnum.LT: RARITIES[:rank],
+        ComparatorEnum.LTE: RARITIES[: rank + 1],
+        ComparatorEnum.GT: RARITIES[rank + 1 :],
+        ComparatorEnum.GTE: RARITIES[rank:],
+    }[comparator]
+    return {"rarity": {"$in": selected}}
+
+
+def _is(value: str) -> Filter:
+    if value in FLAGS:
+        return FLAGS[value]
+    if value in LAYOUTS:
+        return {"layout": value}
+    raise ValueError(f"Criteria `is:{value}` can't be compiled into a filter")
+
+
+def _oracle_with_name(value: str) -> Filter:
+    # ``~`` stands for the name of the card
+    needle = {
+        "$replaceAll": {
+            "input": {"$literal": value},
+            "find": "~",
+            "replacement": "$name",
+        }
+    }
+    return {
+        "$expr": {
+            "$gte": [
+                {
+                    "$indexOfCP": [
+                        {"$toLower": {"$ifNull": ["$oracle_text", ""]}},
+                        {"$toLower": needle},
+                    ]
+                },
+                0,
+            ]
+        }
+    }
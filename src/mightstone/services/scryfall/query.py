@@ -1,7 +1,7 @@
 import re
 from copy import copy
 from enum import Enum
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
 
 import pyparsing as pp
 
@@ -468,6 +468,18 @@ class Query:
         """
         return self.root.to_string(shorten)
 
+    def to_mongo(self) -> Dict[str, Any]:
+        """
+        Compile the query into a MongoDB filter document, to search persisted
+        ``SerializableCard`` (see ``SerializableCard.search()``)
+
+        :raise ValueError: The query uses a keyword that can't be compiled
+        :return: The filter document
+        """
+        from mightstone.services.scryfall.mongo import to_mongo
+
+        return to_mongo(self.root)
+
     def __getitem__(self, item):
         return self.root[item]
 
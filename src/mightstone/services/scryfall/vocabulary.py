@@ -0,0 +1,80 @@
+"""
+Values of the Scryfall search criteria, shared by the offline corpus and the
+MongoDB filters
+"""
+
+from mightstone.services.scryfall.query import KeywordEnum
+
+COLOR_NAMES = {
+    "white": "w",
+    "blue": "u",
+    "black": "b",
+    "red": "r",
+    "green": "g",
+    "colorless": "",
+    "azorius": "wu",
+    "dimir": "ub",
+    "rakdos": "br",
+    "gruul": "rg",
+    "selesnya": "gw",
+    "orzhov": "wb",
+    "izzet": "ur",
+    "golgari": "bg",
+    "boros": "rw",
+    "simic": "gu",
+    "bant": "gwu",
+    "esper": "wub",
+    "grixis": "ubr",
+    "jund": "brg",
+    "naya": "rgw",
+    "abzan": "wbg",
+    "jeskai": "urw",
+    "sultai": "bgu",
+    "mardu": "rwb",
+    "temur": "gur",
+}
+"""The colors of each color, guild and shard name"""
+
+RARITIES = ["common", "uncommon", "rare", "special", "mythic", "bonus"]
+"""The rarities, by rank"""
+
+LAYOUTS = {
+    "normal",
+    "split",
+    "flip",
+    "transform",
+    "modal_dfc",
+    "meld",
+    "leveler",
+    "class",
+    "case",
+    "saga",
+    "adventure",
+    "mutate",
+    "prototype",
+    "battle",
+    "planar",
+    "scheme",
+    "vanguard",
+    "token",
+    "double_faced_token",
+    "emblem",
+    "augment",
+    "host",
+    "art_series",
+    "reversible_card",
+}
+"""The layouts matched by ``is:``"""
+
+DOUBLE_FACED_LAYOUTS = {"transform", "modal_dfc", "meld", "reversible_card"}
+"""The layouts matched by ``is:dfc``"""
+
+IGNORED = {
+    KeywordEnum.ORDER,
+    KeywordEnum.DISPLAY,
+    KeywordEnum.DIRECTION,
+    KeywordEnum.UNIQUE,
+    KeywordEnum.PREFER,
+    KeywordEnum.INCLUDE,
+}
+"""The keywords that change how results are displayed, rather than the results"""
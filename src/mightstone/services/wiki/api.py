@@ -20,6 +20,7 @@ class Wiki(MightstoneHttpClient):
     """
 
     base_url = "https://mtg.fandom.com"
+    service = "wiki"
 
     async def export_pages_async(self, pages: list[str]) -> bytes:
         """
@@ -16,6 +16,8 @@ logger = logging.getLogger("mightstone")
 
 
 class RuleExplorer(MightstoneHttpClient):
+    service = "wotc"
+
     async def open_async(self, path: Optional[str] = None) -> ComprehensiveRules:
         """
         Open a local or remote comprehensive rule document, if no path is provided
@@ -28,17 +30,17 @@ class RuleExplorer(MightstoneHttpClient):
             path = await self.latest_async()
 
         if path.startswith("http"):
-            f = await self.client.get(path)
-            f.raise_for_status()
+            response = await self.client.get(path)
+            response.raise_for_status()
             try:
-                content = StringIO(f.content.decode("UTF-8"))
+                content = StringIO(response.content.decode("UTF-8"))
             except UnicodeDecodeError:
-                content = StringIO(f.content.decode("iso-8859-1"))
+                content = StringIO(response.content.decode("iso-8859-1"))
 
             return ComprehensiveRules.parse(content)
 
-        with open(path, "r") as f:
-            return ComprehensiveRules.parse(f)
+        with open(path, "r") as file:
+            return ComprehensiveRules.parse(file)
 
     open = synchronize(open_async)
 
@@ -0,0 +1,306 @@
+"""
+Httpx transports used by Mightstone services
+"""
+
+import asyncio
+import datetime
+import email.utils
+import logging
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+import httpx
+
+from mightstone.config import DEFAULT_RATE_LIMITS, RateLimitSettings
+
+logger = logging.getLogger("mightstone")
+
+STREAM_EXTENSION = "mightstone_stream"
+"""
+Request extension to stream a response straight from the network, it is neither
+cached nor coalesced
+"""
+
+
+class TokenBucket:
+    """
+    An async token bucket
+
+    Tokens are refilled at ``rate`` per second, up to ``burst`` tokens. The bucket is
+    implemented as a virtual scheduler (GCRA): each call reserves its slot
+    synchronously, so that it does not need any lock and can be shared among event
+    loops.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of requests per second")
+        self.rate = rate
+        self.burst = max(1, int(burst))
+        self._interval = 1 / rate
+        self._tolerance = (self.burst - 1) * self._interval
+        self._theoretical_arrival = 0.0
+        self._blocked_until = 0.0
+        self._shift = 0.0
+
+    def reserve(self) -> float:
+        """
+        Reserve a token
+
+        :return: The delay in seconds to wait before the token can be used
+        """
+        now = time.monotonic()
+        start = max(
+            now, self._theoretical_arrival - self._tolerance, self._blocked_until
+        )
+        self._theoretical_arrival = (
+            max(self._theoretical_arrival, start) + self._interval
+        )
+        return start - now
+
+    async def acquire(self) -> None:
+        """
+        Wait until a token is available
+
+        The slot is reserved once, then awaited. A ``block()`` received while
+        waiting postpones it, rather than reserving another slot.
+        """
+        shift = self._shift
+        due = time.monotonic() + self.reserve()
+        while True:
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._shift == shift:
+                return
+            due += self._shift - shift
+            shift = self._shift
+
+    def block(self, delay: float) -> None:
+        """
+        Prevent any token to be delivered in the next ``delay`` seconds, then resume
+        at the nominal rate (no burst).
+
+        The slots already reserved are postponed by the same duration.
+
+        :param delay: The delay in seconds, typically from a ``Retry-After`` header
+        """
+        now = time.monotonic()
+        until = now + delay
+        extension = until - max(self._blocked_until, now)
+        if extension <= 0:
+            return
+        self._blocked_until = until
+        self._shift += extension
+        self._theoretical_arrival = max(
+            max(self._theoretical_arrival, now) + extension,
+            self._blocked_until + self._tolerance,
+        )
+
+
+class RateLimiter:
+    """
+    A registry of ``TokenBucket``, one for each rate limited host
+    """
+
+    def __init__(self, limits: Optional[Mapping[str, RateLimitSettings]] = None):
+        if limits is None:
+            limits = DEFAULT_RATE_LIMITS
+        self.limits = dict(limits)
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def bucket(self, host: str) -> Optional[TokenBucket]:
+        if host not in self._buckets:
+            settings = self.limits.get(host)
+            if not settings:
+                return None
+            self._buckets[host] = TokenBucket(settings.rate, settings.burst)
+        return self._buckets[host]
+
+    async def acquire(self, host: str) -> None:
+        bucket = self.bucket(host)
+        if bucket:
+            await bucket.acquire()
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a ``Retry-After`` header value, either a number of seconds or a HTTP date
+
+    :param value: The header value
+    :return: The delay in seconds, or None if the header is absent or invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    )
+
+
+class RateLimitTransport(httpx.AsyncBaseTransport):
+    """
+    An httpx transport that enforces a rate limit for each host
+
+    Every request waits for a token of its host bucket before being sent. When the
+    server answers with a ``429 Too Many Requests``, the host bucket is paused for
+    the duration given by the ``Retry-After`` header, then the request is retried.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiter: Optional[RateLimiter] = None,
+        retries: int = 3,
+        backoff: float = 1.0,
+    ):
+        self._transport = transport
+        self.limiter = limiter or RateLimiter()
+        self.retries = retries
+        self.backoff = backoff
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        bucket = self.limiter.bucket(request.url.host)
+        attempt = 0
+        while True:
+            if bucket:
+                await bucket.acquire()
+
+            response = await self._transport.handle_async_request(request)
+            if response.status_code != 429 or attempt >= self.retries:
+                return response
+
+            delay = parse_retry_after(response.headers.get("retry-after"))
+            if delay is None:
+                delay = self.backoff * 2**attempt
+            await response.aclose()
+            attempt += 1
+
+            logger.warning(
+                "Rate limited by %s, retrying in %.2fs (attempt %d/%d)",
+                request.url.host,
+                delay,
+                attempt,
+                self.retries,
+            )
+            if bucket:
+                bucket.block(delay)
+            else:
+                await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+CoalescingKey = Tuple[str, str, Tuple[Optional[str], ...]]
+SharedResponse = Tuple[int, list, bytes, dict]
+
+
+class CoalescingTransport(httpx.AsyncBaseTransport):
+    """
+    An httpx transport that coalesces identical in-flight requests
+
+    When a GET (or HEAD) request is sent while an identical request (same method,
+    url and vary headers) is still pending, it waits for the pending request
+    instead of reaching the network, and then receives its own copy of the response.
+
+    Requests that explicitly bypass the cache (``no-cache``, ``no-store`` or
+    ``STREAM_EXTENSION``) are never coalesced.
+    """
+
+    methods = ("GET", "HEAD")
+    vary = (
+        "accept",
+        "accept-encoding",
+        "accept-language",
+        "authorization",
+        "cache-control",
+        "range",
+    )
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+        self._pending: Dict[CoalescingKey, asyncio.Future] = {}
+
+    def _key(self, request: httpx.Request) -> Optional[CoalescingKey]:
+        if request.method not in self.methods or request.extensions.get(
+            STREAM_EXTENSION
+        ):
+            return None
+
+        cache_control = request.headers.get("cache-control", "").lower()
+        if "no-cache" in cache_control or "no-store" in cache_control:
+            return None
+
+        return (
+            request.method,
+            str(request.url),
+            tuple(request.headers.get(name) for name in self.vary),
+        )
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = self._key(request)
+        if key is None:
+            return await self._transport.handle_async_request(request)
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            try:
+                return self._replay(await asyncio.shield(pending))
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading request was cancelled, this one is still wanted
+                return await self.handle_async_request(request)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            response = await self._transport.handle_async_request(request)
+            try:
+                content = await response.aread()
+            finally:
+                await response.aclose()
+            shared = (
+                response.status_code,
+                response.headers.raw,
+                content,
+                dict(response.extensions),
+            )
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Followers (if any) will receive the error, avoid un-retrieved warnings
+            future.exception()
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+        future.set_result(shared)
+        return self._replay(shared)
+
+    @staticmethod
+    def _replay(shared: SharedResponse) -> httpx.Response:
+        status_code, headers, content, extensions = shared
+        return httpx.Response(
+            status_code=status_code,
+            headers=headers,
+            stream=httpx.ByteStream(content),
+            extensions=dict(extensions),
+        )
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
@@ -0,0 +1,156 @@
+import asyncio
+import bz2
+import gzip
+import io
+import lzma
+import time
+import zlib
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.ass import compressor
+
+from .test_utils import compress_zip
+
+CONTENT = b"".join(b"line %d\n" % i for i in range(10000)) + b"no trailing eol"
+CODECS = {
+    None: bytes,
+    "gzip": gzip.compress,
+    "lzma": lzma.compress,
+    "bzip2": bz2.compress,
+    "zip": lambda data: compress_zip(io.BytesIO(data)),
+}
+
+
+async def chunks(data: bytes, size: int = 1000):
+    for i in range(0, len(data), size):
+        yield data[i : i + size]
+
+
+@pytest.mark.asyncio
+class TestAsyncFileObjRead:
+    @pytest.mark.parametrize("size", [1, 7, 4096, 1024 * 1024])
+    async def test_read_in_pieces(self, size):
+        parts = []
+        async with compressor.open(
+            chunks(gzip.compress(CONTENT)), compression="gzip"
+        ) as f:
+            while part := await f.read(size):
+                assert_that(len(part)).is_less_than_or_equal_to(size)
+                parts.append(part)
+
+        assert_that(b"".join(parts)).is_equal_to(CONTENT)
+
+    async def test_read_everything(self):
+        async with compressor.open(chunks(CONTENT)) as f:
+            first = await f.read(10)
+            rest = await f.read()
+
+        assert_that(first + rest).is_equal_to(CONTENT)
+        assert_that(await f.read()).is_equal_to(b"")
+
+    async def test_readinto(self):
+        buffer = bytearray(4096)
+        received = bytearray()
+        async with compressor.open(
+            chunks(gzip.compress(CONTENT)), compression="gzip"
+        ) as f:
+            while count := await f.readinto(buffer):
+                received += buffer[:count]
+
+        assert_that(bytes(received)).is_equal_to(CONTENT)
+
+    async def test_iter_chunks_does_not_copy(self):
+        source = [CONTENT[:5000], CONTENT[5000:]]
+
+        async def iterator():
+            for chunk in source:
+                yield chunk
+
+        async with compressor.open(iterator()) as f:
+            received = [chunk async for chunk in f.iter_chunks()]
+
+        assert_that(received[0]).is_same_as(source[0])
+        assert_that(received[1]).is_same_as(source[1])
+
+    async def test_lines_across_chunks(self):
+        async with compressor.open(chunks(CONTENT, size=3)) as f:
+            lines = [line async for line in f]
+
+        assert_that(lines).is_equal_to(CONTENT.splitlines(True))
+
+
+@pytest.mark.asyncio
+class TestAsyncFileObjThreaded:
+    @pytest.mark.parametrize("compression", CODECS.keys())
+    async def test_read(self, compression):
+        data = CODECS[compression](CONTENT)
+        async with compressor.open(
+            chunks(data), compression=compression, threaded=True, queue_size=1
+        ) as f:
+            lines = [line async for line in f]
+
+        assert_that(lines).is_equal_to(CONTENT.splitlines(True))
+
+    async def test_event_loop_is_not_blocked(self):
+        ticks = []
+
+        async def ticker():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        task = asyncio.ensure_future(ticker())
+        async with compressor.open(
+            chunks(lzma.compress(CONTENT * 20), size=1024 * 1024),
+            compression="lzma",
+            threaded=True,
+        ) as f:
+            await f.read()
+        task.cancel()
+
+        assert_that(len(ticks)).is_greater_than(1)
+
+    async def test_errors_are_raised(self):
+        async with compressor.open(
+            chunks(b"not gzip data"), compression="gzip", threaded=True
+        ) as f:
+            with pytest.raises(zlib.error):
+                await f.read()
+
+    async def test_close_before_the_end(self):
+        async with compressor.open(
+            chunks(gzip.compress(CONTENT), size=10),
+            compression="gzip",
+            threaded=True,
+            queue_size=1,
+        ) as f:
+            first = await f.read(10)
+
+        assert_that(first).is_not_empty()
+        assert_that(CONTENT.startswith(first)).is_true()
+        assert_that(f._pipeline.done()).is_true()
+
+    async def test_close_waits_for_the_worker(self):
+        class SlowDecompressor:
+            busy = False
+            closed_while_busy = None
+
+            def decompress(self, data: bytes) -> bytes:
+                self.busy = True
+                time.sleep(0.05)
+                self.busy = False
+                return data
+
+            def close(self):
+                self.closed_while_busy = self.busy
+
+        decompressor = SlowDecompressor()
+        async with compressor.open(
+            chunks(CONTENT, size=10), compression=None, threaded=True, queue_size=1
+        ) as f:
+            f._decompressor = decompressor
+            await f.read(10)
+
+        assert_that(decompressor.closed_while_busy).is_false()
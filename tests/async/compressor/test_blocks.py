@@ -0,0 +1,79 @@
+import bz2
+import lzma
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.ass.compressor.codecs.blocks import decompress_blocks
+from mightstone.ass.compressor.codecs.bzip2_codec import (
+    BLOCK_MAGIC,
+    find_bits,
+    split_bzip2_blocks,
+)
+from mightstone.ass.compressor.codecs.lzma_codec import split_xz_blocks
+
+CONTENT = b"".join(b"%d,card %d\n" % (i, i * 7919 % 10007) for i in range(30000))
+
+
+class TestFindBits:
+    @pytest.mark.parametrize("shift", range(8))
+    def test_any_bit_offset(self, shift):
+        value = (0b1011 << (48 + shift)) | (BLOCK_MAGIC << shift) | 1
+        data = value.to_bytes((value.bit_length() + 7) // 8 + 1, "big")
+        offset = len(data) * 8 - 48 - shift
+
+        assert_that(find_bits(data, BLOCK_MAGIC)).is_equal_to([offset])
+
+
+class TestSplitBlocks:
+    def test_bzip2(self):
+        data = bz2.compress(CONTENT, 1)
+        blocks = list(split_bzip2_blocks(data))
+
+        assert_that(len(blocks)).is_greater_than(1)
+        assert_that(b"".join(bz2.decompress(b) for b in blocks)).is_equal_to(CONTENT)
+
+    def test_bzip2_streams(self):
+        data = bz2.compress(CONTENT[:1000]) + bz2.compress(CONTENT, 1)
+        blocks = list(split_bzip2_blocks(data))
+
+        assert_that(b"".join(bz2.decompress(b) for b in blocks)).is_equal_to(
+            CONTENT[:1000] + CONTENT
+        )
+
+    def test_xz_streams(self):
+        data = lzma.compress(CONTENT[:1000]) + lzma.compress(CONTENT)
+        blocks = list(split_xz_blocks(data))
+
+        assert_that(blocks).is_length(2)
+        assert_that(b"".join(lzma.decompress(b) for b in blocks)).is_equal_to(
+            CONTENT[:1000] + CONTENT
+        )
+
+    def test_not_xz(self):
+        with pytest.raises(ValueError):
+            list(split_xz_blocks(b"not a xz file"))
+
+
+class TestDecompressBlocks:
+    @pytest.mark.parametrize(
+        "compression, data",
+        [
+            ("bzip2", bz2.compress(CONTENT, 1)),
+            ("bzip2", bz2.compress(b"single block")),
+            ("lzma", lzma.compress(CONTENT[:500]) + lzma.compress(CONTENT)),
+            ("lzma", lzma.compress(CONTENT)),
+        ],
+    )
+    def test_in_order(self, compression, data):
+        chunks = decompress_blocks(data, compression, workers=2, chunk_size=1000)
+
+        assert_that(b"".join(chunks)).is_equal_to(
+            bz2.decompress(data) if compression == "bzip2" else lzma.decompress(data)
+        )
+
+    def test_truncated(self):
+        data = bz2.compress(CONTENT, 1)
+
+        with pytest.raises((OSError, ValueError, EOFError)):
+            b"".join(decompress_blocks(data[: len(data) // 2], "bzip2", workers=2))
@@ -6,12 +6,12 @@ import pytest
 
 from mightstone.ass import compressor
 
-from .test_utils import async_gen_to_list, compress, get_raw_lines
+from .test_utils import BROTLI, ZSTD, async_gen_to_list, compress, get_raw_lines
 
 
 @pytest.mark.parametrize(
     "compression",
-    [None, "gzip", "bzip2", "lzma"],
+    [None, "gzip", "bzip2", "lzma", "zip", ZSTD, BROTLI],
 )
 @pytest.mark.asyncio(scope="session")
 async def test_open_read(compression: str):
@@ -28,7 +28,7 @@ async def test_open_read(compression: str):
 
 @pytest.mark.parametrize(
     "compression",
-    [None, "gzip", "bzip2", "lzma"],
+    [None, "gzip", "bzip2", "lzma", "zip", ZSTD, BROTLI],
 )
 @pytest.mark.asyncio(scope="session")
 async def test_open_read_with_filename(compression: str):
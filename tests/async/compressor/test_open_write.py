@@ -6,7 +6,7 @@ import pytest
 
 from mightstone.ass import compressor
 
-from .test_utils import get_raw_lines
+from .test_utils import BROTLI, ZSTD, get_raw_lines
 
 
 @pytest.mark.parametrize(
@@ -16,6 +16,9 @@ from .test_utils import get_raw_lines
         "gzip",
         "bzip2",
         "lzma",
+        "zip",
+        ZSTD,
+        BROTLI,
     ],
 )
 @pytest.mark.asyncio(scope="session")
@@ -42,6 +45,9 @@ async def test_open_write(compression: str):
         "gzip",
         "bzip2",
         "lzma",
+        "zip",
+        ZSTD,
+        BROTLI,
     ],
 )
 @pytest.mark.asyncio(scope="session")
@@ -1,11 +1,29 @@
 import bz2
 import csv
 import gzip
+import importlib.util
 import io
 import lzma
+import zipfile
 from contextlib import contextmanager
 from typing import AsyncGenerator, Union
 
+import pytest
+
+
+def optional(compression: str, package: str):
+    return pytest.param(
+        compression,
+        marks=pytest.mark.skipif(
+            importlib.util.find_spec(package) is None,
+            reason=f"{package} is not installed",
+        ),
+    )
+
+
+ZSTD = optional("zstd", "zstandard")
+BROTLI = optional("brotli", "brotli")
+
 
 async def async_gen_to_list(async_gen: AsyncGenerator):
     result = []
@@ -35,6 +53,27 @@ def uncompress_lzma(filename: str):
         return list(lzmafd)
 
 
+def uncompress_zip(filename: str):
+    with zipfile.ZipFile(filename) as archive:
+        with archive.open(archive.infolist()[0]) as zipfd:
+            return list(zipfd)
+
+
+def uncompress_zstd(filename: str):
+    import zstandard
+
+    with open(filename, "rb") as fd:
+        with zstandard.ZstdDecompressor().stream_reader(fd) as zstdfd:
+            return list(io.BufferedReader(zstdfd))
+
+
+def uncompress_brotli(filename: str):
+    import brotli
+
+    with open(filename, "rb") as fd:
+        return list(io.BytesIO(brotli.decompress(fd.read())))
+
+
 @contextmanager
 def open_file_or_bytesio(file: Union[str, io.BytesIO]):
     if isinstance(file, str):
@@ -73,6 +112,28 @@ def compress_lzma(file: Union[str, io.BytesIO]):
     return buffer.getvalue()
 
 
+def compress_zip(file: Union[str, io.BytesIO]):
+    buffer = io.BytesIO()
+    with open_file_or_bytesio(file) as fd:
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("data", fd.read())
+    return buffer.getvalue()
+
+
+def compress_zstd(file: Union[str, io.BytesIO]):
+    import zstandard
+
+    with open_file_or_bytesio(file) as fd:
+        return zstandard.ZstdCompressor().compress(fd.read())
+
+
+def compress_brotli(file: Union[str, io.BytesIO]):
+    import brotli
+
+    with open_file_or_bytesio(file) as fd:
+        return brotli.compress(fd.read(), quality=5)
+
+
 def compress(file, compression=None):
     if compression is None:
         return compress_none(file)
@@ -82,6 +143,12 @@ def compress(file, compression=None):
         return compress_bzip2(file)
     elif compression == "lzma":
         return compress_lzma(file)
+    elif compression == "zip":
+        return compress_zip(file)
+    elif compression == "zstd":
+        return compress_zstd(file)
+    elif compression == "brotli":
+        return compress_brotli(file)
     else:
         raise Exception(
             "Compression {compression} not supported".format(compression=compression)
@@ -97,6 +164,12 @@ def uncompress(file, compression=None):
         return uncompress_bzip2(file)
     elif compression == "lzma":
         return uncompress_lzma(file)
+    elif compression == "zip":
+        return uncompress_zip(file)
+    elif compression == "zstd":
+        return uncompress_zstd(file)
+    elif compression == "brotli":
+        return uncompress_brotli(file)
     else:
         raise Exception(
             "Compression {compression} not supported".format(compression=compression)
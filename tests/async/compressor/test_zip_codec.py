@@ -0,0 +1,95 @@
+import io
+import zipfile
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.ass.compressor.codecs.zip_codec import ZipCompressor, ZipDecompressor
+
+CONTENT = b"".join(b"line %d\n" % i for i in range(5000))
+
+
+class Unseekable(io.RawIOBase):
+    """A write only stream, that forces zipfile to write a data descriptor"""
+
+    def __init__(self, buffer: io.BytesIO):
+        self.buffer = buffer
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        return self.buffer.write(b)
+
+
+def archive(compression=zipfile.ZIP_DEFLATED, seekable=True) -> bytes:
+    buffer = io.BytesIO()
+    stream = buffer if seekable else Unseekable(buffer)
+    with zipfile.ZipFile(stream, "w", compression) as zf:
+        with zf.open("data.json", "w") as member:
+            member.write(CONTENT)
+    return buffer.getvalue()
+
+
+def decompress(data: bytes, chunk_size: int) -> bytes:
+    decompressor = ZipDecompressor()
+    out = b"".join(
+        decompressor.decompress(data[i : i + chunk_size])
+        for i in range(0, len(data), chunk_size)
+    )
+    return out + decompressor.flush()
+
+
+class TestZipDecompressor:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 1024 * 1024])
+    def test_deflated(self, chunk_size):
+        assert_that(decompress(archive(), chunk_size)).is_equal_to(CONTENT)
+
+    def test_stored(self):
+        data = archive(zipfile.ZIP_STORED)
+
+        assert_that(decompress(data, 100)).is_equal_to(CONTENT)
+
+    def test_data_descriptor(self):
+        data = archive(seekable=False)
+
+        assert_that(decompress(data, 100)).is_equal_to(CONTENT)
+
+    def test_truncated(self):
+        data = archive()
+
+        with pytest.raises(EOFError):
+            decompress(data[: len(data) // 2], 100)
+
+    def test_bad_crc(self):
+        data = bytearray(archive(zipfile.ZIP_STORED))
+        data[100] ^= 0xFF
+
+        with pytest.raises(ValueError):
+            decompress(bytes(data), 100)
+
+    def test_not_a_zip(self):
+        with pytest.raises(ValueError):
+            decompress(b"\x1f\x8b" + b"\x00" * 100, 100)
+
+
+class TestZipCompressor:
+    def test_readable_by_zipfile(self):
+        compressor = ZipCompressor("data.json")
+        data = b"".join(
+            compressor.compress(CONTENT[i : i + 1000])
+            for i in range(0, len(CONTENT), 1000)
+        )
+        data += compressor.flush()
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert_that(zf.namelist()).is_equal_to(["data.json"])
+            assert_that(zf.testzip()).is_none()
+            assert_that(zf.read("data.json")).is_equal_to(CONTENT)
+        assert_that(decompress(data, 100)).is_equal_to(CONTENT)
+
+    def test_empty(self):
+        data = ZipCompressor().flush()
+
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            assert_that(zf.read("data")).is_equal_to(b"")
@@ -0,0 +1,56 @@
+import json
+from tempfile import NamedTemporaryFile
+
+import aiofiles
+import pytest
+from assertpy import assert_that
+
+from mightstone.ass import compressor
+from mightstone.ass.compressor.codecs.zstd_codec import train_zstd_dictionary
+
+zstandard = pytest.importorskip("zstandard")
+
+CARDS = [
+    json.dumps({"id": i, "name": f"Card {i}", "set": "bro", "cmc": i % 7}).encode()
+    + b"\n"
+    for i in range(2000)
+]
+
+
+@pytest.mark.asyncio
+class TestZstdDictionary:
+    async def test_write_and_read_with_dictionary(self):
+        dictionary = train_zstd_dictionary(CARDS, size=4096)
+
+        with NamedTemporaryFile() as tmpfd:
+            async with aiofiles.open(tmpfd.name, "wb") as rfd:
+                async with compressor.open(
+                    rfd, mode="wb", compression="zstd", dictionary=dictionary
+                ) as fd:
+                    for card in CARDS:
+                        await fd.write(card)
+
+            async with aiofiles.open(tmpfd.name, "rb") as rfd:
+                async with compressor.open(
+                    rfd, mode="rb", compression="zstd", dictionary=dictionary
+                ) as fd:
+                    lines = [line async for line in fd]
+
+        assert_that(lines).is_equal_to(CARDS)
+
+    async def test_multiple_frames(self):
+        cctx = zstandard.ZstdCompressor()
+        data = cctx.compress(b"".join(CARDS[:10])) + cctx.compress(b"".join(CARDS[10:]))
+
+        async def chunks():
+            yield data
+
+        async with compressor.open(chunks(), compression="zstd") as fd:
+            content = await fd.read()
+
+        assert_that(content).is_equal_to(b"".join(CARDS))
+
+
+def test_dictionary_requires_zstd():
+    with pytest.raises(ValueError):
+        compressor.open(None, compression="gzip", dictionary=b"")
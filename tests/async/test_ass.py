@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.ass import batched, read_ahead
+
+
+async def numbers(log: list, count: int = 5, fail_at=None):
+    for i in range(count):
+        if i == fail_at:
+            raise RuntimeError("boom")
+        log.append(i)
+        yield i
+
+
+@pytest.mark.asyncio
+class TestReadAhead:
+    @pytest.mark.parametrize("depth", [0, 1, 3])
+    async def test_in_order(self, depth):
+        items = [i async for i in read_ahead(numbers([]), depth)]
+
+        assert_that(items).is_equal_to([0, 1, 2, 3, 4])
+
+    async def test_depth(self):
+        log: list = []
+        iterator = read_ahead(numbers(log), 2)
+
+        assert_that(await iterator.__anext__()).is_equal_to(0)
+        await asyncio.sleep(0.01)
+
+        assert_that(log).is_equal_to([0, 1, 2])
+        await iterator.aclose()
+
+    async def test_error_after_items(self):
+        items = []
+        with pytest.raises(RuntimeError):
+            async for i in read_ahead(numbers([], fail_at=3), 2):
+                items.append(i)
+
+        assert_that(items).is_equal_to([0, 1, 2])
+
+    async def test_stops_producer(self):
+        log: list = []
+        async for i in read_ahead(numbers(log, count=100), 1):
+            if i == 2:
+                break
+        await asyncio.sleep(0.01)
+
+        assert_that(len(log)).is_less_than_or_equal_to(4)
+
+
+@pytest.mark.asyncio
+class TestBatched:
+    async def test_sync_iterable(self):
+        batches = [b async for b in batched(range(7), 3)]
+
+        assert_that(batches).is_equal_to([[0, 1, 2], [3, 4, 5], [6]])
+
+    async def test_async_iterable(self):
+        batches = [b async for b in batched(numbers([]), 5)]
+
+        assert_that(batches).is_equal_to([[0, 1, 2, 3, 4]])
@@ -0,0 +1,112 @@
+import datetime
+import json
+import pathlib
+
+import httpx
+import pytest
+from assertpy import assert_that
+
+from mightstone.services.mtgjson import MtgJson, MtgJsonCompression
+from mightstone.services.mtgjson.columnar import PriceColumns
+
+PRICES = {
+    "paper": {
+        "tcgplayer": {
+            "currency": "USD",
+            "retail": {"normal": {"2024-01-01": 0.25, "2024-01-02": 0.5}},
+            "buylist": {"foil": {"2024-01-01": 1.0}},
+        }
+    },
+    "mtgo": {"cardhoarder": {"currency": "USD", "retail": {"normal": {}}}},
+}
+
+
+@pytest.fixture
+def columns() -> PriceColumns:
+    columns = PriceColumns()
+    columns.append("a", PRICES)
+    columns.append("b", {"paper": {"cardmarket": {"currency": "EUR", "retail": {}}}})
+    columns.append("c", {"paper": {"tcgplayer": PRICES["paper"]["tcgplayer"]}})
+    return columns
+
+
+class TestPriceColumns:
+    def test_append(self, columns):
+        assert_that(len(columns)).is_equal_to(6)
+        assert_that(columns.uuids).is_equal_to(["a", "b", "c"])
+        assert_that(columns.columns["uuid"].tolist()).is_equal_to([0, 0, 0, 2, 2, 2])
+        assert_that(columns.columns["listing"].tolist()).is_equal_to([0, 0, 1, 0, 0, 1])
+        assert_that(columns.categories["finish"]).is_equal_to(["normal", "foil"])
+        assert_that(columns.categories["provider"]).is_equal_to(
+            ["tcgplayer", "cardhoarder", "cardmarket"]
+        )
+        assert_that(columns.columns["date"][1]).is_equal_to(
+            (datetime.date(2024, 1, 2) - datetime.date(1970, 1, 1)).days
+        )
+        assert_that(columns.columns["price"].tolist()).is_equal_to(
+            [0.25, 0.5, 1.0, 0.25, 0.5, 1.0]
+        )
+
+    def test_append_sample(self):
+        sample = pathlib.Path(__file__).parent.joinpath("samples/cardprices.json")
+        columns = PriceColumns()
+        columns.append("uuid", json.loads(sample.read_text()))
+
+        assert_that(len(columns)).is_greater_than(100)
+        assert_that(columns.categories["format"]).is_equal_to(["paper"])
+
+    def test_npy(self, columns, tmp_path):
+        numpy = pytest.importorskip("numpy")
+        columns.save(tmp_path)
+
+        loaded = PriceColumns.load(tmp_path)
+
+        assert_that(loaded["uuids"]).is_equal_to(["a", "b", "c"])
+        assert_that(loaded["price"].dtype).is_equal_to(numpy.float32)
+        assert_that(loaded["price"].tolist()).is_equal_to(
+            columns.columns["price"].tolist()
+        )
+        assert_that(loaded["provider"].dtype).is_equal_to(numpy.uint8)
+        assert_that(loaded["date"].tolist()).is_equal_to(
+            columns.columns["date"].tolist()
+        )
+
+    def test_arrow(self, columns, tmp_path):
+        pytest.importorskip("pyarrow")
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        path = columns.save(tmp_path, format="arrow")
+        with pyarrow.memory_map(str(path)) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        parquet = pyarrow.parquet.read_table(columns.save(tmp_path, "parquet"))
+
+        for t in [table, parquet]:
+            assert_that(t.num_rows).is_equal_to(6)
+            assert_that(t.column("uuid").to_pylist()[3]).is_equal_to("c")
+            assert_that(t.column("date").to_pylist()[1]).is_equal_to(
+                datetime.date(2024, 1, 2)
+            )
+            assert_that(t.column("finish").to_pylist()[2]).is_equal_to("foil")
+
+    def test_unsupported_format(self, columns, tmp_path):
+        pytest.importorskip("pyarrow")
+
+        with pytest.raises(ValueError):
+            columns.save(tmp_path, format="csv")
+
+
+@pytest.mark.asyncio
+class TestMtgJsonPriceColumns:
+    async def test_all_prices_columns(self):
+        def handler(request: httpx.Request):
+            return httpx.Response(200, json={"data": {"a": PRICES, "b": {}}})
+
+        client = MtgJson(
+            transport=httpx.MockTransport(handler),
+            compression=MtgJsonCompression.NONE,
+        )
+        columns = await client.all_prices_columns_async()
+
+        assert_that(columns.uuids).is_equal_to(["a", "b"])
+        assert_that(len(columns)).is_equal_to(3)
@@ -0,0 +1,157 @@
+import datetime
+import os
+import shutil
+
+import httpx
+import pytest
+from assertpy import assert_that
+
+from mightstone.services.mtgjson import MtgJson, MtgJsonCompression
+from mightstone.services.mtgjson.columnar import PriceColumns
+from mightstone.services.mtgjson.history import PriceHistory
+
+
+def snapshot(prices: dict) -> PriceColumns:
+    """
+    Build the columns of a snapshot, from {uuid: {date: price}} retail prices
+    """
+    columns = PriceColumns()
+    for uuid, points in prices.items():
+        columns.append(
+            uuid,
+            {"paper": {"tcgplayer": {"currency": "USD", "retail": {"normal": points}}}},
+        )
+    return columns
+
+
+@pytest.fixture
+def history(tmp_path):
+    return PriceHistory(tmp_path)
+
+
+class TestPriceHistory:
+    def test_empty(self, history):
+        assert_that(history.dates()).is_empty()
+        assert_that(history.prices("a")).is_empty()
+
+    def test_append_dedupes_unchanged_prices(self, history):
+        history.append(snapshot({"a": {"2024-01-01": 1.0}, "b": {"2024-01-01": 2}}))
+        history.append(snapshot({"a": {"2024-01-02": 1.0}, "b": {"2024-01-02": 3}}))
+        history.append(snapshot({"a": {"2024-01-03": 1.5}, "b": {"2024-01-03": 3}}))
+
+        assert_that(history.dates()).is_length(3)
+        assert_that([(p.date.day, p.price) for p in history.prices("a")]).is_equal_to(
+            [(1, 1.0), (3, 1.5)]
+        )
+        assert_that([(p.date.day, p.price) for p in history.prices("b")]).is_equal_to(
+            [(1, 2.0), (2, 3.0)]
+        )
+        point = history.prices("a")[0]
+        assert_that(point.provider).is_equal_to("tcgplayer")
+        assert_that(point.finish).is_equal_to("normal")
+        assert_that(point.currency).is_equal_to("USD")
+
+    def test_append_is_idempotent(self, history):
+        appended = history.append(snapshot({"a": {"2024-01-01": 1.0}}))
+        again = history.append(snapshot({"a": {"2024-01-01": 2.0}}))
+
+        assert_that(appended).is_equal_to([datetime.date(2024, 1, 1)])
+        assert_that(again).is_empty()
+        assert_that(history.prices("a")[0].price).is_equal_to(1.0)
+
+    def test_append_several_days(self, history):
+        history.append(
+            snapshot({"a": {"2024-01-02": 2.0, "2024-01-01": 1.0, "2024-01-03": 2.0}})
+        )
+
+        assert_that([p.price for p in history.prices("a")]).is_equal_to([1.0, 2.0])
+
+    def test_range(self, history):
+        for day in range(1, 6):
+            history.append(snapshot({"a": {f"2024-01-0{day}": day}, "b": {}}))
+
+        points = history.prices(
+            "a", start=datetime.date(2024, 1, 2), end=datetime.date(2024, 1, 4)
+        )
+
+        assert_that([p.price for p in points]).is_equal_to([2.0, 3.0, 4.0])
+
+    def test_persisted(self, history):
+        history.append(snapshot({"a": {"2024-01-01": 1.0}}))
+        other = PriceHistory(history.directory)
+        other.append(snapshot({"a": {"2024-01-02": 1.0}}))
+
+        assert_that(other.prices("a")).is_length(1)
+
+    def test_stale_latest_is_replayed(self, history):
+        history.append(snapshot({"a": {"2024-01-01": 1.0}}))
+        stale = history.directory.joinpath("stale")
+        shutil.copytree(history.directory.joinpath("latest"), stale)
+        history.append(snapshot({"a": {"2024-01-02": 2.0}}))
+        # An append interrupted before its latest snapshot was written
+        shutil.rmtree(history.directory.joinpath("latest"))
+        stale.rename(history.directory.joinpath("latest"))
+
+        history.append(snapshot({"a": {"2024-01-03": 1.0}}))
+
+        assert_that([p.price for p in history.prices("a")]).is_equal_to([1.0, 2.0, 1.0])
+
+    def test_partitions_are_never_replaced(self, history):
+        history.append(snapshot({"a": {"2024-01-01": 1.0}}))
+        partition = history.directory.joinpath("2024-01-01")
+        inode = partition.stat().st_ino
+
+        history.append(snapshot({"a": {"2024-01-02": 2.0}}))
+
+        assert_that(partition.stat().st_ino).is_equal_to(inode)
+        with pytest.raises(OSError):
+            history._write("2024-01-01", snapshot({"a": {"2024-01-01": 3.0}}))
+        assert_that([p.name for p in history.directory.iterdir()]).does_not_contain(
+            f".2024-01-01.{os.getpid()}.tmp"
+        )
+        assert_that(history.prices("a")[0].price).is_equal_to(1.0)
+
+    def test_partitions_cache_is_bounded(self, history):
+        history.cache_size = 2
+        for day in range(1, 6):
+            history.append(snapshot({"a": {f"2024-01-0{day}": day}}))
+
+        assert_that(history.prices("a")).is_length(5)
+        assert_that(list(history._partitions)).is_equal_to(
+            [datetime.date(2024, 1, 4), datetime.date(2024, 1, 5)]
+        )
+
+
+@pytest.mark.asyncio
+class TestMtgJsonPriceHistory:
+    async def test_update_price_history(self, history):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            return httpx.Response(
+                200,
+                json={
+                    "data": {
+                        "a": {
+                            "paper": {
+                                "tcgplayer": {
+                                    "currency": "USD",
+                                    "retail": {"normal": {"2024-01-01": 1.0}},
+                                }
+                            }
+                        }
+                    }
+                },
+            )
+
+        client = MtgJson(
+            transport=httpx.MockTransport(handler),
+            compression=MtgJsonCompression.NONE,
+        )
+
+        dates = await client.update_price_history_async(history.directory)
+
+        assert_that(calls).contains("/api/v5/AllPricesToday.json")
+        assert_that(dates).is_equal_to([datetime.date(2024, 1, 1)])
+        assert_that(history.prices("a")).is_length(1)
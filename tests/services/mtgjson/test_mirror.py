@@ -0,0 +1,131 @@
+import bz2
+import gzip
+import json
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.services.mtgjson.mirror import MtgJsonMirror, build_index
+
+
+class TestBuildIndex:
+    def test_offsets(self):
+        document = json.dumps(
+            {
+                "meta": {"version": "5.2.2", "data": {"x": 1}},
+                "data": {
+                    'A"}': {"name": "}]\\", "list": [{"a": []}]},
+                    "B": [1, {"c": 2}],
+                    "C": "text",
+                    "D": 3,
+                    "Ë": {},
+                },
+            },
+            ensure_ascii=False,
+        ).encode()
+
+        offsets = build_index(document)
+
+        assert_that(offsets).is_length(4)
+        assert_that(offsets).does_not_contain_key("D", "x")
+        items = {k: json.loads(document[s:e]) for k, (s, e) in offsets.items()}
+        assert_that(items).is_equal_to(
+            {
+                'A"}': {"name": "}]\\", "list": [{"a": []}]},
+                "B": [1, {"c": 2}],
+                "C": "text",
+                "Ë": {},
+            }
+        )
+
+
+@pytest.mark.asyncio
+class TestMtgJsonMirror:
+    async def test_empty(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+
+        assert_that(mirror.version("AllPrices")).is_none()
+        assert_that(mirror.path("AllPrices")).is_equal_to(
+            tmp_path.joinpath("AllPrices.json")
+        )
+
+    async def test_update_uncompressed(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+        source = tmp_path.joinpath("download.json")
+        source.write_bytes(b'{"data": {}}')
+
+        path = await mirror.update("AllPrices", source, "5.2.2")
+
+        assert_that(path.read_bytes()).is_equal_to(b'{"data": {}}')
+        assert_that(source.exists()).is_false()
+        assert_that(mirror.version("AllPrices")).is_equal_to("5.2.2")
+
+    async def test_update_compressed(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+        source = tmp_path.joinpath("AllPrices.json.gz")
+        source.write_bytes(gzip.compress(b'{"data": {}}'))
+
+        await mirror.update("AllPrices", source, "5.2.2", compression="gzip")
+
+        assert_that(mirror.path("AllPrices").read_bytes()).is_equal_to(b'{"data": {}}')
+        assert_that(sorted(p.name for p in tmp_path.iterdir())).is_equal_to(
+            ["AllPrices.json", "AllPrices.version"]
+        )
+
+    async def test_update_decompressed_by_blocks(self, tmp_path):
+        content = json.dumps({"data": {str(i): [i] * 50 for i in range(5000)}})
+        mirror = MtgJsonMirror(tmp_path, workers=2)
+        source = tmp_path.joinpath("AllPrices.json.bz2")
+        source.write_bytes(bz2.compress(content.encode(), 1))
+
+        await mirror.update("AllPrices", source, "5.2.2", compression="bzip2")
+
+        assert_that(mirror.path("AllPrices").read_text()).is_equal_to(content)
+
+    async def test_open_is_not_affected_by_update(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+        source = tmp_path.joinpath("v1.json")
+        source.write_bytes(b"version 1")
+        await mirror.update("AllPrices", source, "1")
+
+        with mirror.open("AllPrices") as reader:
+            assert_that(await reader.read(7)).is_equal_to(b"version")
+
+            source = tmp_path.joinpath("v2.json")
+            source.write_bytes(b"version 2")
+            await mirror.update("AllPrices", source, "2")
+
+            assert_that(await reader.read()).is_equal_to(b" 1")
+
+        with mirror.open("AllPrices") as reader:
+            assert_that(await reader.read()).is_equal_to(b"version 2")
+
+    async def test_lookup(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+        source = tmp_path.joinpath("download")
+        source.write_bytes(b'{"data": {"a": {"v": 1}, "b": {"v": 2}}}')
+        await mirror.update("AllPrices", source, "1")
+
+        assert_that(json.loads(mirror.lookup("AllPrices", "b"))).is_equal_to({"v": 2})
+        assert_that(mirror.path("AllPrices").with_suffix(".index").exists()).is_true()
+        with pytest.raises(KeyError):
+            mirror.lookup("AllPrices", "c")
+
+        # The index is persisted for other processes
+        other = MtgJsonMirror(tmp_path)
+        assert_that(json.loads(other.lookup("AllPrices", "a"))).is_equal_to({"v": 1})
+
+    async def test_index_is_rebuilt_on_update(self, tmp_path):
+        mirror = MtgJsonMirror(tmp_path)
+        for version, content in enumerate(
+            [b'{"data": {"a": [1]}}', b'{"data": {"b": [2]}}']
+        ):
+            source = tmp_path.joinpath("download")
+            source.write_bytes(content)
+            await mirror.update("AllPrices", source, str(version))
+            key = "b" if version else "a"
+            assert_that(mirror.lookup("AllPrices", key)).is_not_empty()
+
+        assert_that(json.loads(mirror.lookup("AllPrices", "b"))).is_equal_to([2])
+        with pytest.raises(KeyError):
+            mirror.lookup("AllPrices", "a")
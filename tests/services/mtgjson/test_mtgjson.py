@@ -1,13 +1,27 @@
 import datetime
+import email.utils
+import gzip
+import hashlib
+import io
+import json
 import pathlib
+import tempfile
 import unittest
+import zipfile
+from typing import Optional
 
 import asyncstdlib
+import httpx
 import pytest
 from assertpy import assert_that
+from hishel import AsyncInMemoryStorage
 from packaging import version
 
-from mightstone.services.mtgjson.api import MtgJson, MtgJsonCompression
+from mightstone.config import CachePolicy
+from mightstone.core import Validation
+from mightstone.hishel import MightstoneCacheTransport, MightstoneController
+from mightstone.services import ServiceError
+from mightstone.services.mtgjson.api import MtgJson, MtgJsonCompression, MtgJsonManifest
 from mightstone.services.mtgjson.models import (
     Card,
     CardAtomic,
@@ -17,6 +31,7 @@ from mightstone.services.mtgjson.models import (
     Deck,
     DeckList,
     Keywords,
+    Meta,
     Set,
     SetList,
     TcgPlayerSKUs,
@@ -52,6 +67,298 @@ class TestMtgJsonData:
         assert_that(card.model_dump_json()).is_instance_of(str)
 
 
+class TestMtgJsonManifest:
+    def test_in_memory(self):
+        manifest = MtgJsonManifest()
+        manifest.set("/api/v5/AllPrices.json", "5.2.2")
+
+        assert_that(manifest.get("/api/v5/AllPrices.json")).is_equal_to("5.2.2")
+        assert_that(manifest.get("/api/v5/AllPrintings.json")).is_none()
+
+    def test_persisted(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory).joinpath("mtgjson", "manifest.json")
+            MtgJsonManifest(path).set("/api/v5/AllPrices.json", "5.2.2")
+
+            manifest = MtgJsonManifest(path)
+
+        assert_that(manifest.get("/api/v5/AllPrices.json")).is_equal_to("5.2.2")
+
+
+@pytest.mark.asyncio
+class TestMtgJsonMetaGatedRefresh:
+    @staticmethod
+    def build(meta: dict, calls: list) -> MtgJson:
+        def handler(request: httpx.Request):
+            calls.append((request.url.path, request.headers.get("if-none-match")))
+            headers = {"date": email.utils.formatdate(usegmt=True), "etag": "prices"}
+            if request.url.path.startswith("/api/v5/Meta.json"):
+                return httpx.Response(200, headers=headers, json={"data": meta})
+            if request.headers.get("if-none-match") == "prices":
+                return httpx.Response(304, headers=headers)
+            return httpx.Response(200, headers=headers, json={"data": {"a": {}}})
+
+        transport = MightstoneCacheTransport(
+            transport=httpx.MockTransport(handler),
+            storage=AsyncInMemoryStorage(),
+            controller=MightstoneController(
+                policies=[
+                    CachePolicy(path="/api/v5/Meta.json", no_store=True),
+                    CachePolicy(ttl=0),
+                ]
+            ),
+        )
+        return MtgJson(transport=transport, compression=MtgJsonCompression.NONE)
+
+    async def test_dataset_is_not_downloaded_again_for_the_same_version(self):
+        calls: list = []
+        client = self.build({"date": "2024-01-01", "version": "5.2.2"}, calls)
+
+        first = [k async for k, _ in client._iterate_model("AllPrices")]
+        second = [k async for k, _ in client._iterate_model("AllPrices")]
+
+        assert_that(first).is_equal_to(["a"])
+        assert_that(second).is_equal_to(["a"])
+        assert_that([c for c in calls if "AllPrices" in c[0]]).is_length(1)
+
+    async def test_dataset_is_revalidated_for_a_new_version(self):
+        calls: list = []
+        meta = {"date": "2024-01-01", "version": "5.2.2"}
+        client = self.build(meta, calls)
+
+        [k async for k, _ in client._iterate_model("AllPrices")]
+        meta["version"] = "5.2.3"
+        second = [k async for k, _ in client._iterate_model("AllPrices")]
+
+        assert_that(second).is_equal_to(["a"])
+        assert_that([c for c in calls if "AllPrices" in c[0]]).is_equal_to(
+            [("/api/v5/AllPrices.json", None), ("/api/v5/AllPrices.json", "prices")]
+        )
+        assert_that(client.manifest.get("/api/v5/AllPrices.json")).is_equal_to("5.2.3")
+
+
+@pytest.mark.asyncio
+class TestMtgJsonDirectory:
+    @staticmethod
+    def build(
+        directory: Optional[pathlib.Path],
+        calls: list,
+        checksum: str = "",
+        compression=MtgJsonCompression.NONE,
+    ) -> MtgJson:
+        def encode(data: dict) -> bytes:
+            content = json.dumps({"data": data}).encode()
+            if compression == MtgJsonCompression.GZIP:
+                return gzip.compress(content)
+            if compression == MtgJsonCompression.ZIP:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                    archive.writestr("data.json", content)
+                return buffer.getvalue()
+            return content
+
+        prices = encode({"a": {}, "b": {"mtgo": {"cardhoarder": {}}}})
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            headers = {"date": email.utils.formatdate(usegmt=True)}
+            if request.url.path.startswith("/api/v5/Meta.json"):
+                meta = encode({"date": "2024-01-01", "version": "5.2.2"})
+                return httpx.Response(200, headers=headers, content=meta)
+            if request.url.path.endswith(".sha256"):
+                digest = checksum or hashlib.sha256(prices).hexdigest()
+                return httpx.Response(200, headers=headers, text=digest)
+            return httpx.Response(200, headers=headers, content=prices)
+
+        transport = MightstoneCacheTransport(
+            transport=httpx.MockTransport(handler), storage=AsyncInMemoryStorage()
+        )
+        return MtgJson(
+            transport=transport, compression=compression, directory=directory
+        )
+
+    async def test_dataset_is_downloaded_once(self):
+        calls: list = []
+        with tempfile.TemporaryDirectory() as directory:
+            client = self.build(pathlib.Path(directory), calls)
+            first = [k async for k, _ in client._iterate_model("AllPrices")]
+            second = [k async for k, _ in client._iterate_model("AllPrices")]
+
+            assert_that(client.mirror.path("AllPrices").exists()).is_true()
+            assert_that(client.mirror.version("AllPrices")).is_equal_to("5.2.2")
+
+        assert_that(first).is_equal_to(["a", "b"])
+        assert_that(second).is_equal_to(["a", "b"])
+        assert_that(calls.count("/api/v5/AllPrices.json")).is_equal_to(1)
+
+    async def test_compressed_dataset_is_mirrored_uncompressed(self):
+        calls: list = []
+        with tempfile.TemporaryDirectory() as directory:
+            client = self.build(
+                pathlib.Path(directory), calls, compression=MtgJsonCompression.GZIP
+            )
+            keys = [k async for k, _ in client._iterate_model("AllPrices")]
+
+            files = sorted(p.name for p in client.mirror.directory.iterdir())
+
+        assert_that(keys).is_equal_to(["a", "b"])
+        assert_that(files).is_equal_to(
+            ["AllPrices.json", "AllPrices.lock", "AllPrices.version"]
+        )
+
+    async def test_zip_dataset_is_streamed(self):
+        client = self.build(None, [], compression=MtgJsonCompression.ZIP)
+
+        keys = [k async for k, _ in client._iterate_model("AllPrices")]
+
+        assert_that(keys).is_equal_to(["a", "b"])
+
+    async def test_dataset_is_decompressed_in_a_thread(self):
+        client = self.build(None, [], compression=MtgJsonCompression.GZIP)
+        client.decompression_thread = True
+
+        keys = [k async for k, _ in client._iterate_model("AllPrices")]
+
+        assert_that(keys).is_equal_to(["a", "b"])
+
+    async def test_zip_dataset_is_mirrored_uncompressed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            client = self.build(
+                pathlib.Path(directory), [], compression=MtgJsonCompression.ZIP
+            )
+            keys = [k async for k, _ in client._iterate_model("AllPrices")]
+            content = json.loads(client.mirror.path("AllPrices").read_bytes())
+
+        assert_that(keys).is_equal_to(["a", "b"])
+        assert_that(content["data"]).contains_key("a", "b")
+
+    async def test_checksum_is_verified(self):
+        with tempfile.TemporaryDirectory() as directory:
+            client = self.build(pathlib.Path(directory), [], checksum="0" * 64)
+
+            with pytest.raises(ServiceError):
+                [k async for k, _ in client._iterate_model("AllPrices")]
+
+    async def test_lookup(self):
+        calls: list = []
+        with tempfile.TemporaryDirectory() as directory:
+            client = self.build(pathlib.Path(directory), calls)
+            item = await client.lookup_async("AllPrices", "b")
+            again = await client.lookup_async("AllPrices", "a")
+
+            with pytest.raises(KeyError):
+                await client.lookup_async("AllPrices", "c")
+
+        assert_that(item).is_equal_to({"mtgo": {"cardhoarder": {}}})
+        assert_that(again).is_equal_to({})
+        assert_that(calls.count("/api/v5/AllPrices.json")).is_equal_to(1)
+
+    async def test_lookup_requires_a_directory(self):
+        with pytest.raises(ValueError):
+            await MtgJson().lookup_async("AllPrices", "a")
+
+
+@pytest.mark.asyncio
+class TestMtgJsonWorkers:
+    @staticmethod
+    def build(**kwargs) -> MtgJson:
+        data = {
+            str(i): {"date": "2024-01-01", "version": f"5.2.{i}"} for i in range(20)
+        }
+        data["3"] = {"date": "not a date"}
+
+        def handler(request: httpx.Request):
+            return httpx.Response(200, json={"data": data})
+
+        return MtgJson(
+            transport=httpx.MockTransport(handler),  # type: ignore[arg-type]
+            compression=MtgJsonCompression.NONE,
+            **kwargs,
+        )
+
+    async def test_ordered(self):
+        client = self.build(workers=2, batch_size=3)
+        items = [(k, v) async for k, v in client._iterate_model("Meta", model=Meta)]
+
+        assert_that([k for k, _ in items]).is_equal_to(
+            [str(i) for i in range(20) if i != 3]
+        )
+        assert_that(items[-1][1]).is_instance_of(Meta)
+        assert_that(items[-1][1].version).is_equal_to("5.2.19")
+
+    async def test_unordered(self):
+        client = self.build(workers=2, batch_size=3, ordered=False)
+        keys = [k async for k, _ in client._iterate_model("Meta", model=Meta)]
+
+        assert_that(sorted(keys, key=int)).is_equal_to(
+            [str(i) for i in range(20) if i != 3]
+        )
+
+    async def test_trusted_validation(self):
+        lazy = self.build(validation="lazy")
+        items = [v async for _, v in lazy._iterate_model("Meta", model=Meta)]
+
+        assert_that(items).is_length(20)
+        assert_that(items[3]).is_instance_of(Meta)
+        assert_that(items[3].date).is_equal_to("not a date")
+
+        raw = self.build(validation="none", workers=2)
+        items = [v async for _, v in raw._iterate_model("Meta", model=Meta)]
+
+        assert_that(items[0]).is_equal_to({"date": "2024-01-01", "version": "5.2.0"})
+
+    async def test_fields(self):
+        for workers in [0, 2]:
+            client = self.build(workers=workers, batch_size=3)
+            items = [
+                v
+                async for _, v in client._iterate_model(
+                    "Meta", model=Meta, fields=["version"]
+                )
+            ]
+
+            assert_that(items).is_length(20)
+            assert_that(items[3].version).is_none()
+            assert_that(items[4].model_dump()).is_equal_to({"version": "5.2.4"})
+
+    async def test_error_threshold(self):
+        client = self.build(workers=2, batch_size=3)
+
+        with pytest.raises(RuntimeError):
+            [
+                k
+                async for k, _ in client._iterate_model(
+                    "Meta", model=Meta, error_threshold=0
+                )
+            ]
+
+    async def test_prices_validation(self):
+        a, b = (
+            "00000000-0000-0000-0000-00000000000a",
+            "00000000-0000-0000-0000-00000000000b",
+        )
+        prices = {a: {"paper": {"tcgplayer": {"currency": "USD"}}}, b: {}}
+
+        def handler(request: httpx.Request):
+            return httpx.Response(200, json={"data": prices})
+
+        def build(validation: Validation) -> MtgJson:
+            return MtgJson(
+                transport=httpx.MockTransport(handler),  # type: ignore[arg-type]
+                compression=MtgJsonCompression.NONE,
+                validation=validation,
+            )
+
+        full = [item async for item in build(Validation.FULL).all_prices_async()]
+        raw = [item async for item in build(Validation.NONE).all_prices_async()]
+
+        assert_that(full[0]).is_instance_of(CardPrices)
+        assert_that(str(full[0].id)).is_equal_to(a)
+        assert_that(raw[0]).is_instance_of(dict)
+        assert_that(raw[0]).contains_entry({"uuid": a}, prices[a])
+        assert_that(raw[1]).contains_entry({"uuid": b})
+
+
 @pytest.mark.asyncio
 @pytest.mark.skip_remote_api
 class TestMtgJsonRealCompressionTest:
@@ -99,9 +406,11 @@ class TestMtgJsonRealCompressionTest:
         m = MtgJson(
             compression=MtgJsonCompression.ZIP,
         )
+        meta = await m.meta_async()
 
-        with pytest.raises(ValueError):
-            await m.meta_async()
+        assert_that(meta.date).is_instance_of(datetime.date)
+        assert_that(meta.version).is_instance_of(str)
+        assert_that(version.parse(meta.version) > version.Version("5.2.1")).is_true()
 
 
 @pytest.mark.skip_remote_api
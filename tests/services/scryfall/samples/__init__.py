@@ -0,0 +1,114 @@
+"""
+Cards shared by the offline search tests
+"""
+
+
+def card(name, **kwargs) -> dict:
+    return {
+        "object": "card",
+        "name": name,
+        "type_line": "Instant",
+        "oracle_text": "",
+        "cmc": 1.0,
+        "colors": [],
+        "color_identity": [],
+        "rarity": "common",
+        "set": "tst",
+        "released_at": "2020-01-01",
+        "legalities": {"modern": "legal", "vintage": "legal"},
+        "games": ["paper"],
+        "prices": {},
+        **kwargs,
+    }
+
+
+CARDS = [
+    card(
+        "Lightning Bolt",
+        oracle_text="Lightning Bolt deals 3 damage to any target.",
+        colors=["R"],
+        color_identity=["R"],
+        prices={"usd": "1.50", "eur": "1.20"},
+        set="lea",
+        released_at="1993-08-05",
+        games=["paper", "mtgo"],
+    ),
+    card(
+        "Counterspell",
+        oracle_text="Counter target spell.",
+        cmc=2.0,
+        colors=["U"],
+        color_identity=["U"],
+        rarity="uncommon",
+        legalities={"modern": "not_legal", "vintage": "legal"},
+        prices={"usd": "0.90"},
+    ),
+    card(
+        "Tarmogoyf",
+        type_line="Creature — Lhurgoyf",
+        oracle_text="Tarmogoyf's power is equal to the number of card types...",
+        cmc=2.0,
+        colors=["G"],
+        color_identity=["G"],
+        rarity="mythic",
+        power="*",
+        toughness="1+*",
+        prices={"usd": "20.00"},
+    ),
+    card(
+        "Grizzly Bears",
+        type_line="Creature — Bear",
+        cmc=2.0,
+        colors=["G"],
+        color_identity=["G"],
+        power="2",
+        toughness="2",
+    ),
+    card(
+        "Boros Reckoner",
+        type_line="Creature — Minotaur Wizard",
+        oracle_text="Whenever Boros Reckoner is dealt damage, it deals that much damage.",
+        cmc=3.0,
+        colors=["R", "W"],
+        color_identity=["R", "W"],
+        rarity="rare",
+        power="3",
+        toughness="3",
+        legalities={"modern": "legal", "vintage": "legal"},
+    ),
+    card(
+        "Black Lotus",
+        type_line="Artifact",
+        oracle_text="{T}, Sacrifice Black Lotus: Add three mana of any one color.",
+        cmc=0.0,
+        rarity="rare",
+        reserved=True,
+        produced_mana=["W", "U", "B", "R", "G"],
+        legalities={"modern": "banned", "vintage": "restricted"},
+        set="lea",
+    ),
+    card(
+        "Delver of Secrets // Insectile Aberration",
+        type_line="Creature — Human Wizard // Creature — Human Insect",
+        oracle_text=None,
+        layout="transform",
+        color_identity=["U"],
+        colors=None,
+        card_faces=[
+            {
+                "name": "Delver of Secrets",
+                "oracle_text": "At the beginning of your upkeep, look at the top card",
+                "colors": ["U"],
+                "power": "1",
+                "toughness": "1",
+            },
+            {
+                "name": "Insectile Aberration",
+                "oracle_text": "Flying",
+                "colors": ["U"],
+                "power": "3",
+                "toughness": "2",
+            },
+        ],
+    ),
+]
@@ -0,0 +1,140 @@
+import email.utils
+import gzip
+import json
+
+import httpx
+import pytest
+from assertpy import assert_that
+from hishel import AsyncInMemoryStorage
+
+from mightstone.core import Validation
+from mightstone.hishel import MightstoneCacheTransport
+from mightstone.services import ServiceError
+from mightstone.services.scryfall import Scryfall
+from mightstone.services.scryfall.bulk import ScryfallBulkStore
+
+CARDS = [{"id": "a", "name": "Black Lotus"}, {"id": "b", "name": "Mox Pearl"}]
+
+
+@pytest.mark.asyncio
+class TestScryfallBulkStore:
+    async def test_empty(self, tmp_path):
+        store = ScryfallBulkStore(tmp_path)
+
+        assert_that(store.updated_at("default_cards")).is_none()
+        assert_that(store.is_outdated("default_cards", "2024-01-01T10:00:00+00:00"))
+
+    async def test_update_compressed(self, tmp_path):
+        store = ScryfallBulkStore(tmp_path, compression="gzip")
+        source = tmp_path.joinpath("default_cards.download")
+        source.write_text(json.dumps(CARDS))
+
+        path = await store.update(
+            "default_cards", source, "2024-01-01T10:00:00.123+00:00"
+        )
+        async with store.open("default_cards") as f:
+            content = json.loads(await f.read())
+
+        assert_that(path.name).is_equal_to("default_cards.json.gz")
+        assert_that(gzip.decompress(path.read_bytes())).is_not_empty()
+        assert_that(content).is_equal_to(CARDS)
+        assert_that(source.exists()).is_false()
+        assert_that(
+            store.is_outdated("default_cards", "2024-01-01T10:00:00.123+00:00")
+        ).is_false()
+        assert_that(
+            store.is_outdated("default_cards", "2024-01-02T10:00:00.123+00:00")
+        ).is_true()
+
+    async def test_other_compression_is_outdated(self, tmp_path):
+        source = tmp_path.joinpath("rulings.download")
+        source.write_text("[]")
+        await ScryfallBulkStore(tmp_path).update(
+            "rulings", source, "2024-01-01T10:00:00+00:00"
+        )
+
+        store = ScryfallBulkStore(tmp_path, compression="gzip")
+
+        assert_that(store.updated_at("rulings")).is_none()
+
+    def test_unsupported_compression(self, tmp_path):
+        with pytest.raises(ValueError):
+            ScryfallBulkStore(tmp_path, compression="rar")
+
+
+@pytest.mark.asyncio
+class TestScryfallBulkData:
+    @staticmethod
+    def build(directory, calls: list, bulk: dict, compression=None) -> Scryfall:
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            headers = {"date": email.utils.formatdate(usegmt=True)}
+            if request.url.path == "/bulk-data":
+                return httpx.Response(200, headers=headers, json={"data": [bulk]})
+            return httpx.Response(200, headers=headers, json=CARDS)
+
+        transport = MightstoneCacheTransport(
+            transport=httpx.MockTransport(handler), storage=AsyncInMemoryStorage()
+        )
+        return Scryfall(
+            transport=transport, directory=directory, compression=compression
+        )
+
+    @staticmethod
+    def bulk(updated_at: str) -> dict:
+        return {
+            "type": "default_cards",
+            "updated_at": updated_at,
+            "download_uri": "https://data.scryfall.io/default-cards/cards.json",
+        }
+
+    async def test_downloaded_once(self, tmp_path):
+        calls: list = []
+        bulk = self.bulk("2024-01-01T10:00:00+00:00")
+        client = self.build(tmp_path, calls, bulk, compression="gzip")
+
+        first = [
+            c["name"]
+            async for c in client.get_bulk_data_async(
+                "default_cards", validation=Validation.NONE
+            )
+        ]
+        second = [
+            c["name"]
+            async for c in client.get_bulk_data_async(
+                "default_cards", validation=Validation.NONE
+            )
+        ]
+
+        assert_that(first).is_equal_to(["Black Lotus", "Mox Pearl"])
+        assert_that(second).is_equal_to(first)
+        assert_that(calls.count("/default-cards/cards.json")).is_equal_to(1)
+
+    async def test_downloaded_again_when_updated(self, tmp_path):
+        calls: list = []
+        await self.build(
+            tmp_path, calls, self.bulk("2024-01-01T10:00:00+00:00")
+        ).update_bulk_data_async("default_cards")
+        client = self.build(tmp_path, calls, self.bulk("2024-01-02T10:00:00+00:00"))
+
+        path = await client.update_bulk_data_async("default_cards")
+
+        assert_that(json.loads(path.read_text())).is_equal_to(CARDS)
+        assert_that(calls.count("/default-cards/cards.json")).is_equal_to(2)
+        assert_that(client.bulk_store.updated_at("default_cards")).is_equal_to(
+            "2024-01-02T10:00:00+00:00"
+        )
+
+    async def test_missing_download_uri(self, tmp_path):
+        bulk = self.bulk("2024-01-01T10:00:00+00:00")
+        del bulk["download_uri"]
+        client = self.build(tmp_path, [], bulk)
+
+        with pytest.raises(ServiceError):
+            await client.update_bulk_data_async("default_cards")
+
+    async def test_update_requires_a_directory(self):
+        client = Scryfall()
+
+        with pytest.raises(ValueError):
+            await client.update_bulk_data_async("default_cards")
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import pathlib
+import uuid
+
+import httpx
+import pytest
+from assertpy import assert_that
+from hishel import AsyncInMemoryStorage
+
+from mightstone.hishel import MightstoneCacheTransport
+from mightstone.services.scryfall import Scryfall
+
+CARD = json.loads(
+    pathlib.Path(__file__).parent.joinpath("samples/card.json").read_text()
+)
+
+
+def build(requests: list, concurrency: dict) -> Scryfall:
+    async def handler(request: httpx.Request):
+        identifiers = json.loads(request.content)["identifiers"]
+        requests.append(len(identifiers))
+        concurrency["current"] += 1
+        concurrency["max"] = max(concurrency["max"], concurrency["current"])
+        await asyncio.sleep(0.01)
+        concurrency["current"] -= 1
+
+        data, not_found = [], []
+        for identifier in identifiers:
+            if identifier["name"].endswith("0"):
+                not_found.append(identifier)
+            else:
+                data.append(
+                    {
+                        **CARD,
+                        "id": str(uuid.uuid5(uuid.NAMESPACE_DNS, identifier["name"])),
+                        "name": identifier["name"],
+                    }
+                )
+        return httpx.Response(
+            200, json={"object": "list", "data": data, "not_found": not_found}
+        )
+
+    transport = MightstoneCacheTransport(
+        transport=httpx.MockTransport(handler), storage=AsyncInMemoryStorage()
+    )
+    return Scryfall(transport=transport)
+
+
+def identifiers(count: int):
+    return [{"name": f"Card {i}"} for i in range(count)]
+
+
+@pytest.mark.asyncio
+class TestScryfallCollection:
+    async def test_chunked(self):
+        requests: list = []
+        concurrency = {"current": 0, "max": 0}
+        not_found: list = []
+        client = build(requests, concurrency)
+
+        cards = [
+            card
+            async for card in client.collection_async(
+                identifiers(1000), not_found=not_found, concurrency=3
+            )
+        ]
+
+        assert_that(requests).is_length(14)
+        assert_that(max(requests)).is_equal_to(75)
+        assert_that(concurrency["max"]).is_equal_to(3)
+        assert_that([card.name for card in cards]).is_equal_to(
+            [f"Card {i}" for i in range(1000) if i % 10]
+        )
+        assert_that(not_found).is_equal_to(
+            [{"name": f"Card {i}"} for i in range(0, 1000, 10)]
+        )
+
+    async def test_async_iterable(self):
+        async def generate():
+            for identifier in identifiers(100):
+                yield identifier
+
+        requests: list = []
+        client = build(requests, {"current": 0, "max": 0})
+
+        cards = [card async for card in client.collection_async(generate())]
+
+        assert_that(requests).is_equal_to([75, 25])
+        assert_that(cards).is_length(90)
+
+    async def test_stop_early(self):
+        requests: list = []
+        client = build(requests, {"current": 0, "max": 0})
+
+        async for _ in client.collection_async(identifiers(10000), concurrency=2):
+            break
+        await asyncio.sleep(0.05)
+
+        assert_that(len(requests)).is_less_than_or_equal_to(2)
+
+    async def test_pages_closed(self):
+        closed = []
+        client = build([], {"current": 0, "max": 0})
+        pages = client._pages
+
+        async def tracked(*args, **kwargs):
+            try:
+                async for item in pages(*args, **kwargs):
+                    yield item
+            finally:
+                closed.append(True)
+
+        client._pages = tracked  # type: ignore[method-assign]
+        cards = [card async for card in client.collection_async(identifiers(100))]
+
+        assert_that(cards).is_length(90)
+        assert_that(closed).is_equal_to([True, True])
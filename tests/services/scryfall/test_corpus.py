@@ -0,0 +1,153 @@
+import json
+import pathlib
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.core import Validation
+from mightstone.services.scryfall import Card, Query
+from mightstone.services.scryfall.query import ComparatorEnum, KeywordEnum, Term
+
+from .samples import CARDS
+
+pytest.importorskip("numpy")
+
+from mightstone.services.scryfall.corpus import CardCorpus, compile_query  # noqa
+
+ALL = [card["name"] for card in CARDS]
+
+SAMPLE = json.loads(
+    pathlib.Path(__file__).parent.joinpath("samples/card.json").read_text()
+)
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    return CardCorpus(CARDS)
+
+
+def names(corpus: CardCorpus, query) -> list:
+    cards = corpus.search(query, validation=Validation.NONE)
+    # Raw cards are dicts using Validation.NONE
+    return [c["name"] for c in cards]  # type: ignore[index]
+
+
+class TestCardCorpus:
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            ("bolt", ["Lightning Bolt"]),
+            ("!counterspell", ["Counterspell"]),
+            ("!counter", []),
+            (
+                "t:creature t:wizard",
+                ["Boros Reckoner", "Delver of Secrets // Insectile Aberration"],
+            ),
+            ("o:flying", ["Delver of Secrets // Insectile Aberration"]),
+            ("o:/deals \\d damage/", ["Lightning Bolt"]),
+            ('o:"whenever ~ is dealt"', ["Boros Reckoner"]),
+            ("cmc>=3", ["Boros Reckoner"]),
+            ("pow>=2", ["Grizzly Bears", "Boros Reckoner"]),
+            ("c:r", ["Lightning Bolt", "Boros Reckoner"]),
+            ("c:boros", ["Boros Reckoner"]),
+            ("c:c", ["Black Lotus"]),
+            ("c:m", ["Boros Reckoner"]),
+            ("c>=2", ["Boros Reckoner"]),
+            ("id:wr t:creature", ["Boros Reckoner"]),
+            (
+                "id<=u",
+                [
+                    "Counterspell",
+                    "Black Lotus",
+                    "Delver of Secrets // Insectile Aberration",
+                ],
+            ),
+            ("produces:wu", ["Black Lotus"]),
+            ("s:lea", ["Lightning Bolt", "Black Lotus"]),
+            ("r:mythic", ["Tarmogoyf"]),
+            ("r>=rare", ["Tarmogoyf", "Boros Reckoner", "Black Lotus"]),
+            ("f:vintage r:rare", ["Boros Reckoner", "Black Lotus"]),
+            ("banned:modern", ["Black Lotus"]),
+            ("restricted:vintage", ["Black Lotus"]),
+            ("-f:modern", ["Counterspell", "Black Lotus"]),
+            ("usd>10", ["Tarmogoyf"]),
+            ("usd<1", ["Counterspell"]),
+            ("eur>0", ["Lightning Bolt"]),
+            ("year<2000", ["Lightning Bolt"]),
+            ("date>=2000-01-01 r:rare", ["Boros Reckoner", "Black Lotus"]),
+            ("game:mtgo", ["Lightning Bolt"]),
+            ("is:reserved", ["Black Lotus"]),
+            ("is:transform", ["Delver of Secrets // Insectile Aberration"]),
+            ("bolt OR counterspell", ["Lightning Bolt", "Counterspell"]),
+            (
+                "(c:g OR c:u) t:creature",
+                [
+                    "Tarmogoyf",
+                    "Grizzly Bears",
+                    "Delver of Secrets // Insectile Aberration",
+                ],
+            ),
+            ("bolt order:cmc", ["Lightning Bolt"]),
+            ('o:""', ALL),
+            ('name:""', ALL),
+        ],
+    )
+    def test_search(self, corpus, query, expected):
+        assert_that(names(corpus, query)).is_equal_to(expected)
+
+    @pytest.mark.parametrize(
+        "term, expected",
+        [
+            (Term("r", KeywordEnum.COLOR, ComparatorEnum.EQUAL), ["Lightning Bolt"]),
+            (
+                Term("2", KeywordEnum.POWER, ComparatorEnum.NEQUAL),
+                ["Boros Reckoner", "Delver of Secrets // Insectile Aberration"],
+            ),
+            (
+                Term("tou", KeywordEnum.POWER, ComparatorEnum.EQUAL),
+                [
+                    "Grizzly Bears",
+                    "Boros Reckoner",
+                    "Delver of Secrets // Insectile Aberration",
+                ],
+            ),
+            (
+                Term("reserved", KeywordEnum.NOT, ComparatorEnum.COLON)
+                & Term("lea", KeywordEnum.SET, ComparatorEnum.COLON),
+                ["Lightning Bolt"],
+            ),
+        ],
+    )
+    def test_terms(self, corpus, term, expected):
+        assert_that(names(corpus, Query(term))).is_equal_to(expected)
+
+    def test_query_object(self, corpus):
+        query = Query("t:creature") - Query("c:g")
+
+        assert_that(names(corpus, query)).is_equal_to(
+            ["Boros Reckoner", "Delver of Secrets // Insectile Aberration"]
+        )
+        assert_that(corpus.count(Query("c:g") ^ Query("t:creature"))).is_equal_to(2)
+
+    def test_unsupported(self, corpus):
+        with pytest.raises(ValueError):
+            corpus.mask("otag:removal")
+        with pytest.raises(ValueError):
+            corpus.mask("is:whatever")
+
+    def test_cached(self, corpus):
+        assert_that(compile_query("c:r t:creature")).is_same_as(
+            compile_query("c:r t:creature")
+        )
+        corpus.mask("t:creature")
+
+        assert_that(corpus.mask("t:creature")).is_same_as(corpus.mask("t:creature"))
+
+    def test_models(self):
+        corpus = CardCorpus([Card.model_validate(SAMPLE)])
+
+        cards = list(corpus.search(f"!\"{SAMPLE['name']}\""))
+
+        assert_that(cards).is_length(1)
+        assert_that(cards[0]).is_instance_of(Card)
+        assert_that(cards[0].id).is_equal_to(Card.model_validate(SAMPLE).id)
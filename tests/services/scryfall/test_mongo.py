@@ -0,0 +1,184 @@
+import datetime
+import json
+import pathlib
+
+import mongomock
+import pytest
+from assertpy import assert_that
+from beanie import init_beanie
+from mongomock_motor import AsyncMongoMockClient
+
+from mightstone.core import patch_beanie_document
+from mightstone.services.scryfall import Query, SerializableCard
+
+from .samples import CARDS
+
+
+@pytest.fixture(scope="module")
+def collection():
+    collection = mongomock.MongoClient().db.cards
+    collection.insert_many(
+        [
+            {
+                **card,
+                "released_at": datetime.datetime.fromisoformat(card["released_at"]),
+                "lower_name": card["name"].lower(),
+            }
+            for card in CARDS
+        ]
+    )
+    return collection
+
+
+def names(collection, query: str) -> list:
+    return [card["name"] for card in collection.find(Query(query).to_mongo())]
+
+
+class TestToMongo:
+    @pytest.mark.parametrize(
+        "query, expected",
+        [
+            ("bolt", ["Lightning Bolt"]),
+            ("!counterspell", ["Counterspell"]),
+            ("!counter", []),
+            (
+                "t:creature t:wizard",
+                ["Boros Reckoner", "Delver of Secrets // Insectile Aberration"],
+            ),
+            ("o:flying", ["Delver of Secrets // Insectile Aberration"]),
+            ("o:/deals \\d damage/", ["Lightning Bolt"]),
+            ("cmc>=3", ["Boros Reckoner"]),
+            ("c:r", ["Lightning Bolt", "Boros Reckoner"]),
+            ("c:u", ["Counterspell", "Delver of Secrets // Insectile Aberration"]),
+            ("c:boros", ["Boros Reckoner"]),
+            ("c:c", ["Black Lotus"]),
+            ("c:m", ["Boros Reckoner"]),
+            ("id:wr t:creature", ["Boros Reckoner"]),
+            (
+                "id<=u",
+                [
+                    "Counterspell",
+                    "Black Lotus",
+                    "Delver of Secrets // Insectile Aberration",
+                ],
+            ),
+            ("produces:wu", ["Black Lotus"]),
+            ("s:lea", ["Lightning Bolt", "Black Lotus"]),
+            ("r>=rare", ["Tarmogoyf", "Boros Reckoner", "Black Lotus"]),
+            ("f:vintage r:rare", ["Boros Reckoner", "Black Lotus"]),
+            ("banned:modern", ["Black Lotus"]),
+            ("-f:modern", ["Counterspell", "Black Lotus"]),
+            ("year<2000", ["Lightning Bolt"]),
+            ("date>=2000-01-01 r:rare", ["Boros Reckoner", "Black Lotus"]),
+            ("game:mtgo", ["Lightning Bolt"]),
+            ("is:reserved", ["Black Lotus"]),
+            ("is:transform", ["Delver of Secrets // Insectile Aberration"]),
+            ("bolt OR counterspell", ["Lightning Bolt", "Counterspell"]),
+            ("bolt order:cmc", ["Lightning Bolt"]),
+            ("name:/^light/", ["Lightning Bolt"]),
+            ("name:/^Bo?lt/", []),
+            ("name:/^delver.*secrets/", ["Delver of Secrets // Insectile Aberration"]),
+        ],
+    )
+    def test_find(self, collection, query, expected):
+        assert_that(names(collection, query)).is_equal_to(expected)
+
+    def test_index_friendly(self):
+        assert_that(Query("s:DMU r>=mythic cmc<=3").to_mongo()).is_equal_to(
+            {
+                "$and": [
+                    {"set": "dmu"},
+                    {"rarity": {"$in": ["mythic", "bonus"]}},
+                    {"cmc": {"$lte": 3.0}},
+                ]
+            }
+        )
+        assert_that(Query("f:commander").to_mongo()).is_equal_to(
+            {"legalities.commander": {"$in": ["legal", "restricted"]}}
+        )
+
+    def test_exact_name(self):
+        assert_that(Query('!"Lightning Bolt"').to_mongo()).is_equal_to(
+            {"lower_name": "lightning bolt"}
+        )
+
+    @pytest.mark.parametrize(
+        "pattern, prefix",
+        [
+            ("^Light", "light"),
+            ("^boros reck", "boros\\ reck"),
+            ("^lightn?ing", "light"),
+            ("^\\(bolt\\)", "\\(bolt\\)"),
+            ("^\\d+", None),
+            ("^light|bolt", None),
+            ("bolt", None),
+        ],
+    )
+    def test_anchored_name(self, pattern, prefix):
+        expected = {"name": {"$regex": pattern, "$options": "i"}}
+        if prefix:
+            expected = {"$and": [{"lower_name": {"$regex": f"^{prefix}"}}, expected]}
+
+        assert_that(Query(f"name:/{pattern}/").to_mongo()).is_equal_to(expected)
+
+    def test_string_numbers(self):
+        expression = Query("usd<1").to_mongo()["$expr"]["$and"]
+
+        assert_that(expression[-1]).is_equal_to(
+            {
+                "$lt": [
+                    {
+                        "$convert": {
+                            "input": "$prices.usd",
+                            "to": "double",
+                            "onError": None,
+                        }
+                    },
+                    1.0,
+                ]
+            }
+        )
+
+    def test_unsupported(self):
+        with pytest.raises(ValueError):
+            Query("otag:removal").to_mongo()
+
+
+@pytest.mark.asyncio
+class TestSerializableCardSearch:
+    async def test_search(self):
+        patch_beanie_document(SerializableCard)
+        client = AsyncMongoMockClient()
+        await init_beanie(database=client["test"], document_models=[SerializableCard])
+        raw = json.loads(
+            pathlib.Path(__file__).parent.joinpath("samples/card.json").read_text()
+        )
+        raw["_id"] = raw.pop("id")
+        raw["lower_name"] = raw["name"].lower()
+        await SerializableCard.get_motor_collection().insert_one(raw)
+
+        found = await SerializableCard.search('!"higure, the still wind"').to_list()
+        missing = await SerializableCard.search("s:bok c:g").to_list()
+        indexes = await SerializableCard.get_motor_collection().index_information()
+
+        assert_that([card.name for card in found]).is_equal_to(
+            ["Higure, the Still Wind"]
+        )
+        assert_that(missing).is_empty()
+        assert_that(indexes).contains_key(
+            "lower_name_1", "color_identity_1", "legalities.$**_1"
+        )
+
+
+class TestSerializableCard:
+    def test_lower_name(self):
+        raw = json.loads(
+            pathlib.Path(__file__).parent.joinpath("samples/card.json").read_text()
+        )
+
+        card = SerializableCard.model_validate(raw)
+
+        assert_that(card.lower_name).is_equal_to("higure, the still wind")
+        assert_that(card.model_dump()).contains_entry(
+            {"lower_name": "higure, the still wind"}
+        )
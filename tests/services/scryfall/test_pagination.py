@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from assertpy import assert_that
+from hishel import AsyncInMemoryStorage
+
+from mightstone.hishel import MightstoneCacheTransport
+from mightstone.services import ServiceError
+from mightstone.services.scryfall import Scryfall
+
+PAGES = 4
+CARDS_PER_PAGE = 3
+
+
+def page(number: int) -> dict:
+    data = {
+        "object": "list",
+        "has_more": number < PAGES,
+        "data": [
+            {"id": f"{number}-{i}", "name": f"Card {number}-{i}"}
+            for i in range(CARDS_PER_PAGE)
+        ],
+    }
+    if number < PAGES:
+        data["next_page"] = (
+            f"https://api.scryfall.com/cards/search?q=boseiju&page={number + 1}"
+        )
+    return data
+
+
+def build(calls: list, prefetch: int, latency: float = 0, status: int = 200):
+    async def handler(request: httpx.Request):
+        number = int(request.url.params.get("page", 1))
+        calls.append(number)
+        await asyncio.sleep(latency)
+        if number > 1 and status != 200:
+            return httpx.Response(
+                status,
+                json={"object": "error", "status": status, "code": "x", "details": ""},
+            )
+        return httpx.Response(200, json=page(number))
+
+    transport = MightstoneCacheTransport(
+        transport=httpx.MockTransport(handler), storage=AsyncInMemoryStorage()
+    )
+    return Scryfall(transport=transport, prefetch=prefetch)
+
+
+async def consume(client: Scryfall, delay: float = 0) -> list:
+    names = []
+    async for item in client._list("/cards/search", params={"q": "boseiju"}):
+        names.append(item["name"])
+        await asyncio.sleep(delay)
+    return names
+
+
+@pytest.mark.asyncio
+class TestScryfallPagination:
+    @pytest.mark.parametrize("prefetch", [0, 1, 3])
+    async def test_in_order(self, prefetch):
+        calls: list = []
+
+        names = await consume(build(calls, prefetch))
+
+        assert_that(names).is_equal_to(
+            [f"Card {p}-{i}" for p in range(1, PAGES + 1) for i in range(3)]
+        )
+        assert_that(calls).is_equal_to([1, 2, 3, 4])
+
+    async def test_prefetch_overlaps_consumer(self):
+        durations = {}
+        for prefetch in (0, 1):
+            start = time.perf_counter()
+            await consume(build([], prefetch, latency=0.03), delay=0.01)
+            durations[prefetch] = time.perf_counter() - start
+
+        assert_that(durations[1]).is_less_than(durations[0])
+
+    async def test_limit_stops_fetching(self):
+        calls: list = []
+        client = build(calls, 1)
+
+        items = [i async for i in client._list("/cards/search", limit=2)]
+        await asyncio.sleep(0.01)
+
+        assert_that(items).is_length(2)
+        assert_that(calls).is_equal_to([1])
+
+    @pytest.mark.parametrize("prefetch", [0, 3])
+    async def test_limit_caps_prefetch(self, prefetch):
+        calls: list = []
+        client = build(calls, prefetch)
+
+        items = [i async for i in client._list("/cards/search", limit=4)]
+        await asyncio.sleep(0.01)
+
+        assert_that(items).is_length(4)
+        assert_that(calls).is_equal_to([1, 2])
+
+    @pytest.mark.parametrize("prefetch", [0, 1])
+    async def test_pages_closed_on_early_exit(self, prefetch):
+        closed = []
+        client = build([], prefetch)
+        pages = client._pages
+
+        async def tracked(*args, **kwargs):
+            try:
+                async for item in pages(*args, **kwargs):
+                    yield item
+            finally:
+                closed.append(True)
+
+        client._pages = tracked  # type: ignore[method-assign]
+        items = client._list("/cards/search")
+        await items.__anext__()
+        await items.aclose()
+
+        assert_that(closed).is_equal_to([True])
+
+    async def test_error_on_next_page(self):
+        calls: list = []
+        names = []
+
+        with pytest.raises(ServiceError):
+            async for item in build(calls, 1, status=500)._list("/cards/search"):
+                names.append(item["name"])
+
+        assert_that(names).is_length(CARDS_PER_PAGE)
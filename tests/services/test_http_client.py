@@ -0,0 +1,165 @@
+import httpx
+import pytest
+from assertpy import assert_that
+from hishel import AsyncCacheTransport, AsyncInMemoryStorage
+
+from mightstone import Mightstone
+from mightstone.hishel import SERVICE_EXTENSION
+from mightstone.injector import CleanupInjector, cleaned
+from mightstone.services import MightstoneHttpClient
+
+
+class DummyClient(MightstoneHttpClient):
+    base_url = "https://example.com"
+    service = "dummy"
+
+
+def build_transport(handler) -> AsyncCacheTransport:
+    return AsyncCacheTransport(
+        transport=httpx.MockTransport(handler), storage=AsyncInMemoryStorage()
+    )
+
+
+@pytest.mark.asyncio
+class TestMightstoneHttpClient:
+    async def test_client_is_reused(self):
+        service = DummyClient(transport=build_transport(lambda r: httpx.Response(200)))
+
+        assert_that(service.client).is_same_as(service.client)
+
+    async def test_client_is_rebuilt_after_close(self):
+        service = DummyClient(transport=build_transport(lambda r: httpx.Response(200)))
+        client = service.client
+
+        await service.aclose()
+
+        assert_that(service.client).is_not_same_as(client)
+
+    async def test_close_preserves_shared_transport(self):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            return httpx.Response(200, json={})
+
+        transport = build_transport(handler)
+        async with DummyClient(transport=transport) as service:
+            await service.client.get("/a")
+
+        other = DummyClient(transport=transport)
+        response = await other.client.get("/b")
+
+        assert_that(response.status_code).is_equal_to(200)
+        assert_that(calls).is_equal_to(["/a", "/b"])
+
+    async def test_client_base_url_and_headers(self):
+        service = DummyClient(transport=build_transport(lambda r: httpx.Response(200)))
+
+        assert_that(str(service.client.base_url)).is_equal_to("https://example.com")
+        assert_that(service.client.headers["user-agent"]).starts_with("mightstone/")
+
+    async def test_requests_are_tagged_with_service(self):
+        extensions = []
+
+        def handler(request: httpx.Request):
+            extensions.append(request.extensions.get(SERVICE_EXTENSION))
+            return httpx.Response(200)
+
+        async with DummyClient(transport=build_transport(handler)) as service:
+            await service.client.get("/a")
+
+        assert_that(extensions).is_equal_to(["dummy"])
+
+    async def test_sleep_is_deprecated(self):
+        service = DummyClient(transport=build_transport(lambda r: httpx.Response(200)))
+
+        with pytest.deprecated_call():
+            await service._sleep()
+
+
+class TestMightstoneHttpLifecycle:
+    def test_services_are_singletons(self):
+        m = Mightstone({"storage": {"implementation": "fake"}})
+
+        assert_that(m.scryfall).is_same_as(m.scryfall)
+        assert_that(m.scryfall.transport).is_same_as(m.cache_transport)
+
+    def test_pool_limits_from_settings(self):
+        m = Mightstone(
+            {
+                "storage": {"implementation": "fake"},
+                "http": {"pool": {"max_connections": 7, "keepalive_expiry": 12}},
+            }
+        )
+
+        pool = m.cache_transport._transport._transport._pool
+        assert_that(pool._max_connections).is_equal_to(7)
+        assert_that(pool._keepalive_expiry).is_equal_to(12)
+
+    @pytest.mark.asyncio
+    async def test_async_context_closes_services(self):
+        async with Mightstone({"storage": {"implementation": "fake"}}) as m:
+            assert_that(m.scryfall.client).is_not_none()
+
+        assert_that(m.scryfall._client).is_none()
+
+    @pytest.mark.asyncio
+    async def test_services_are_rebuilt_once_closed(self):
+        m = Mightstone({"storage": {"implementation": "fake"}})
+        scryfall = m.scryfall
+        transport = m.cache_transport
+
+        await m.aclose()
+
+        assert_that(m.scryfall).is_not_same_as(scryfall)
+        assert_that(m.cache_transport).is_not_same_as(transport)
+        assert_that(m.scryfall).is_same_as(m.scryfall)
+
+    @pytest.mark.asyncio
+    async def test_cleanup_scope_closes_in_reverse_order(self):
+        closed = []
+
+        class Resource:
+            def __init__(self, name):
+                self.name = name
+
+            async def aclose(self):
+                closed.append(self.name)
+
+        class First(Resource):
+            def __init__(self):
+                super().__init__("first")
+
+        class Second(Resource):
+            def __init__(self):
+                super().__init__("second")
+
+        injector = CleanupInjector()
+        injector.binder.bind(First, scope=cleaned)
+        injector.binder.bind(Second, scope=cleaned)
+        injector.get(First)
+        injector.get(Second)
+
+        await injector.aclose()
+
+        assert_that(closed).is_equal_to(["second", "first"])
+
+    @pytest.mark.asyncio
+    async def test_cleanup_scope_forgets_closed_objects(self):
+        class Closeable:
+            async def aclose(self):
+                pass
+
+        class Kept:
+            pass
+
+        injector = CleanupInjector()
+        injector.binder.bind(Closeable, scope=cleaned)
+        injector.binder.bind(Kept, scope=cleaned)
+        closeable = injector.get(Closeable)
+        kept = injector.get(Kept)
+
+        await injector.aclose()
+
+        assert_that(injector.get(Closeable)).is_not_same_as(closeable)
+        assert_that(injector.get(Kept)).is_same_as(kept)
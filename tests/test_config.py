@@ -3,7 +3,7 @@ import pathlib
 import unittest
 from unittest import mock
 
-from mightstone.config import SettingsSourceGenerator
+from mightstone.config import CachePolicy, SettingsSourceGenerator
 
 
 class TestSettingsSourceGenerator(unittest.TestCase):
@@ -48,3 +48,19 @@ class TestSettingsSourceGenerator(unittest.TestCase):
         paths = SettingsSourceGenerator("foo du fafa").candidate_paths()
 
         self.assertEqual([pathlib.Path("/path/to/my/config.toml")], paths)
+
+
+class TestCachePolicy(unittest.TestCase):
+    def test_glob(self):
+        policy = CachePolicy(service="scryfall", path="/cards/random*")
+
+        self.assertTrue(policy.matches("scryfall", "/cards/random"))
+        self.assertFalse(policy.matches("scryfall", "/cards/search"))
+        self.assertFalse(policy.matches("mtgjson", "/cards/random"))
+
+    def test_regex(self):
+        policy = CachePolicy(path=r"^/api/v\d+/Meta\.json", regex=True)
+
+        self.assertTrue(policy.matches("mtgjson", "/api/v5/Meta.json.gz"))
+        self.assertTrue(policy.matches(None, "/api/v5/Meta.json"))
+        self.assertFalse(policy.matches("mtgjson", "/api/v5/AllPrintings.json"))
@@ -1,12 +1,38 @@
+import pickle
+import uuid
+from typing import Any, Dict, List, Optional
 from unittest import TestCase
 
+from pydantic import Field, ValidationError
+
 from mightstone.core import (
     MightstoneDocument,
+    MightstoneModel,
     MightstoneSerializableDocument,
+    Validation,
+    build,
+    construct,
+    enrich,
     get_documents,
+    projection,
 )
 
 
+class Face(MightstoneModel):
+    name: str
+
+
+class Thing(MightstoneDocument):
+    id: Optional[uuid.UUID] = None
+    ascii_name: str = Field(alias="asciiName")
+    count: int = 1
+    faces: List[Face] = []
+
+    @classmethod
+    def infer_id(cls, value: Dict[str, Any]) -> Any:
+        return uuid.uuid5(uuid.NAMESPACE_DNS, value["asciiName"])
+
+
 class TestDocumentClassFinder(TestCase):
     def test_find(self):
         self.assertIsInstance(get_documents(), list)
@@ -29,3 +55,70 @@ class TestDocumentClassFinder(TestCase):
 
     def test_count(self):
         self.assertGreater(len(get_documents()), 10)
+
+
+class TestValidation(TestCase):
+    raw = {"asciiName": "foo", "faces": [{"name": "bar"}]}
+
+    def test_construct(self):
+        thing = construct(Thing, dict(self.raw))
+
+        self.assertIsInstance(thing, Thing)
+        self.assertEqual(thing.ascii_name, "foo")
+        self.assertEqual(thing.count, 1)
+        self.assertEqual(thing.faces, [{"name": "bar"}])
+        self.assertEqual(thing.id, uuid.uuid5(uuid.NAMESPACE_DNS, "foo"))
+        self.assertEqual(thing.model_fields_set, {"id", "ascii_name", "faces"})
+
+    def test_construct_does_not_share_defaults(self):
+        first = construct(Thing, {"asciiName": "foo"})
+        first.faces.append(Face(name="bar"))
+
+        self.assertEqual(construct(Thing, {"asciiName": "foo"}).faces, [])
+
+    def test_enrich(self):
+        data = enrich(Thing, dict(self.raw))
+
+        self.assertEqual(data["id"], str(uuid.uuid5(uuid.NAMESPACE_DNS, "foo")))
+        self.assertEqual(enrich(Thing, {"id": "x"}), {"id": "x"})
+
+    def test_build(self):
+        self.assertIsInstance(build(Thing, dict(self.raw)).faces[0], Face)
+        self.assertIsInstance(build(Thing, dict(self.raw), Validation.LAZY), Thing)
+        self.assertIsInstance(build(Thing, dict(self.raw), Validation.NONE), dict)
+
+        with self.assertRaises(ValidationError):
+            build(Thing, {"asciiName": "foo", "count": "many"})
+        build(Thing, {"asciiName": "foo", "count": "many"}, Validation.LAZY)
+
+
+class TestProjection(TestCase):
+    raw = {"asciiName": "foo", "count": 3, "faces": [{"name": "bar"}]}
+
+    def test_projection(self):
+        slim = projection(Thing, ["asciiName", "faces.name"])
+        thing = slim.model_validate(self.raw)
+
+        self.assertEqual(set(slim.model_fields), {"ascii_name", "faces"})
+        self.assertEqual(thing.ascii_name, "foo")
+        self.assertEqual(thing.faces[0].name, "bar")
+        self.assertIsNone(slim.model_validate({}).ascii_name)
+
+    def test_projection_is_cached(self):
+        self.assertIs(projection(Thing, ["count"]), projection(Thing, ["count"]))
+
+    def test_unknown_field(self):
+        with self.assertRaises(ValueError):
+            projection(Thing, ["nope"])
+        with self.assertRaises(ValueError):
+            projection(Thing, ["count.nope"])
+
+    def test_raw_projection(self):
+        slim = projection(Thing, ["count"])
+
+        self.assertEqual(build(slim, dict(self.raw), Validation.NONE), {"count": 3})
+
+    def test_pickle(self):
+        thing = projection(Thing, ["faces.name"]).model_validate(self.raw)
+
+        self.assertEqual(pickle.loads(pickle.dumps(thing)), thing)
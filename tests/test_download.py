@@ -0,0 +1,205 @@
+import hashlib
+
+import httpx
+import pytest
+from assertpy import assert_that
+
+from mightstone.download import Downloader, file_sha256, parse_content_range
+from mightstone.services import ServiceError
+
+CONTENT = b"0123456789" * 100
+ETAG = '"v1"'
+
+
+class InterruptedStream(httpx.AsyncByteStream):
+    def __init__(self, content: bytes):
+        self.content = content
+
+    async def __aiter__(self):
+        yield self.content
+        raise httpx.ReadError("connection dropped")
+
+
+def range_handler(requests: list, fail_after: int = 0):
+    """
+    Serve CONTENT, honouring Range and If-Range requests, the first response is
+    interrupted after ``fail_after`` bytes if provided
+    """
+
+    def handler(request: httpx.Request):
+        requests.append(request.headers.get("range"))
+        start = 0
+        if request.headers.get("range") and request.headers.get("if-range") in (
+            None,
+            ETAG,
+        ):
+            start = int(request.headers["range"][6:].split("-")[0])
+        if start >= len(CONTENT):
+            return httpx.Response(
+                416, headers={"content-range": f"bytes */{len(CONTENT)}"}
+            )
+
+        headers = {"content-length": str(len(CONTENT) - start), "etag": ETAG}
+        status = 200
+        if start:
+            status = 206
+            headers["content-range"] = (
+                f"bytes {start}-{len(CONTENT) - 1}/{len(CONTENT)}"
+            )
+        if fail_after and len(requests) == 1:
+            return httpx.Response(
+                status, headers=headers, stream=InterruptedStream(CONTENT[:fail_after])
+            )
+        return httpx.Response(status, headers=headers, content=CONTENT[start:])
+
+    return handler
+
+
+def build(handler) -> Downloader:
+    return Downloader(
+        httpx.AsyncClient(transport=httpx.MockTransport(handler)), backoff=0
+    )
+
+
+class TestHelpers:
+    def test_parse_content_range(self):
+        assert_that(parse_content_range("bytes 200-999/1000")).is_equal_to(1000)
+        assert_that(parse_content_range("bytes */1000")).is_equal_to(1000)
+        assert_that(parse_content_range("bytes 200-999/*")).is_none()
+        assert_that(parse_content_range(None)).is_none()
+
+    def test_file_sha256(self, tmp_path):
+        path = tmp_path.joinpath("file")
+        path.write_bytes(CONTENT)
+
+        assert_that(file_sha256(path, chunk_size=7)).is_equal_to(
+            hashlib.sha256(CONTENT).hexdigest()
+        )
+
+
+@pytest.mark.asyncio
+class TestDownloader:
+    async def test_download(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("sub", "file.json")
+
+        path = await build(range_handler(requests)).download(
+            "https://example.com/file.json",
+            destination,
+            sha256=hashlib.sha256(CONTENT).hexdigest(),
+        )
+
+        assert_that(path).is_equal_to(destination)
+        assert_that(path.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to([None])
+        assert_that(list(destination.parent.iterdir())).is_length(1)
+
+    async def test_resume_after_interruption(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+
+        await build(range_handler(requests, fail_after=300)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to([None, "bytes=300-"])
+
+    async def test_resume_existing_part_file(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(CONTENT[:500])
+        tmp_path.joinpath("file.json.part.validator").write_text(ETAG)
+
+        await build(range_handler(requests)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to(["bytes=500-"])
+        assert_that(list(tmp_path.iterdir())).is_length(1)
+
+    async def test_part_file_of_another_version(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(b"x" * 500)
+        tmp_path.joinpath("file.json.part.validator").write_text('"v0"')
+
+        await build(range_handler(requests)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to(["bytes=500-"])
+
+    async def test_part_file_without_validator_is_restarted(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(b"x" * 500)
+
+        await build(range_handler(requests)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to([None])
+
+    async def test_part_file_without_validator_is_checked(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(CONTENT[:500])
+
+        await build(range_handler(requests)).download(
+            "https://example.com/file.json",
+            destination,
+            sha256=hashlib.sha256(CONTENT).hexdigest(),
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to(["bytes=500-"])
+
+    async def test_complete_part_file(self, tmp_path):
+        requests: list = []
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(CONTENT)
+        tmp_path.joinpath("file.json.part.validator").write_text(ETAG)
+
+        await build(range_handler(requests)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+        assert_that(requests).is_equal_to([f"bytes={len(CONTENT)}-"])
+
+    async def test_range_is_ignored_by_server(self, tmp_path):
+        destination = tmp_path.joinpath("file.json")
+        tmp_path.joinpath("file.json.part").write_bytes(b"garbage")
+        tmp_path.joinpath("file.json.part.validator").write_text(ETAG)
+
+        await build(lambda r: httpx.Response(200, content=CONTENT)).download(
+            "https://example.com/file.json", destination
+        )
+
+        assert_that(destination.read_bytes()).is_equal_to(CONTENT)
+
+    async def test_checksum_mismatch(self, tmp_path):
+        destination = tmp_path.joinpath("file.json")
+
+        with pytest.raises(ServiceError):
+            await build(range_handler([])).download(
+                "https://example.com/file.json", destination, sha256="0" * 64
+            )
+
+        assert_that(list(tmp_path.iterdir())).is_empty()
+
+    async def test_gives_up_after_retries(self, tmp_path):
+        def handler(request: httpx.Request):
+            raise httpx.ConnectError("unreachable")
+
+        downloader = build(handler)
+        downloader.retries = 2
+
+        with pytest.raises(ServiceError):
+            await downloader.download(
+                "https://example.com/file.json", tmp_path.joinpath("file.json")
+            )
@@ -0,0 +1,334 @@
+import asyncio
+import email.utils
+import time
+
+import hishel
+import httpcore
+import httpx
+import pytest
+from assertpy import assert_that
+from hishel import AsyncCacheTransport
+
+from mightstone import Mightstone
+from mightstone.config import CachePolicy, EvictionPolicy
+from mightstone.hishel import (
+    SERVICE_EXTENSION,
+    STALE_EXTENSION,
+    MightstoneCacheTransport,
+    MightstoneController,
+    SQLiteStorage,
+)
+from mightstone.transport import STREAM_EXTENSION
+
+
+def build_pair(path: str, content: bytes = b"foo"):
+    request = httpcore.Request("GET", f"https://example.com{path}")
+    response = httpcore.Response(
+        200, headers=[(b"content-type", b"text/plain")], content=content
+    )
+    response.read()
+    return request, response
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return tmp_path.joinpath("cache.sqlite")
+
+
+@pytest.mark.asyncio
+class TestSQLiteStorage:
+    async def test_store_and_retrieve(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path)
+        request, response = build_pair("/a", b"hello")
+
+        await storage.store("a", response=response, request=request)
+        stored = await storage.retrieve("a")
+        await storage.aclose()
+
+        assert_that(stored).is_not_none()
+        stored_response, stored_request, metadata = stored
+        assert_that(stored_response.status).is_equal_to(200)
+        assert_that(stored_response.read()).is_equal_to(b"hello")
+        assert_that(stored_response.headers).contains((b"content-type", b"text/plain"))
+        assert_that(stored_request.url.target).is_equal_to(b"/a")
+        assert_that(metadata["cache_key"]).is_equal_to("a")
+
+    async def test_counters(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path)
+        request, response = build_pair("/a")
+
+        await storage.retrieve("a")
+        await storage.store("a", response=response, request=request)
+        await storage.retrieve("a")
+        await storage.retrieve("a")
+        statistics = await storage.statistics()
+        await storage.aclose()
+
+        assert_that(statistics).is_equal_to(
+            {"hits": 2, "misses": 1, "evictions": 0, "entries": 1, "size": 3}
+        )
+
+    async def test_update_metadata(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path)
+        request, response = build_pair("/a")
+        await storage.store("a", response=response, request=request)
+        _, _, metadata = await storage.retrieve("a")
+
+        metadata["number_of_uses"] = 12
+        await storage.update_metadata("a", response, request, metadata)
+        _, _, metadata = await storage.retrieve("a")
+        await storage.aclose()
+
+        assert_that(metadata["number_of_uses"]).is_equal_to(12)
+
+    async def test_update_metadata_refreshes_headers(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path)
+        request, response = build_pair("/a")
+        await storage.store("a", response=response, request=request)
+        stored, _, metadata = await storage.retrieve("a")
+
+        stored.headers = [(b"etag", b"v2")]
+        await storage.update_metadata("a", stored, request, metadata)
+        stored, _, _ = await storage.retrieve("a")
+        await storage.aclose()
+
+        assert_that(stored.headers).is_equal_to([(b"etag", b"v2")])
+        assert_that(stored.read()).is_equal_to(b"foo")
+
+    async def test_lru_eviction_by_entries(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path, max_entries=2)
+        for key in ["a", "b"]:
+            await storage.store(key, *reversed(build_pair(f"/{key}")))
+        await storage.retrieve("a")
+        await storage.store("c", *reversed(build_pair("/c")))
+
+        assert_that(await storage.retrieve("b")).is_none()
+        assert_that(await storage.retrieve("a")).is_not_none()
+        assert_that(await storage.retrieve("c")).is_not_none()
+        assert_that(storage.evictions).is_equal_to(1)
+        await storage.aclose()
+
+    async def test_lfu_eviction_by_size(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path, max_size=10, eviction=EvictionPolicy.LFU)
+        await storage.store("a", *reversed(build_pair("/a", b"12345")))
+        await storage.store("b", *reversed(build_pair("/b", b"12345")))
+        await storage.retrieve("a")
+        await storage.retrieve("a")
+        await storage.retrieve("b")
+        await storage.store("c", *reversed(build_pair("/c", b"12345")))
+
+        statistics = await storage.statistics()
+        assert_that(await storage.retrieve("b")).is_none()
+        assert_that(await storage.retrieve("a")).is_not_none()
+        assert_that(statistics["size"]).is_equal_to(10)
+        await storage.aclose()
+
+    async def test_ttl(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path, ttl=-1)
+        await storage.store("a", *reversed(build_pair("/a")))
+
+        assert_that(await storage.retrieve("a")).is_none()
+        await storage.aclose()
+
+    async def test_persisted(self, sqlite_path):
+        storage = SQLiteStorage(sqlite_path)
+        await storage.store("a", *reversed(build_pair("/a")))
+        await storage.aclose()
+
+        storage = SQLiteStorage(sqlite_path)
+        assert_that(await storage.retrieve("a")).is_not_none()
+        await storage.aclose()
+
+    async def test_as_hishel_storage(self, sqlite_path):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            return httpx.Response(
+                200,
+                headers={
+                    "cache-control": "max-age=60",
+                    "date": email.utils.formatdate(usegmt=True),
+                },
+                json={"ok": True},
+            )
+
+        storage = SQLiteStorage(sqlite_path)
+        transport = AsyncCacheTransport(
+            transport=httpx.MockTransport(handler),
+            storage=storage,
+            controller=MightstoneController(),
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            first = await client.get("https://example.com/a")
+            second = await client.get("https://example.com/a")
+
+        assert_that(calls).is_length(1)
+        assert_that(first.json()).is_equal_to(second.json())
+        assert_that(second.extensions["from_cache"]).is_true()
+
+
+@pytest.mark.asyncio
+class TestMightstoneControllerPolicies:
+    @staticmethod
+    async def fetch(policies, *paths, service="scryfall", headers=None):
+        calls = []
+
+        def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            return httpx.Response(
+                200,
+                headers={
+                    "date": email.utils.formatdate(usegmt=True),
+                    **(headers or {}),
+                },
+                json={"ok": True},
+            )
+
+        transport = AsyncCacheTransport(
+            transport=httpx.MockTransport(handler),
+            storage=hishel.AsyncInMemoryStorage(),
+            controller=MightstoneController(policies=policies),
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            for path in paths:
+                await client.get(
+                    f"https://example.com{path}",
+                    extensions={SERVICE_EXTENSION: service},
+                )
+        return calls
+
+    async def test_ttl_overrides_server_headers(self):
+        calls = await self.fetch([CachePolicy(ttl=60)], "/a", "/a")
+
+        assert_that(calls).is_equal_to(["/a"])
+
+    async def test_expired_ttl_revalidates(self):
+        calls = await self.fetch(
+            [CachePolicy(ttl=0)], "/a", "/a", headers={"cache-control": "max-age=60"}
+        )
+
+        assert_that(calls).is_equal_to(["/a", "/a"])
+
+    async def test_no_store(self):
+        calls = await self.fetch(
+            [CachePolicy(path="/random", no_store=True), CachePolicy(ttl=60)],
+            "/random",
+            "/random",
+            "/a",
+            "/a",
+        )
+
+        assert_that(calls).is_equal_to(["/random", "/random", "/a"])
+
+    async def test_policy_is_scoped_by_service(self):
+        calls = await self.fetch(
+            [CachePolicy(service="mtgjson", ttl=60)], "/a", "/a", service="scryfall"
+        )
+
+        assert_that(calls).is_equal_to(["/a", "/a"])
+
+    async def test_server_headers_apply_without_policy(self):
+        calls = await self.fetch(
+            [], "/a", "/a", headers={"cache-control": "max-age=60"}
+        )
+
+        assert_that(calls).is_equal_to(["/a"])
+
+
+@pytest.mark.asyncio
+class TestMightstoneCacheTransport:
+    @staticmethod
+    def build(calls: list, policy: CachePolicy, delay: float = 0):
+        async def handler(request: httpx.Request):
+            calls.append(request.headers.get("if-none-match"))
+            await asyncio.sleep(delay)
+            # The first response is already 30 seconds old
+            age = 30 if len(calls) == 1 else 0
+            return httpx.Response(
+                200,
+                headers={
+                    "date": email.utils.formatdate(time.time() - age, usegmt=True),
+                    "etag": f"v{len(calls)}",
+                },
+                json={"version": len(calls)},
+            )
+
+        return MightstoneCacheTransport(
+            transport=httpx.MockTransport(handler),
+            storage=hishel.AsyncInMemoryStorage(),
+            controller=MightstoneController(policies=[policy]),
+        )
+
+    async def test_stale_response_is_served_then_refreshed(self):
+        calls: list = []
+        transport = self.build(calls, CachePolicy(ttl=10, stale_while_revalidate=60))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://example.com/a")
+            stale = await client.get("https://example.com/a")
+            await asyncio.gather(*transport._refreshing.values())
+            fresh = await client.get("https://example.com/a")
+
+        assert_that(stale.json()).is_equal_to({"version": 1})
+        assert_that(stale.extensions[STALE_EXTENSION]).is_true()
+        assert_that(fresh.json()).is_equal_to({"version": 2})
+        assert_that(fresh.extensions).does_not_contain_key(STALE_EXTENSION)
+        assert_that(calls).is_equal_to([None, "v1"])
+
+    async def test_refresh_is_deduplicated(self):
+        calls: list = []
+        transport = self.build(
+            calls, CachePolicy(ttl=10, stale_while_revalidate=60), delay=0.05
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://example.com/a")
+            for _ in range(3):
+                await client.get("https://example.com/a")
+            await asyncio.gather(*transport._refreshing.values())
+
+        assert_that(calls).is_length(2)
+
+    async def test_expired_response_is_replaced(self):
+        calls: list = []
+        transport = self.build(calls, CachePolicy(ttl=10))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.get("https://example.com/a")
+            replaced = await client.get("https://example.com/a")
+            cached = await client.get("https://example.com/a")
+
+        assert_that(replaced.json()).is_equal_to({"version": 2})
+        assert_that(cached.json()).is_equal_to({"version": 2})
+        assert_that(cached.extensions["from_cache"]).is_true()
+        assert_that(calls).is_equal_to([None, "v1"])
+
+    async def test_streamed_requests_bypass_the_cache(self):
+        calls: list = []
+        transport = self.build(calls, CachePolicy(ttl=60))
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(2):
+                await client.get(
+                    "https://example.com/a", extensions={STREAM_EXTENSION: True}
+                )
+
+        assert_that(calls).is_length(2)
+
+
+class TestSQLiteStorageSettings:
+    def test_selected_from_settings(self, sqlite_path):
+        m = Mightstone(
+            {
+                "storage": {"implementation": "fake"},
+                "http": {
+                    "cache": {
+                        "storage": "sqlite",
+                        "directory": sqlite_path.parent,
+                        "max_size": 1024,
+                    }
+                },
+            }
+        )
+
+        storage = m.cache_transport._storage
+        assert_that(storage).is_instance_of(SQLiteStorage)
+        assert_that(storage.path).is_equal_to(sqlite_path)
+        assert_that(storage.max_size).is_equal_to(1024)
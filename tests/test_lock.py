@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+from assertpy import assert_that
+
+from mightstone.lock import FileLock
+
+
+@pytest.mark.asyncio
+class TestFileLock:
+    async def test_exclusive(self, tmp_path):
+        events = []
+
+        async def hold(name: str):
+            async with FileLock(tmp_path.joinpath("a.lock")):
+                events.append(f"{name} in")
+                await asyncio.sleep(0.05)
+                events.append(f"{name} out")
+
+        await asyncio.gather(hold("a"), hold("b"))
+
+        assert_that(events[0][0]).is_equal_to(events[1][0])
+        assert_that(events[2][0]).is_equal_to(events[3][0])
+
+    async def test_release_is_idempotent(self, tmp_path):
+        lock = FileLock(tmp_path.joinpath("a.lock"))
+        lock.acquire()
+        lock.release()
+        lock.release()
+
+    async def test_cancelled_acquire_is_released(self, tmp_path):
+        path = tmp_path.joinpath("a.lock")
+        holder = FileLock(path)
+        holder.acquire()
+
+        async def wait():
+            async with FileLock(path):
+                pass
+
+        task = asyncio.create_task(wait())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        holder.release()
+
+        lock = FileLock(path)
+        await asyncio.wait_for(lock.__aenter__(), 1)
+        await lock.__aexit__(None, None, None)
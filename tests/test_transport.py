@@ -0,0 +1,232 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from assertpy import assert_that
+
+from mightstone.config import RateLimitSettings
+from mightstone.transport import (
+    STREAM_EXTENSION,
+    CoalescingTransport,
+    RateLimiter,
+    RateLimitTransport,
+    TokenBucket,
+    parse_retry_after,
+)
+
+
+class TestTokenBucket:
+    def test_burst_is_immediate(self):
+        bucket = TokenBucket(rate=10, burst=3)
+
+        delays = [bucket.reserve() for _ in range(3)]
+
+        assert_that(max(delays)).is_equal_to(0)
+
+    def test_throttles_after_burst(self):
+        bucket = TokenBucket(rate=10, burst=2)
+
+        delays = [bucket.reserve() for _ in range(4)]
+
+        assert_that(delays[2]).is_close_to(0.1, 0.01)
+        assert_that(delays[3]).is_close_to(0.2, 0.01)
+
+    def test_block(self):
+        bucket = TokenBucket(rate=100, burst=10)
+        bucket.block(0.5)
+
+        assert_that(bucket.reserve()).is_close_to(0.5, 0.01)
+        assert_that(bucket.reserve()).is_close_to(0.51, 0.01)
+
+    def test_invalid_rate(self):
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+    @pytest.mark.asyncio
+    async def test_block_postpones_reserved_slots(self):
+        bucket = TokenBucket(rate=20, burst=1)
+        reserve = bucket.reserve
+        reservations = []
+
+        def counting_reserve():
+            reservations.append(1)
+            return reserve()
+
+        bucket.reserve = counting_reserve  # type: ignore[method-assign]
+        start = time.monotonic()
+        done = []
+
+        async def acquire():
+            await bucket.acquire()
+            done.append(time.monotonic() - start)
+
+        waiters = [asyncio.create_task(acquire()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        bucket.block(0.1)
+        await asyncio.gather(*waiters)
+
+        assert_that(reservations).is_length(3)
+        assert_that(done[1]).is_close_to(0.15, 0.03)
+        assert_that(done[2]).is_close_to(0.2, 0.03)
+        assert_that(bucket.reserve()).is_close_to(0.05, 0.03)
+
+
+class TestRateLimiter:
+    def test_unknown_host_is_not_limited(self):
+        limiter = RateLimiter({"example.com": RateLimitSettings(rate=1)})
+
+        assert_that(limiter.bucket("example.org")).is_none()
+
+    def test_bucket_is_shared_by_host(self):
+        limiter = RateLimiter({"example.com": RateLimitSettings(rate=1)})
+
+        assert_that(limiter.bucket("example.com")).is_same_as(
+            limiter.bucket("example.com")
+        )
+
+    def test_defaults_to_scryfall(self):
+        assert_that(RateLimiter().limits).contains_key("api.scryfall.com")
+
+
+class TestParseRetryAfter:
+    def test_seconds(self):
+        assert_that(parse_retry_after("3")).is_equal_to(3.0)
+
+    def test_http_date_in_the_past(self):
+        assert_that(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT")).is_equal_to(0)
+
+    def test_invalid(self):
+        assert_that(parse_retry_after("soon")).is_none()
+        assert_that(parse_retry_after(None)).is_none()
+
+
+@pytest.mark.asyncio
+class TestRateLimitTransport:
+    async def test_retries_after_too_many_requests(self):
+        responses = [
+            httpx.Response(429, headers={"retry-after": "0"}),
+            httpx.Response(200, json={"ok": True}),
+        ]
+
+        transport = RateLimitTransport(
+            httpx.MockTransport(lambda r: responses.pop(0)),
+            limiter=RateLimiter({"example.com": RateLimitSettings(rate=100)}),
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://example.com/")
+
+        assert_that(response.status_code).is_equal_to(200)
+        assert_that(responses).is_empty()
+
+    async def test_gives_up_after_retries(self):
+        transport = RateLimitTransport(
+            httpx.MockTransport(lambda r: httpx.Response(429)),
+            limiter=RateLimiter({}),
+            retries=2,
+            backoff=0,
+        )
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://example.com/")
+
+        assert_that(response.status_code).is_equal_to(429)
+
+    async def test_enforces_rate(self):
+        transport = RateLimitTransport(
+            httpx.MockTransport(lambda r: httpx.Response(200)),
+            limiter=RateLimiter({"example.com": RateLimitSettings(rate=20, burst=1)}),
+        )
+        start = time.monotonic()
+        async with httpx.AsyncClient(transport=transport) as client:
+            for _ in range(3):
+                await client.get("https://example.com/")
+
+        assert_that(time.monotonic() - start).is_greater_than_or_equal_to(0.09)
+
+
+@pytest.mark.asyncio
+class TestCoalescingTransport:
+    @staticmethod
+    def build(calls: list, delay: float = 0.05, status: int = 200):
+        async def handler(request: httpx.Request):
+            calls.append(request.url.path)
+            await asyncio.sleep(delay)
+            return httpx.Response(status, json={"path": request.url.path})
+
+        return CoalescingTransport(httpx.MockTransport(handler))
+
+    async def test_identical_requests_share_one_call(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=self.build(calls)) as client:
+            responses = await asyncio.gather(
+                *[client.get("https://example.com/a") for _ in range(5)]
+            )
+
+        assert_that(calls).is_equal_to(["/a"])
+        assert_that([r.json() for r in responses]).is_equal_to([{"path": "/a"}] * 5)
+
+    async def test_distinct_requests_are_not_shared(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=self.build(calls)) as client:
+            await asyncio.gather(
+                client.get("https://example.com/a"),
+                client.get("https://example.com/b"),
+                client.get("https://example.com/a", headers={"accept": "text/xml"}),
+            )
+
+        assert_that(calls).is_length(3)
+
+    async def test_no_cache_and_post_are_not_shared(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=self.build(calls)) as client:
+            await asyncio.gather(
+                client.get(
+                    "https://example.com/a", headers={"cache-control": "no-cache"}
+                ),
+                client.get(
+                    "https://example.com/a", headers={"cache-control": "no-cache"}
+                ),
+                client.post("https://example.com/a"),
+                client.post("https://example.com/a"),
+            )
+
+        assert_that(calls).is_length(4)
+
+    async def test_streamed_requests_are_not_shared(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=self.build(calls)) as client:
+            await asyncio.gather(
+                *[
+                    client.get(
+                        "https://example.com/a", extensions={STREAM_EXTENSION: True}
+                    )
+                    for _ in range(2)
+                ]
+            )
+
+        assert_that(calls).is_length(2)
+
+    async def test_sequential_requests_are_not_shared(self):
+        calls: list = []
+        async with httpx.AsyncClient(transport=self.build(calls, delay=0)) as client:
+            await client.get("https://example.com/a")
+            await client.get("https://example.com/a")
+
+        assert_that(calls).is_length(2)
+
+    async def test_errors_are_shared(self):
+        async def handler(request: httpx.Request):
+            await asyncio.sleep(0.05)
+            raise httpx.ConnectError("boom")
+
+        transport = CoalescingTransport(httpx.MockTransport(handler))
+        async with httpx.AsyncClient(transport=transport) as client:
+            results = await asyncio.gather(
+                client.get("https://example.com/a"),
+                client.get("https://example.com/a"),
+                return_exceptions=True,
+            )
+
+        assert_that(results[0]).is_instance_of(httpx.ConnectError)
+        assert_that(results[1]).is_instance_of(httpx.ConnectError)
+        assert_that(transport._pending).is_empty()